@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the cost of sending large FireWorks through pickle, as multiprocessing does, compared
+with converting them to and from their dict form.
+
+    python -m fireworks.benchmarks.bench_pickle -n 200 --spec-size 200 --launches 5
+"""
+
+from argparse import ArgumentParser
+import pickle
+import time
+
+from fireworks.core.firework import FireWork, FWAction, Launch, Tracker
+from fireworks.user_objects.firetasks.script_task import PyTask, ScriptTask
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+def make_fw(fw_id, spec_size, nlaunches):
+    spec = {'param_{}'.format(i): {'values': list(range(20)), 'label': 'x' * 50, 'scale': i * 1.5}
+            for i in range(spec_size)}
+    launches = []
+    for i in range(nlaunches):
+        launch = Launch('RUNNING', '/tmp/launch_{}'.format(i), host='host', ip='127.0.0.1',
+                        launch_id=i, fw_id=fw_id,
+                        trackers=[Tracker('OUTCAR', content='line\n' * 100)])
+        launch.state = 'COMPLETED'
+        launch.action = FWAction(stored_data={'energies': list(range(100))})
+        launches.append(launch)
+    return FireWork([PyTask(func='print', args=[1]), ScriptTask.from_str('echo "benchmark"')],
+                    spec, fw_id=fw_id, launches=launches, state='COMPLETED')
+
+
+def _time_round_trip(dumps, loads):
+    t_start = time.time()
+    data = dumps()
+    t_dumps = time.time() - t_start
+    t_start = time.time()
+    loads(data)
+    return t_dumps, time.time() - t_start, len(data)
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark pickling of FireWorks')
+    parser.add_argument('-n', '--nfws', default=200, type=int, help='number of FireWorks')
+    parser.add_argument('--spec-size', default=200, type=int, help='number of keys in each spec')
+    parser.add_argument('--launches', default=5, type=int, help='number of Launches per FireWork')
+    args = parser.parse_args()
+
+    fws = [make_fw(i, args.spec_size, args.launches) for i in range(args.nfws)]
+    protocol = pickle.HIGHEST_PROTOCOL
+    methods = [
+        ('pickle', lambda: pickle.dumps(fws, protocol), pickle.loads),
+        ('to_dict/from_dict', lambda: pickle.dumps([fw.to_dict() for fw in fws], protocol),
+         lambda data: [FireWork.from_dict(d) for d in pickle.loads(data)])]
+
+    print('{:<20} {:>10} {:>10} {:>10}'.format('', 'dumps (s)', 'loads (s)', 'size (MB)'))
+    for name, dumps, loads in methods:
+        t_dumps, t_loads, size = _time_round_trip(dumps, loads)
+        print('{:<20} {:>10.3f} {:>10.3f} {:>10.1f}'.format(name, t_dumps, t_loads, size / 1e6))
+
+
+if __name__ == '__main__':
+    main()
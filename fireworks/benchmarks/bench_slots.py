@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the memory held by a large Workflow, each FireWork with a Launch and a Tracker, and of
+reading the time fields of its Launches (time_start, time_end, time_reserved, last_pinged). The
+memory is measured with tracemalloc, so this needs Python 3.4+.
+
+    python -m fireworks.benchmarks.bench_slots -n 100000
+
+FireWork, Launch, Tracker and FWorker use __slots__; to see what they save, run the benchmark
+again on a checkout from before they were added. The time fields are cached by each Launch, and the
+"uncached" row computes them from the state history at every read, as they used to be.
+"""
+
+from argparse import ArgumentParser
+import gc
+import time
+import tracemalloc
+
+from fireworks.core.firework import FireWork, Launch, Tracker, Workflow
+from fireworks.core.fworker import FWorker
+from fireworks.user_objects.firetasks.script_task import ScriptTask
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+TIME_FIELDS = [('time_start', 'RUNNING', False), ('time_end', ['COMPLETED', 'FIZZLED'], False),
+               ('time_reserved', 'RESERVED', False), ('last_pinged', 'RUNNING', True)]
+
+
+def make_fw(fw_id):
+    launch = Launch('RESERVED', '/tmp/launch_{}'.format(fw_id), fworker=FWorker(), host='host',
+                    ip='127.0.0.1', trackers=[Tracker('OUTCAR')], launch_id=fw_id, fw_id=fw_id)
+    launch.state = 'RUNNING'
+    launch.state = 'COMPLETED'
+    return FireWork(ScriptTask.from_str('echo "benchmark"'), fw_id=fw_id, launches=[launch],
+                    state='COMPLETED')
+
+
+def make_wf(nfws):
+    fws = [make_fw(i) for i in range(1, nfws + 1)]
+    # a chain, so that every FireWork has a link
+    return Workflow(fws, {i: [i + 1] for i in range(1, nfws)})
+
+
+def _read_cached(launches):
+    for launch in launches:
+        for name, _, _ in TIME_FIELDS:
+            getattr(launch, name)
+
+
+def _read_uncached(launches):
+    for launch in launches:
+        for _, states, use_update_time in TIME_FIELDS:
+            launch._get_time(states, use_update_time)
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark the memory and time fields of a large Workflow')
+    parser.add_argument('-n', '--nfws', default=100000, type=int, help='number of FireWorks')
+    parser.add_argument('--reads', default=5, type=int,
+                        help='number of times the time fields of every Launch are read')
+    args = parser.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    wf = make_wf(args.nfws)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('memory of a Workflow of {} FireWorks: {:.1f} MB'.format(args.nfws, memory / 1e6))
+
+    launches = [l for fw in wf.id_fw.values() for l in fw.launches]
+    print('{:<20} {:>10}'.format('time fields', 'time (s)'))
+    for name, read in [('cached', _read_cached), ('uncached', _read_uncached)]:
+        t_start = time.time()
+        for _ in range(args.reads):
+            read(launches)
+        print('{:<20} {:>10.3f}'.format(name, time.time() - t_start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of LaunchPad heartbeat throughput under different write concerns,
+and of reporting queries under different read preferences.
+
+Start a local replica set first, e.g.:
+
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0 --journal
+    mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1 --journal
+    mongo --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}]})'
+
+and then run:
+
+    python -m fireworks.benchmarks.bench_write_concern \\
+        --host "mongodb://localhost:27017,localhost:27018/?replicaSet=rs0"
+"""
+
+from argparse import ArgumentParser
+import shutil
+import tempfile
+import time
+
+from fireworks.core.firework import FireWork
+from fireworks.core.fworker import FWorker
+from fireworks.core.launchpad import LaunchPad
+from fireworks.user_objects.firetasks.script_task import ScriptTask
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+BENCHDB_NAME = 'fireworks_benchmark'
+
+WRITE_CONCERNS = [('journaled', {'ping': {'j': True}}),
+                  ('w=1', {'ping': {'w': 1}})]
+
+READ_PREFERENCES = ['primary', 'secondaryPreferred']
+
+
+def _time_calls(func, ncalls):
+    t_start = time.time()
+    for _ in range(ncalls):
+        func()
+    return ncalls / (time.time() - t_start)
+
+
+def bench_pings(host, port, nops, write_concerns):
+    lp = LaunchPad(host, port, BENCHDB_NAME, strm_lvl='ERROR',
+                   write_concerns=write_concerns)
+    lp.reset(None, require_password=False)
+    lp.add_wf(FireWork(ScriptTask.from_str('echo "benchmark"')))
+
+    launch_dir = tempfile.mkdtemp()
+    try:
+        _, launch_id = lp.checkout_fw(FWorker(), launch_dir)
+        return _time_calls(lambda: lp.ping_launch(launch_id), nops)
+    finally:
+        shutil.rmtree(launch_dir)
+
+
+def bench_reports(host, port, nops, read_preference):
+    lp = LaunchPad(host, port, BENCHDB_NAME, strm_lvl='ERROR',
+                   read_preference=read_preference)
+    return _time_calls(lambda: lp.get_fw_ids({'state': 'RUNNING'}), nops)
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark LaunchPad write concerns '
+                                        'and read preferences')
+    parser.add_argument('--host', default='localhost',
+                        help='host or mongodb:// URI of the (replica set) database')
+    parser.add_argument('--port', default=27017, type=int)
+    parser.add_argument('-n', '--nops', default=2000, type=int,
+                        help='number of operations per measurement')
+    args = parser.parse_args()
+
+    print('Heartbeats (ping_launch) per second:')
+    for name, wc in WRITE_CONCERNS:
+        print('  {:<20} {:>10.1f}'.format(
+            name, bench_pings(args.host, args.port, args.nops, wc)))
+
+    print('Reporting queries (get_fw_ids) per second:')
+    for rp in READ_PREFERENCES:
+        print('  {:<20} {:>10.1f}'.format(
+            rp, bench_reports(args.host, args.port, args.nops, rp)))
+
+    LaunchPad(args.host, args.port, BENCHDB_NAME, strm_lvl='ERROR')\
+        .connection.drop_database(BENCHDB_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+"""
+An asyncio interface to the LaunchPad. The core LaunchPad operations are
+exposed as coroutines so that monitoring services and submission gateways can
+serve many concurrent requests from a single event loop.
+
+The blocking pymongo calls are run in a bounded pool of threads that share the
+connection pool of a single LaunchPad. Concurrent heartbeats for the same
+Launch are coalesced into a single database round trip.
+
+This module requires Python 3.7+. It is not imported by the fireworks package,
+so import it directly: from fireworks.core.async_launchpad import AsyncLaunchPad
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
+from fireworks.core.firework import FireWork
+from fireworks.core.launchpad import LaunchPad
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+ASYNC_LP_WORKERS = 16  # default number of threads performing DB operations
+
+
+class AsyncLaunchPad(object):
+    """
+    Wraps a LaunchPad and exposes its operations as coroutines.
+    """
+
+    def __init__(self, launchpad=None, max_workers=ASYNC_LP_WORKERS):
+        """
+        :param launchpad: (LaunchPad) the LaunchPad to wrap; default is LaunchPad.auto_load()
+        :param max_workers: (int) maximum number of DB operations running at once
+        """
+        self.launchpad = launchpad if launchpad else LaunchPad.auto_load()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pings = {}  # launch_id -> in-flight ping future
+
+    @classmethod
+    def from_file(cls, filename, max_workers=ASYNC_LP_WORKERS):
+        return cls(LaunchPad.from_file(filename), max_workers)
+
+    def _run(self, func, *args, **kwargs):
+        """
+        (internal method) Run a blocking LaunchPad call in the executor. Must be
+        called from a coroutine.
+
+        :return: (asyncio.Future)
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor,
+                                    functools.partial(func, *args, **kwargs))
+
+    async def add_wf(self, wf, reassign_all=True):
+        return await self._run(self.launchpad.add_wf, wf, reassign_all)
+
+    async def checkout_fw(self, fworker, launch_dir, fw_id=None, host=None, ip=None):
+        return await self._run(self.launchpad.checkout_fw, fworker, launch_dir,
+                               fw_id, host, ip)
+
+    async def reserve_fw(self, fworker, launch_dir, host=None, ip=None):
+        return await self._run(self.launchpad.reserve_fw, fworker, launch_dir,
+                               host, ip)
+
+    async def complete_launch(self, launch_id, action, state='COMPLETED'):
+        return await self._run(self.launchpad.complete_launch, launch_id,
+                               action, state)
+
+    async def ping_launch(self, launch_id, ptime=None):
+        """
+        Ping a Launch. If a ping of the same Launch is already in flight (and
+        no explicit time is given), wait for that one instead of issuing
+        another DB write.
+        """
+        if ptime is not None:
+            return await self._run(self.launchpad.ping_launch, launch_id, ptime)
+
+        future = self._pings.get(launch_id)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._run(self.launchpad.ping_launch, launch_id))
+            self._pings[launch_id] = future
+            future.add_done_callback(lambda f: self._pings.pop(launch_id, None))
+        return await asyncio.shield(future)
+
+    async def run_exists(self, fworker=None):
+        return await self._run(self.launchpad.run_exists, fworker)
+
+    async def get_fw_by_id(self, fw_id):
+        return await self._run(self.launchpad.get_fw_by_id, fw_id)
+
+    async def get_launch_by_id(self, launch_id):
+        return await self._run(self.launchpad.get_launch_by_id, launch_id)
+
+    async def get_wf_by_fw_id(self, fw_id):
+        return await self._run(self.launchpad.get_wf_by_fw_id, fw_id)
+
+    async def get_fw_ids(self, query=None, sort=None, limit=0, count_only=False):
+        return await self._run(self.launchpad.get_fw_ids, query, sort, limit,
+                               count_only)
+
+    async def get_wf_ids(self, query=None, sort=None, limit=0, count_only=False):
+        return await self._run(self.launchpad.get_wf_ids, query, sort, limit,
+                               count_only)
+
+    async def get_wf_summary_dict(self, fw_id, mode="more"):
+        return await self._run(self.launchpad.get_wf_summary_dict, fw_id, mode)
+
+    async def get_tracker_data(self, fw_id):
+        return await self._run(self.launchpad.get_tracker_data, fw_id)
+
+    async def get_fw_stats(self, query=None):
+        """
+        Count FireWorks in each state, querying all states concurrently
+
+        :param query: (dict) optional Mongo query restricting the FireWorks counted
+        :return: (dict) state -> number of FireWorks
+        """
+        states = sorted(FireWork.STATE_RANKS, key=FireWork.STATE_RANKS.get)
+        counts = await asyncio.gather(
+            *[self.get_fw_ids(dict(query or {}, state=s), count_only=True)
+              for s in states])
+        return dict(zip(states, counts))
+
+    def close(self, wait=True):
+        """
+        Shut down the executor. The wrapped LaunchPad is left open.
+        """
+        self._executor.shutdown(wait=wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
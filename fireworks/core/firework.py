@@ -14,8 +14,9 @@ FireTasks)
 to do next after a job completes
 """
 
-from collections import defaultdict, OrderedDict
+from collections import Counter, defaultdict, OrderedDict
 import abc
+import codecs
 from datetime import datetime
 import os
 import pprint
@@ -26,9 +27,10 @@ from six import add_metaclass
 
 from fireworks.fw_config import TRACKER_LINES, NEGATIVE_FWID_CTR
 from fireworks.core.fworker import FWorker
+from fireworks.utilities.dag import CompactDAG
 from fireworks.utilities.dict_mods import apply_mod
 from fireworks.utilities.fw_serializers import FWSerializable, \
-    recursive_serialize, recursive_deserialize, serialize_fw
+    recursive_serialize, recursive_deserialize, serialize_fw, load_object, _new_object
 from fireworks.utilities.fw_utilities import get_my_host, get_my_ip, \
     NestedClassGetter
 from fireworks.utilities.timing import get_fw_timer
@@ -70,6 +72,12 @@ class FireTaskBase(defaultdict, FWSerializable):
     def __init__(self, *args, **kwargs):
         dict.__init__(self, *args, **kwargs)
 
+    def __reduce__(self):
+        # the reduce of defaultdict would call the class without parameters, which fails the
+        # required_params check, so the parameters are restored as dict items instead
+        state = (self.__dict__,) if self.__dict__ else None  # see FWSerializable.__setstate__
+        return _new_object, (self.__class__,), state, None, iter(self.items())
+
     @abc.abstractmethod
     def run_task(self, fw_spec):
         """
@@ -116,6 +124,8 @@ class FWAction(FWSerializable):
      return commands that alter the workflow.
     """
 
+    _pickle_attributes = True
+
     def __init__(self, stored_data=None, exit=False, update_spec=None,
                  mod_spec=None, additions=None, detours=None,
                  defuse_children=False):
@@ -186,11 +196,17 @@ class FireWork(FWSerializable):
     STATE_RANKS = {'ARCHIVED': -2, 'FIZZLED': -1, 'DEFUSED': 0, 'WAITING': 1, 'READY': 2,
                    'RESERVED': 3,  'RUNNING': 4, 'COMPLETED': 5}
 
+    # large Workflows hold many FireWorks and Launches in memory, so these classes use __slots__
+    __slots__ = ('_tasks', 'spec', 'name', 'fw_id', 'launches', 'archived_launches', 'created_on',
+                 'parents', 'state')
+    _pickle_attributes = True
+
     def __init__(self, tasks, spec=None, name=None, launches=None,
                  archived_launches=None, state='WAITING', created_on=None,
                  fw_id=None, parents=None):
         """
-        :param tasks: ([FireTask]) a list of FireTasks to run in sequence
+        :param tasks: ([FireTask]) a list of FireTasks to run in sequence. Serialized FireTasks
+        (dicts) are only instantiated when the tasks attribute is first accessed.
         :param spec: (dict) specification of the job to run. Used by the
         FireTask
         :param launches: ([Launch]) a list of Launch objects of this FireWork
@@ -204,10 +220,8 @@ class FireWork(FWSerializable):
 
         tasks = tasks if isinstance(tasks, (list, tuple)) else [tasks]
 
-        self.tasks = tasks
         self.spec = spec.copy() if spec else {}
-        self.spec['_tasks'] = [t.to_dict() for t in
-                               tasks]  # put tasks in a special location of the spec
+        self.tasks = tasks
 
         self.name = name or 'Unnamed FW'  # do it this way to prevent None
         # names
@@ -227,6 +241,25 @@ class FireWork(FWSerializable):
 
         self.state = state
 
+    @property
+    def tasks(self):
+        """
+        :return: ([FireTask]) the FireTasks, instantiated from the spec on first access
+        """
+        if self._tasks is None:
+            self._tasks = [load_object(t) for t in self.spec['_tasks']]
+        return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks):
+        if all(isinstance(t, FWSerializable) for t in tasks):
+            self._tasks = list(tasks)
+        else:
+            self._tasks = None
+        # put tasks in a special location of the spec
+        self.spec['_tasks'] = [t.to_dict() if isinstance(t, FWSerializable) else t
+                               for t in tasks]
+
     @recursive_serialize
     def to_dict(self):
         m_dict = {'spec': self.spec, 'fw_id': self.fw_id,
@@ -273,9 +306,16 @@ class FireWork(FWSerializable):
         return m_dict
 
     @classmethod
-    @recursive_deserialize
     def from_dict(cls, m_dict):
-        tasks = m_dict['spec']['_tasks']
+        # keep the FireTasks serialized, so that loading a FireWork doesn't import the modules of
+        # its FireTasks unless they are needed
+        spec = dict(m_dict['spec'])
+        tasks = spec.pop('_tasks')
+        return cls._from_dict(dict(m_dict, spec=spec), tasks)
+
+    @classmethod
+    @recursive_deserialize
+    def _from_dict(cls, m_dict, tasks):
         launches = [Launch.from_dict(tmp) for tmp in m_dict.get('launches', [])]
         archived_launches = [Launch.from_dict(tmp) for tmp in
                              m_dict.get('archived_launches', [])]
@@ -297,18 +337,32 @@ class Tracker(FWSerializable, object):
     """
 
     MAX_TRACKER_LINES = 1000
+    # appending more than this many bytes per tracked line re-reads the end of the file instead
+    MAX_APPENDED_BYTES_PER_LINE = 4096
+
+    __slots__ = ('filename', 'nlines', 'content', 'file_stat')
+    _pickle_attributes = True
 
-    def __init__(self, filename, nlines=TRACKER_LINES, content=''):
+    def __init__(self, filename, nlines=TRACKER_LINES, content='', file_stat=None):
+        """
+        :param filename: (str) the file to monitor
+        :param nlines: (int) number of lines to keep
+        :param content: (str) the last lines read
+        :param file_stat: (dict) inode, size and mtime of the file when it was last read, and the
+        offset up to which it was read (used to only read what was appended since)
+        """
         if nlines > self.MAX_TRACKER_LINES:
             raise ValueError("Tracker only supports a maximum of {} lines; you put {}.".format(
                 self.MAX_TRACKER_LINES, nlines))
         self.filename = filename
         self.nlines = nlines
         self.content = content
+        self.file_stat = file_stat
 
     def track_file(self, launch_dir=None):
         """
-        Reads the monitored file and returns back the last N lines
+        Reads the monitored file and returns back the last N lines. Nothing is read if the file
+        hasn't changed since the last call, and only the appended bytes are read if it has grown.
         :param launch_dir: directory where job was launched in case of relative filename
         :return:
         """
@@ -316,26 +370,78 @@ class Tracker(FWSerializable, object):
         if launch_dir and not os.path.isabs(self.filename):
             m_file = os.path.join(launch_dir, m_file)
 
-        lines = []
         if os.path.exists(m_file):
-            with zopen(zpath(m_file)) as f:
-                for l in reverse_readline(f):
-                    lines.append(l)
-                    if len(lines) == self.nlines:
-                        break
-            self.content = '\n'.join(reversed(lines))
+            st = os.stat(m_file)
+            new_stat = {'inode': st.st_ino, 'size': st.st_size, 'mtime': st.st_mtime}
+            old_stat = self.file_stat or {}
+
+            if all(old_stat.get(k) == v for k, v in new_stat.items()):
+                return self.content  # unchanged
+
+            if os.path.splitext(m_file)[1].upper() not in ('.GZ', '.Z', '.BZ2'):
+                # plain file: read only what was appended, unless it was replaced or truncated
+                if old_stat.get('inode') == st.st_ino and old_stat.get('offset', 0) <= st.st_size \
+                        and 'offset' in old_stat and st.st_size - old_stat['offset'] <= \
+                        self.nlines * self.MAX_APPENDED_BYTES_PER_LINE:
+                    new_stat['offset'] = self._read_appended(m_file, old_stat['offset'])
+                else:
+                    self.content = self._read_last_lines(m_file)
+                    new_stat['offset'] = st.st_size
+            else:
+                # compressed file: it can't be read from an offset cheaply, so read it again
+                self.content = self._read_last_lines(m_file)
+            self.file_stat = new_stat
 
         return self.content
 
+    def _read_last_lines(self, m_file):
+        lines = []
+        with zopen(zpath(m_file), 'rt') as f:
+            for l in reverse_readline(f):
+                lines.append(l.rstrip('\n'))
+                if len(lines) == self.nlines:
+                    break
+        return '\n'.join(reversed(lines))
+
+    def _read_appended(self, m_file, offset):
+        """
+        Add the lines appended to the file since offset to the content
+
+        :return: (int) the new offset, which stops before a character that is not fully written
+        """
+        with open(m_file, 'rb') as f:
+            # is the appended data the continuation of the last line?
+            new_line = True
+            if offset > 0:
+                f.seek(offset - 1)
+                new_line = f.read(1) == b'\n'
+            data = f.read()
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        text = decoder.decode(data)
+        n_pending = len(decoder.getstate()[0])  # the start of a multibyte character
+        data = data[:len(data) - n_pending]
+        if text.endswith('\n'):
+            text = text[:-1]
+        if text or not new_line:
+            lines = self.content.split('\n') if self.content else []
+            new_lines = text.split('\n')
+            if lines and not new_line:
+                lines[-1] += new_lines.pop(0)
+            self.content = '\n'.join((lines + new_lines)[-self.nlines:])
+        return offset + len(data)
+
     def to_dict(self):
         m_dict = {'filename': self.filename, 'nlines': self.nlines}
         if self.content:
             m_dict['content'] = self.content
+        if self.file_stat:
+            m_dict['file_stat'] = self.file_stat
         return m_dict
 
     @classmethod
     def from_dict(cls, m_dict):
-        return Tracker(m_dict['filename'], m_dict['nlines'], m_dict.get('content', ''))
+        return Tracker(m_dict['filename'], m_dict['nlines'], m_dict.get('content', ''),
+                       m_dict.get('file_stat'))
 
     def __str__(self):
         return '### Filename: {}\n{}'.format(self.filename, self.content)
@@ -348,6 +454,10 @@ class Launch(FWSerializable, object):
     """
     _tm = get_fw_timer("Launch")
 
+    __slots__ = ('launch_dir', 'fworker', 'host', 'ip', 'trackers', 'action', '_state_history',
+                 '_state', 'launch_id', 'fw_id', '_times')
+    _pickle_attributes = True
+
     def __init__(self, state, launch_dir, fworker=None, host=None, ip=None,
                  trackers=None, action=None, state_history=None,
                  launch_id=None, fw_id=None):
@@ -390,19 +500,37 @@ class Launch(FWSerializable, object):
         """
         update_time = update_time or datetime.utcnow()
         self.state_history[-1]['updated_on'] = update_time
+        self._times = None
 
-    def set_reservation_id(self, reservation_id):
+    def set_reservation_id(self, reservation_id, queue=None):
         """
         Adds the job_id to the reservation
 
         :param reservation_id: (str) the id of the reservation (e.g.,
         queue reservation)
+        :param queue: (dict) the queue the job was submitted to (e.g., host and
+        q_type)
         """
         for data in self.state_history:
             if data['state'] == 'RESERVED' and 'reservation_id' not in data:
                 data['reservation_id'] = str(reservation_id)
+                if queue:
+                    data['queue'] = queue
                 break
 
+    @property
+    def state_history(self):
+        """
+        :return: ([dict]) a history of all states of the Launch and when they occurred. Entries
+        changed in place must be followed by an assignment of state_history, to update the times.
+        """
+        return self._state_history
+
+    @state_history.setter
+    def state_history(self, state_history):
+        self._state_history = state_history
+        self._times = None  # name -> time from the state history, see _get_cached_time()
+
     @property
     def state(self):
         """
@@ -426,21 +554,21 @@ class Launch(FWSerializable, object):
         """
         :return: (datetime) the time the Launch started RUNNING
         """
-        return self._get_time('RUNNING')
+        return self._get_cached_time('time_start', 'RUNNING')
 
     @property
     def time_end(self):
         """
         :return: (datetime) the time the Launch was COMPLETED or FIZZLED
         """
-        return self._get_time(['COMPLETED', 'FIZZLED'])
+        return self._get_cached_time('time_end', ['COMPLETED', 'FIZZLED'])
 
     @property
     def time_reserved(self):
         """
         :return: (datetime) the time the Launch was RESERVED in the queue
         """
-        return self._get_time('RESERVED')
+        return self._get_cached_time('time_reserved', 'RESERVED')
 
     @property
     def last_pinged(self):
@@ -448,7 +576,7 @@ class Launch(FWSerializable, object):
         :return: (datetime) the time the Launch last pinged a heartbeat that
         it was still running
         """
-        return self._get_time('RUNNING', True)
+        return self._get_cached_time('last_pinged', 'RUNNING', True)
 
     @property
     def runtime_secs(self):
@@ -516,6 +644,7 @@ class Launch(FWSerializable, object):
         if state != last_state:
             now_time = datetime.utcnow()
             self.state_history.append({'state': state, 'created_on': now_time})
+            self._times = None
             if state in ['RUNNING', 'RESERVED']:
                 self.touch_history()  # add updated_on key
 
@@ -536,12 +665,28 @@ class Launch(FWSerializable, object):
                     return data['updated_on']
                 return data['created_on']
 
+    def _get_cached_time(self, key, states, use_update_time=False):
+        """
+        Internal method that returns _get_time(states, use_update_time), computed once per change
+        of the state history
+
+        :param key: (str) name of the time in the cache
+        """
+        if self._times is None:
+            self._times = {}
+        elif key in self._times:
+            return self._times[key]
+        self._times[key] = self._get_time(states, use_update_time)
+        return self._times[key]
+
 
 class Workflow(FWSerializable):
     """
     A Workflow connects a group of FireWorks in an execution order
     """
 
+    _pickle_attributes = True
+
     class Links(dict, FWSerializable):
         """
         An inner class for storing the DAG links between FireWorks
@@ -566,24 +711,62 @@ class Workflow(FWSerializable):
                             pass  # garbage input
                     del self[k]
 
+        # The graph queries go through a CompactDAG, built on first use and dropped whenever an
+        # item is set or removed. A list of children must therefore be replaced, not modified in
+        # place, e.g. links[fw_id] = links[fw_id] + [child_id]
+        _dag = None
+
+        def __setitem__(self, key, value):
+            self._dag = None
+            super(Workflow.Links, self).__setitem__(key, value)
 
+        def __delitem__(self, key):
+            self._dag = None
+            super(Workflow.Links, self).__delitem__(key)
+
+        def clear(self):
+            self._dag = None
+            super(Workflow.Links, self).clear()
+
+        def pop(self, *args):
+            self._dag = None
+            return super(Workflow.Links, self).pop(*args)
+
+        def popitem(self):
+            self._dag = None
+            return super(Workflow.Links, self).popitem()
+
+        def setdefault(self, *args):
+            self._dag = None
+            return super(Workflow.Links, self).setdefault(*args)
+
+        def update(self, *args, **kwargs):
+            self._dag = None
+            super(Workflow.Links, self).update(*args, **kwargs)
+
+        @property
+        def dag(self):
+            """
+            :return: (CompactDAG) array-backed copy of the links, for graph queries
+            """
+            if self._dag is None:
+                self._dag = CompactDAG(self)
+            return self._dag
 
         @property
         def nodes(self):
-            allnodes = list(self.keys())
-            for v in self.values():
-                allnodes.extend(v)
-            return list(set(allnodes))
+            return list(self.dag.ids)
 
         @property
         def parent_links(self):
-            # note: if performance of parent_links becomes an issue,
-            # override delitem/setitem to update parent_links
-            child_parents = defaultdict(list)
-            for (parent, children) in self.items():
-                for child in children:
-                    child_parents[child].append(parent)
-            return dict(child_parents)
+            return self.dag.parent_links()
+
+        def get_parents(self, fw_id):
+            """
+            :param fw_id: (int)
+            :return: ([int]) ids of the parent FireWorks
+            """
+            return self.dag.parents(fw_id)
 
         def to_dict(self):
             # convert to str form for Mongo, which cannot have int keys
@@ -646,7 +829,7 @@ class Workflow(FWSerializable):
                 if pfw.fw_id not in self.links:
                     raise ValueError("FW_id: {} defines a dependent link to FW_id: {}, but the latter was not added to the workflow!".format(fw.fw_id, pfw.fw_id))
                 if fw.fw_id not in self.links[pfw.fw_id]:
-                    self.links[pfw.fw_id].append(fw.fw_id)
+                    self.links[pfw.fw_id] = self.links[pfw.fw_id] + [fw.fw_id]
 
         self.name = name
 
@@ -663,23 +846,30 @@ class Workflow(FWSerializable):
     def fws(self):
         return list(self.id_fw.values())
 
+    @property
+    def state_counts(self):
+        """
+        :return: (Counter) number of FireWorks in each state
+        """
+        return Counter(fw.state for fw in self.id_fw.values())
+
     @property
     def state(self):
 
         # get state of workflow
         m_state = 'READY'
-        states = [fw.state for fw in self.fws]
-        if all([s == 'COMPLETED' for s in states]):
+        counts = self.state_counts
+        if counts['COMPLETED'] == len(self.id_fw):
             m_state = 'COMPLETED'
-        elif all([s == 'ARCHIVED' for s in states]):
+        elif counts['ARCHIVED'] == len(self.id_fw):
             m_state = 'ARCHIVED'
-        elif any([s == 'DEFUSED' for s in states]):
+        elif counts['DEFUSED']:
             m_state = 'DEFUSED'
-        elif any([s == 'FIZZLED' for s in states]):
+        elif counts['FIZZLED']:
             m_state = 'FIZZLED'
-        elif any([s == 'COMPLETED' for s in states]) or any([s == 'RUNNING' for s in states]):
+        elif counts['COMPLETED'] or counts['RUNNING']:
             m_state = 'RUNNING'
-        elif any([s == 'RESERVED' for s in states]):
+        elif counts['RESERVED']:
             m_state = 'RESERVED'
 
         return m_state
@@ -743,14 +933,12 @@ class Workflow(FWSerializable):
         """
 
         updated_ids = updated_ids if updated_ids else set()
-        m_fw = self.id_fw[fw_id]
-        m_fw._rerun()
-        updated_ids.add(fw_id)
 
-        # re-run all the children
-        for child_id in self.links[fw_id]:
-            updated_ids = updated_ids.union(
-                self.rerun_fw(child_id, updated_ids))
+        # re-run the FireWork and all its descendants; the descendants are left WAITING, as their
+        # ancestor fw_id is, so only fw_id itself needs a refresh
+        for m_id in self.links.dag.descendants([fw_id]):
+            self.id_fw[m_id]._rerun()
+            updated_ids.add(m_id)
 
         # refresh the WF to get the states updated
         return self.refresh(fw_id, updated_ids)
@@ -789,8 +977,7 @@ class Workflow(FWSerializable):
                 self.links[new_fw.fw_id] = wf.links[new_fw.fw_id]
             updated_ids.append(new_fw.fw_id)
 
-        for root_id in root_ids:
-            self.links[fw_id].append(root_id)  # add the root id as my child
+        self.links[fw_id] = self.links[fw_id] + root_ids  # add the root ids as my children
 
         return updated_ids
 
@@ -814,8 +1001,7 @@ class Workflow(FWSerializable):
             return updated_ids
 
         # what are the parent states?
-        parent_states = [self.id_fw[p].state for p in
-                         self.links.parent_links.get(fw_id, [])]
+        parent_states = [self.id_fw[p].state for p in self.links.get_parents(fw_id)]
 
         completed_parent_states = ['COMPLETED']
         if fw.spec.get('_allow_fizzled_parents'):
@@ -844,7 +1030,7 @@ class Workflow(FWSerializable):
             # This part is confusing and rare - report any FIZZLED parents if allow_fizzed
             # allows us to handle FIZZLED jobs
             if fw.spec.get('_allow_fizzled_parents'):
-                parent_fws = [self.id_fw[p].to_dict() for p in self.links.parent_links.get(fw_id, []) if self.id_fw[p].state == 'FIZZLED']
+                parent_fws = [self.id_fw[p].to_dict() for p in self.links.get_parents(fw_id) if self.id_fw[p].state == 'FIZZLED']
                 if len(parent_fws) > 0:
                     fw.spec['_fizzled_parents'] = parent_fws
                     updated_ids.add(fw_id)
@@ -875,10 +1061,7 @@ class Workflow(FWSerializable):
         :return: ([int]) FireWork ids of root FWs
         """
 
-        all_ids = set(self.links.nodes)
-        child_ids = set(self.links.parent_links.keys())
-        root_ids = all_ids.difference(child_ids)
-        return list(root_ids)
+        return self.links.dag.roots()
 
     @property
     def leaf_fw_ids(self):
@@ -888,11 +1071,7 @@ class Workflow(FWSerializable):
         :return: ([int]) FireWork ids of leaf FWs
         """
 
-        leaf_ids = []
-        for id, children in self.links.items():
-            if len(children) == 0:
-                leaf_ids.append(id)
-        return leaf_ids
+        return self.links.dag.leaves()
 
     def _reassign_ids(self, old_new):
         """
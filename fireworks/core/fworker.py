@@ -20,6 +20,9 @@ __date__ = 'Dec 12, 2012'
 
 class FWorker(FWSerializable):
 
+    __slots__ = ('name', 'category', '_query', 'env')
+    _pickle_attributes = True
+
     def __init__(self, name="Automatically generated Worker", category='',
                  query=None, env=None):
         """
@@ -11,14 +11,16 @@ import traceback
 from collections import OrderedDict
 
 from pymongo.mongo_client import MongoClient
-from pymongo import DESCENDING, ASCENDING
+from pymongo.collection import Collection
+from pymongo import DESCENDING, ASCENDING, ReadPreference
 
 from fireworks.fw_config import LAUNCHPAD_LOC, CONFIG_FILE_DIR, SORT_FWS, \
-    RESERVATION_EXPIRATION_SECS, RUN_EXPIRATION_SECS, MAINTAIN_INTERVAL
+    RESERVATION_EXPIRATION_SECS, RUN_EXPIRATION_SECS, MAINTAIN_INTERVAL, OFFLINE_RECOVERY_THREADS, \
+    QUEUE_STATE_TTL
 from fireworks.utilities.fw_serializers import FWSerializable
 from fireworks.core.firework import FireWork, Launch, Workflow, FWAction, \
     Tracker
-from fireworks.utilities.fw_utilities import get_fw_logger
+from fireworks.utilities.fw_utilities import get_fw_logger, get_my_host
 from fireworks.utilities.timing import get_fw_timer
 
 
@@ -34,6 +36,27 @@ __date__ = 'Jan 30, 2013'
 
 m_timer = get_fw_timer("LaunchPad")
 
+# write concerns per class of operation. "state" covers state transitions and
+# id allocation, "ping" covers heartbeats and Tracker updates
+DEFAULT_WRITE_CONCERNS = {'state': {'j': True}, 'ping': {'w': 1}}
+
+READ_PREFERENCES = {'primary': 'PRIMARY',
+                    'primarypreferred': 'PRIMARY_PREFERRED',
+                    'secondary': 'SECONDARY',
+                    'secondarypreferred': 'SECONDARY_PREFERRED',
+                    'nearest': 'NEAREST'}
+
+
+def _get_queue_info(qadapter):
+    """
+    Internal method to tell apart the queues that jobs are submitted to. Clusters sharing a \
+    LaunchPad often use FWorkers of the same (default) name, but not the same submission hosts.
+
+    :param qadapter: (QueueAdapterBase)
+    :return: (dict) the host submitting the jobs and the type of the queue
+    """
+    return {'host': get_my_host(), 'q_type': getattr(qadapter, 'q_type', qadapter.q_name)}
+
 
 class WFLock(object):
     """
@@ -69,7 +92,8 @@ class LaunchPad(FWSerializable):
 
     def __init__(self, host='localhost', port=27017, name='fireworks',
                  username=None, password=None, logdir=None, strm_lvl=None,
-                 user_indices=None, wf_user_indices=None):
+                 user_indices=None, wf_user_indices=None, write_concerns=None,
+                 read_preference=None):
         """
 
         :param host:
@@ -81,6 +105,10 @@ class LaunchPad(FWSerializable):
         :param strm_lvl:
         :param user_indices:
         :param wf_user_indices:
+        :param write_concerns: (dict) write concern per class of operation, e.g.
+        {'state': {'j': True}, 'ping': {'w': 1}}. Missing classes use the defaults.
+        :param read_preference: (str) read preference for reporting queries
+        (get_fw_ids, get_wf_ids, summaries, tracker data), e.g. 'secondaryPreferred'
         """
         self.host = host
         self.port = port
@@ -97,8 +125,12 @@ class LaunchPad(FWSerializable):
         self.user_indices = user_indices if user_indices else []
         self.wf_user_indices = wf_user_indices if wf_user_indices else []
 
-        # get connection
-        self.connection = MongoClient(host, port, j=True)
+        self.write_concerns = dict(DEFAULT_WRITE_CONCERNS)
+        self.write_concerns.update(write_concerns if write_concerns else {})
+        self.read_preference = read_preference
+
+        # get connection; the default write concern is the one for state changes
+        self.connection = MongoClient(host, port, **self.write_concerns['state'])
         self.db = self.connection[name]
         if username:
             self.db.authenticate(username, password)
@@ -109,6 +141,14 @@ class LaunchPad(FWSerializable):
         self.fw_id_assigner = self.db.fw_id_assigner
         self.workflows = self.db.workflows
 
+        # heartbeats and Tracker updates don't need to wait on the journal
+        self._ping_launches = self._get_collection('launches', 'ping')
+
+        # reporting queries can be served by secondaries
+        self._report_fireworks = self._get_collection('fireworks', 'state', read_preference)
+        self._report_launches = self._get_collection('launches', 'state', read_preference)
+        self._report_workflows = self._get_collection('workflows', 'state', read_preference)
+
     def to_dict(self):
         """
         Note: usernames/passwords are exported as unencrypted Strings!
@@ -118,7 +158,9 @@ class LaunchPad(FWSerializable):
             'username': self.username, 'password': self.password,
             'logdir': self.logdir, 'strm_lvl': self.strm_lvl,
             'user_indices': self.user_indices,
-            'wf_user_indices': self.wf_user_indices}
+            'wf_user_indices': self.wf_user_indices,
+            'write_concerns': self.write_concerns,
+            'read_preference': self.read_preference}
 
     @classmethod
     def from_dict(cls, d):
@@ -126,9 +168,11 @@ class LaunchPad(FWSerializable):
         strm_lvl = d.get('strm_lvl', None)
         user_indices = d.get('user_indices', [])
         wf_user_indices = d.get('wf_user_indices', [])
+        write_concerns = d.get('write_concerns', None)
+        read_preference = d.get('read_preference', None)
         return LaunchPad(d['host'], d['port'], d['name'], d['username'],
                          d['password'], logdir, strm_lvl, user_indices,
-                         wf_user_indices)
+                         wf_user_indices, write_concerns, read_preference)
 
     @classmethod
     def auto_load(cls):
@@ -136,6 +180,36 @@ class LaunchPad(FWSerializable):
             return LaunchPad.from_file(LAUNCHPAD_LOC)
         return LaunchPad()
 
+    def _get_collection(self, name, op_class, read_preference=None):
+        """
+        (internal method) Get a collection handle that uses the write concern of
+        the given operation class and, optionally, a read preference
+
+        :param name: (str) name of the collection
+        :param op_class: (str) key of self.write_concerns, e.g. 'state' or 'ping'
+        :param read_preference: (str) e.g. 'secondaryPreferred'; None for the default
+        """
+        wc = self.write_concerns[op_class]
+        rp = None
+        if read_preference:
+            try:
+                rp = getattr(ReadPreference, READ_PREFERENCES[
+                    read_preference.replace('_', '').lower()])
+            except KeyError:
+                raise ValueError("Invalid read preference: {}; choose from {}".format(
+                    read_preference, list(READ_PREFERENCES.keys())))
+
+        if hasattr(self.db, 'get_collection'):  # pymongo >= 3.0
+            from pymongo.write_concern import WriteConcern
+            return self.db.get_collection(name, write_concern=WriteConcern(**wc),
+                                          read_preference=rp)
+
+        coll = Collection(self.db, name)
+        coll.write_concern = wc
+        if rp is not None:
+            coll.read_preference = rp
+        return coll
+
     def reset(self, password, require_password=True):
         """
         Create a new FireWorks database. This will overwrite the existing FireWorks database! \
@@ -159,7 +233,14 @@ class LaunchPad(FWSerializable):
         else:
             raise ValueError("Invalid password! Password is today's date: {}".format(m_password))
 
-    def maintain(self, infinite=True, maintain_interval=None):
+    def maintain(self, infinite=True, maintain_interval=None, qadapter=None, fworker=None):
+        """
+        :param infinite: (bool) keep maintaining every maintain_interval secs
+        :param maintain_interval: (int) secs between maintenance rounds
+        :param qadapter: (QueueAdapterBase) also cancel the reservations of jobs no longer in \
+        this queue (see detect_unqueued)
+        :param fworker: (FWorker) only cancel the reservations of this FWorker
+        """
         maintain_interval = maintain_interval if maintain_interval else MAINTAIN_INTERVAL
 
         while True:
@@ -175,6 +256,11 @@ class LaunchPad(FWSerializable):
             ur = self.detect_unreserved(rerun=True)
             if ur:
                 self.m_logger.info('Unreserved {} RESERVED launches: {}'.format(len(ur), ur))
+            if qadapter:
+                uq = self.detect_unqueued(qadapter, fworker, rerun=True)
+                if uq:
+                    self.m_logger.info('Unreserved {} RESERVED launches no longer in the queue: '
+                                       '{}'.format(len(uq), uq))
 
             self.m_logger.info('LaunchPad was MAINTAINED.')
 
@@ -296,14 +382,14 @@ class LaunchPad(FWSerializable):
         if mode == "all":
             wf_fields = None
 
-        wf = self.workflows.find_one({"nodes": fw_id}, fields=wf_fields)
+        wf = self._report_workflows.find_one({"nodes": fw_id}, fields=wf_fields)
         fw_data = []
         id_name_map = {}
-        for fw in self.fireworks.find({"fw_id": {"$in": wf["nodes"]}},
-                                      fields=fw_fields):
+        for fw in self._report_fireworks.find({"fw_id": {"$in": wf["nodes"]}},
+                                              fields=fw_fields):
             if launch_fields:
                 fw["launches"] = list(
-                    self.launches.find({'launch_id': {"$in": fw['launches']}},
+                    self._report_launches.find({'launch_id': {"$in": fw['launches']}},
                                        fields=launch_fields))
             fw_data.append(fw)
             if mode != "less":
@@ -350,9 +436,9 @@ class LaunchPad(FWSerializable):
         criteria = query if query else {}
 
         if count_only:
-            return self.fireworks.find(criteria, {"fw_id": True}, sort=sort).limit(limit).count()
+            return self._report_fireworks.find(criteria, {"fw_id": True}, sort=sort).limit(limit).count()
 
-        for fw in self.fireworks.find(criteria, {"fw_id": True}, sort=sort).limit(limit):
+        for fw in self._report_fireworks.find(criteria, {"fw_id": True}, sort=sort).limit(limit):
             fw_ids.append(fw["fw_id"])
         return fw_ids
 
@@ -367,9 +453,9 @@ class LaunchPad(FWSerializable):
         wf_ids = []
         criteria = query if query else {}
         if count_only:
-            return self.workflows.find(criteria, {"nodes": True}, sort=sort).limit(limit).count()
+            return self._report_workflows.find(criteria, {"nodes": True}, sort=sort).limit(limit).count()
 
-        for fw in self.workflows.find(criteria, {"nodes": True}, sort=sort).limit(limit):
+        for fw in self._report_workflows.find(criteria, {"nodes": True}, sort=sort).limit(limit):
             wf_ids.append(fw["nodes"][0])
 
         return wf_ids
@@ -538,6 +624,43 @@ class LaunchPad(FWSerializable):
 
         return m_fw, launch_id
 
+    def reserve_fws(self, fworker, launch_dirs, host=None, ip=None):
+        """
+        Reserve a FireWork for each of several launch directories, e.g. for the tasks of a job array
+
+        :param fworker: (FWorker)
+        :param launch_dirs: ([str]) the launch directories; fewer FireWorks than directories are
+        reserved if not enough are ready to run
+        :return: ([(FireWork, int)]) the reserved FireWorks and their launch_ids, in the order of
+        launch_dirs
+        """
+        m_fws = []
+        for _ in launch_dirs:
+            m_fw = self._get_a_fw_to_run(fworker.query)
+            if not m_fw:
+                break
+            m_fws.append(m_fw)
+        if not m_fws:
+            return []
+
+        # take a block of launch ids at once
+        first_launch_id = self.fw_id_assigner.find_and_modify(
+            {}, {'$inc': {'next_launch_id': len(m_fws)}})['next_launch_id']
+        m_launches = []
+        for i, (m_fw, launch_dir) in enumerate(zip(m_fws, launch_dirs)):
+            trackers = [Tracker.from_dict(f) for f in m_fw.spec['_trackers']] \
+                if '_trackers' in m_fw.spec else None
+            m_launch = Launch('RESERVED', launch_dir, fworker, host, ip, trackers=trackers,
+                              launch_id=first_launch_id + i, fw_id=m_fw.fw_id)
+            m_launches.append(m_launch)
+            m_fw.launches.append(m_launch)
+            m_fw.state = 'RESERVED'
+        self.launches.insert([l.to_db_dict() for l in m_launches])
+        self._upsert_fws(list(m_fws))
+        self.m_logger.debug('Reserved FWs with ids: {}'.format([f.fw_id for f in m_fws]))
+
+        return [(m_fw, l.launch_id) for m_fw, l in zip(m_fws, m_launches)]
+
     def get_fw_ids_from_reservation_id(self, reservation_id):
         fw_ids = []
         l_id = self.launches.find_one({"state_history.reservation_id": reservation_id}, {'launch_id': 1})['launch_id']
@@ -561,6 +684,44 @@ class LaunchPad(FWSerializable):
                     if 'reservation_id' in d:
                         return d['reservation_id']
 
+    def get_reserved_launch_jobs(self, qadapter, max_age=None, fworker=None, reserved_before=None):
+        """
+        Look up the jobs of the RESERVED launches in the queue, which is listed once for all of \
+        them (see QueueAdapterBase.get_queue_jobs)
+
+        :param qadapter: (QueueAdapterBase) the adapter of the queue the jobs were submitted to
+        :param max_age: (float) accept a list of jobs at most this many seconds old
+        :param fworker: (FWorker) only look up the launches reserved by this FWorker
+        :param reserved_before: (str) only look up the launches whose job was submitted before \
+        this time (in isoformat)
+        :return: (dict) launch_id -> (reservation_id, QueueJob, or None if the job isn't in the \
+        queue), or None if the queue could not be listed. Only the launches whose job was \
+        submitted to this queue, from this host, are looked up (see set_reservation_id), so \
+        FWorkers of the same name on other clusters are left alone. Offline runs are left out \
+        too: their launches stay RESERVED after the job ends, until recover_offline_runs() \
+        reads them.
+        """
+        jobs = qadapter.get_queue_jobs(max_age=max_age)
+        if jobs is None:
+            return None
+        offline_launch_ids = [r['launch_id'] for r in self.offline_runs.find(
+            {'completed': False, 'deprecated': False}, {'launch_id': 1})]
+        m_query = {'state': 'RESERVED', 'launch_id': {'$nin': offline_launch_ids}}
+        if fworker:
+            m_query['fworker.name'] = fworker.name
+        reserved_query = {'state': 'RESERVED', 'reservation_id': {'$exists': True}}
+        for k, v in _get_queue_info(qadapter).items():
+            reserved_query['queue.' + k] = v
+        if reserved_before:
+            reserved_query['updated_on'] = {'$lte': reserved_before}
+        m_query['state_history'] = {'$elemMatch': reserved_query}
+        launch_jobs = {}
+        for l in self.launches.find(m_query, {'launch_id': 1, 'state_history': 1}):
+            reservation_id = [d['reservation_id'] for d in l['state_history']
+                              if 'reservation_id' in d][-1]
+            launch_jobs[l['launch_id']] = (reservation_id, jobs.get(str(reservation_id)))
+        return launch_jobs
+
     def cancel_reservation(self, launch_id):
         m_launch = self.get_launch_by_id(launch_id)
         m_launch.state = 'READY'
@@ -569,6 +730,63 @@ class LaunchPad(FWSerializable):
         for fw in self.fireworks.find({'launches': launch_id, 'state': 'RESERVED'}, {'fw_id': 1}):
             self.rerun_fw(fw['fw_id'], rerun_duplicates=False)
 
+    def cancel_reservations(self, launch_ids):
+        """
+        Cancel many reservations at once. The launches are updated in a single round trip, and \
+        their FireWorks are re-run one Workflow at a time.
+
+        :param launch_ids: ([int]) the RESERVED launches
+        :return: ([int]) the fw_ids that were re-run
+        """
+        if not launch_ids:
+            return []
+        now_time = datetime.datetime.utcnow().isoformat()
+        self.launches.update({'launch_id': {'$in': launch_ids}, 'state': 'RESERVED'},
+                             {'$set': {'state': 'READY'},
+                              '$push': {'state_history': {'state': 'READY', 'created_on': now_time}}},
+                             multi=True)
+
+        fw_ids = [fw['fw_id'] for fw in self.fireworks.find(
+            {'launches': {'$in': launch_ids}, 'state': 'RESERVED'}, {'fw_id': 1})]
+        for wf_data in self.workflows.find({'nodes': {'$in': fw_ids}}, {'nodes': 1}):
+            wf_fw_ids = set(wf_data['nodes']).intersection(fw_ids)
+            with WFLock(self, wf_data['nodes'][0]):
+                wf = self.get_wf_by_fw_id(wf_data['nodes'][0])
+                updated_ids = set()
+                for fw_id in wf_fw_ids:
+                    updated_ids.update(wf.rerun_fw(fw_id))
+                self._update_wf(wf, updated_ids)
+        return fw_ids
+
+    def detect_unqueued(self, qadapter, fworker=None, max_age=None, rerun=False):
+        """
+        Find the RESERVED launches whose jobs are no longer in the queue, e.g. because they were \
+        cancelled or died before starting, rather than waiting RESERVATION_EXPIRATION_SECS for \
+        them to expire. Only the jobs submitted to this queue from this host are checked, i.e. \
+        those whose reservation id was set with this qadapter.
+
+        :param qadapter: (QueueAdapterBase) the adapter of the queue the jobs were submitted to
+        :param fworker: (FWorker) only check the launches reserved by this FWorker
+        :param max_age: (float) accept a list of jobs at most this many seconds old (default \
+        QUEUE_STATE_TTL)
+        :param rerun: (bool) cancel the reservations
+        :return: ([int]) the launch_ids
+        """
+        max_age = QUEUE_STATE_TTL if max_age is None else max_age
+        # jobs submitted after the queue was listed are not in the list
+        cutoff_timestr = (datetime.datetime.utcnow() -
+                          datetime.timedelta(seconds=max_age)).isoformat()
+        launch_jobs = self.get_reserved_launch_jobs(qadapter, max_age, fworker, cutoff_timestr)
+        if launch_jobs is None:
+            return []  # can't tell which jobs are gone
+
+        # a job that is DONE (e.g. COMPLETED or CANCELLED) never started its Rocket
+        bad_launch_ids = sorted(launch_id for launch_id, (_, job) in launch_jobs.items()
+                                if job is None or job.state == 'DONE')
+        if rerun:
+            self.cancel_reservations(bad_launch_ids)
+        return bad_launch_ids
+
     def detect_unreserved(self, expiration_secs=RESERVATION_EXPIRATION_SECS, rerun=False):
         bad_launch_ids = []
         now_time = datetime.datetime.utcnow()
@@ -640,11 +858,40 @@ class LaunchPad(FWSerializable):
 
         return lost_launch_ids, lost_fw_ids
 
-    def set_reservation_id(self, launch_id, reservation_id):
+    def set_reservation_id(self, launch_id, reservation_id, qadapter=None):
+        """
+        :param launch_id: (int) the RESERVED launch
+        :param reservation_id: (str) e.g. the job id in the queue
+        :param qadapter: (QueueAdapterBase) the adapter of the queue the job was submitted to. \
+        It is recorded, with this host, so that detect_unqueued() can check the job.
+        """
         m_launch = self.get_launch_by_id(launch_id)
-        m_launch.set_reservation_id(reservation_id)
+        m_launch.set_reservation_id(reservation_id,
+                                    _get_queue_info(qadapter) if qadapter else None)
+        m_launch.touch_history()  # the time the job was submitted, see detect_unqueued()
         self.launches.find_and_modify({'launch_id': launch_id}, m_launch.to_db_dict())
 
+    def set_reservation_ids(self, reservation_ids, qadapter=None):
+        """
+        Record the reservation ids of many launches in one round trip
+
+        :param reservation_ids: (dict) launch_id -> reservation_id, e.g. the job id in the queue
+        :param qadapter: (QueueAdapterBase) the adapter of the queue the jobs were submitted to \
+        (see set_reservation_id)
+        """
+        if not reservation_ids:
+            return
+        now_time = datetime.datetime.utcnow().isoformat()
+        m_update = {'state_history.$.updated_on': now_time}
+        if qadapter:
+            m_update['state_history.$.queue'] = _get_queue_info(qadapter)
+        bulk = self.launches.initialize_unordered_bulk_op()
+        for launch_id, reservation_id in reservation_ids.items():
+            # same as set_reservation_id(), on the RESERVED entry of the state history
+            bulk.find({'launch_id': launch_id, 'state_history.state': 'RESERVED'}).update(
+                {'$set': dict(m_update, **{'state_history.$.reservation_id': str(reservation_id)})})
+        bulk.execute()
+
     def checkout_fw(self, fworker, launch_dir, fw_id=None, host=None, ip=None):
         """
         (internal method) Finds a FireWork that's ready to be run, marks it as running,
@@ -736,7 +983,7 @@ class LaunchPad(FWSerializable):
             tracker.track_file(m_launch.launch_dir)
 
         m_launch.touch_history(ptime)
-        self.launches.update({'launch_id': launch_id, 'state': 'RUNNING'},
+        self._ping_launches.update({'launch_id': launch_id, 'state': 'RUNNING'},
             {'$set':{'state_history':m_launch.to_db_dict()['state_history'], 'trackers': [t.to_dict() for t in m_launch.trackers]}})
 
     def get_new_fw_id(self):
@@ -883,10 +1130,87 @@ class LaunchPad(FWSerializable):
         self.offline_runs.insert(d)
 
     def recover_offline(self, launch_id, ignore_errors=False):
+        fw_id, file_stats = self._recover_offline(launch_id, ignore_errors)
+        if file_stats is not None:
+            self.offline_runs.update({"launch_id": launch_id}, {"$set": {
+                "updated_on": datetime.datetime.utcnow().isoformat(), "file_stats": file_stats}})
+        return fw_id
+
+    def recover_offline_runs(self, ignore_errors=False, num_threads=OFFLINE_RECOVERY_THREADS):
+        """
+        Recover all offline runs that are not completed, in parallel. Runs whose FW_ping.json and
+        FW_offline.json have not changed since the last recovery (same mtime and size) are skipped
+        without being read.
+
+        :param ignore_errors: (bool) don't print the tracebacks of failed recoveries
+        :param num_threads: (int) number of runs to recover at once
+        :return: ([int]) the fw_ids that could not be recovered
+        """
+        runs = list(self.offline_runs.find({"completed": False, "deprecated": False},
+                                           {"launch_id": 1, "file_stats": 1}))
+        launch_dirs = dict((l['launch_id'], l['launch_dir']) for l in self.launches.find(
+            {'launch_id': {'$in': [r['launch_id'] for r in runs]}}, {'launch_id': 1, 'launch_dir': 1}))
+
+        def recover(run):
+            launch_id = run['launch_id']
+            old_stats = run.get('file_stats')
+            if old_stats and launch_id in launch_dirs and \
+                    self._offline_file_stats(launch_dirs[launch_id]) == old_stats:
+                return launch_id, None, None
+            return (launch_id,) + self._recover_offline(launch_id, ignore_errors)
+
+        # imported here, so that the LaunchPad doesn't need the futures backport on Python 2
+        from concurrent import futures
+        pool = futures.ThreadPoolExecutor(max_workers=num_threads)
+        try:
+            results = list(pool.map(recover, runs))
+        finally:
+            pool.shutdown()
+
+        # record the new file stats of the recovered runs in one round trip
+        updated = [(launch_id, stats) for launch_id, _, stats in results if stats is not None]
+        if updated:
+            now = datetime.datetime.utcnow().isoformat()
+            bulk = self.offline_runs.initialize_unordered_bulk_op()
+            for launch_id, stats in updated:
+                bulk.find({"launch_id": launch_id}).update(
+                    {"$set": {"updated_on": now, "file_stats": stats}})
+            bulk.execute()
+        self.m_logger.debug("Recovered {} offline runs, {} unchanged".format(
+            len(updated), len(runs) - len(updated)))
+
+        return [fw_id for _, fw_id, _ in results if fw_id]
+
+    @staticmethod
+    def _offline_file_stats(launch_dir):
+        """
+        (internal method) the mtimes and sizes of the files written by an offline run
+
+        :return: (dict) {'ping': [mtime, size], 'offline': [mtime, size]}, None for missing files
+        """
+        stats = {}
+        for k, filename in [('ping', 'FW_ping.json'), ('offline', 'FW_offline.json')]:
+            try:
+                st = os.stat(os.path.join(launch_dir, filename))
+                stats[k] = [st.st_mtime, st.st_size]
+            except OSError:
+                stats[k] = None
+        return stats
+
+    def _recover_offline(self, launch_id, ignore_errors=False):
+        """
+        (internal method) recover an offline run
+
+        :return: (int, dict) the fw_id if the recovery failed (else None), and the file stats of the
+        run as of this recovery (None if the recovery failed)
+        """
         # get the launch directory
         m_launch = self.get_launch_by_id(launch_id)
         try:
             self.m_logger.debug("RECOVERING fw_id: {}".format(m_launch.fw_id))
+            # stat the files before reading them, so that later changes are not missed
+            file_stats = self._offline_file_stats(m_launch.launch_dir)
+
             # look for ping file - update the FireWork if this is the case
             ping_loc = os.path.join(m_launch.launch_dir, "FW_ping.json")
             if os.path.exists(ping_loc):
@@ -903,6 +1227,7 @@ class LaunchPad(FWSerializable):
                     for s in m_launch.state_history:
                         if s['state'] == 'RUNNING':
                             s['created_on'] = datetime.datetime.strptime(offline_data['started_on'], "%Y-%m-%dT%H:%M:%S.%f")
+                    m_launch.state_history = m_launch.state_history  # update the times
                     self.launches.find_and_modify({'launch_id': m_launch.launch_id}, m_launch.to_db_dict(), upsert=True)
 
                 if 'fwaction' in offline_data:
@@ -913,23 +1238,22 @@ class LaunchPad(FWSerializable):
                     for s in m_launch.state_history:
                         if s['state'] == offline_data['state']:
                             s['created_on'] = datetime.datetime.strptime(offline_data['completed_on'], "%Y-%m-%dT%H:%M:%S.%f")
+                    m_launch.state_history = m_launch.state_history
                     self.launches.find_and_modify({'launch_id': m_launch.launch_id}, m_launch.to_db_dict(), upsert=True)
                     self.offline_runs.update({"launch_id": launch_id}, {"$set": {"completed":True}})
 
-            # update the updated_on
-            self.offline_runs.update({"launch_id": launch_id}, {"$set": {"updated_on": datetime.datetime.utcnow().isoformat()}})
-            return None
+            return None, file_stats
         except:
             if not ignore_errors:
                 traceback.print_exc()
-            return m_launch.fw_id
+            return m_launch.fw_id, None
 
     def forget_offline(self, fw_id):
         self.offline_runs.update({"fw_id": fw_id}, {"$set": {"deprecated":True}})
 
     def get_tracker_data(self, fw_id):
         data = []
-        for l in self.launches.find({'fw_id': fw_id}, {'trackers': 1, 'launch_id': 1}):
+        for l in self._report_launches.find({'fw_id': fw_id}, {'trackers': 1, 'launch_id': 1}):
             if 'trackers' in l:  # backwards compatibility
                 trackers = [Tracker.from_dict(t) for t in l['trackers']]
                 data.append({'launch_id': l['launch_id'], 'trackers': trackers})
@@ -11,8 +11,10 @@ import os
 import traceback
 import threading
 from fireworks.core.firework import FWAction, FireWork
-from fireworks.fw_config import FWData, PING_TIME_SECS, REMOVE_USELESS_DIRS, PRINT_FW_JSON, PRINT_FW_YAML, STORE_PACKING_INFO
+from fireworks.fw_config import FWData, PING_TIME_SECS, PING_JITTER_SECS, REMOVE_USELESS_DIRS, PRINT_FW_JSON, \
+    PRINT_FW_YAML, STORE_PACKING_INFO
 from fireworks.utilities.dict_mods import apply_mod
+from fireworks.utilities.scheduler import get_scheduler
 
 __author__ = 'Anubhav Jain'
 __copyright__ = 'Copyright 2013, The Materials Project'
@@ -28,56 +30,80 @@ def do_ping(launchpad, launch_id):
         with open('FW_ping.json', 'w') as f:
             f.write('{"ping_time": "%s"}' % datetime.utcnow().isoformat())
 
-def ping_launch(launchpad, launch_id, stop_event, master_thread):
-    while not stop_event.is_set() and master_thread.isAlive():
-        do_ping(launchpad, launch_id)
-        stop_event.wait(PING_TIME_SECS)
-
 def start_ping_launch(launchpad, launch_id):
     fd = FWData()
     if fd.MULTIPROCESSING:
         if not launch_id:
             raise ValueError("Multiprocessing cannot be run in offline mode!")
-        m = fd.DATASERVER
-        m.Running_IDs()[os.getpid()] = launch_id
+        fd.RUNNING_IDS[fd.SUB_JOB_ID] = launch_id
+        return None
+    elif fd.RUNNING_THREADS is not None:
+        if not launch_id:
+            raise ValueError("Multithreading cannot be run in offline mode!")
+        fd.RUNNING_THREADS[threading.current_thread().ident] = launch_id
         return None
     else:
-        ping_stop = threading.Event()
-        ping_thread = threading.Thread(target=ping_launch,
-                                       args=(launchpad, launch_id, ping_stop, threading.currentThread()))
-        ping_thread.start()
-        return ping_stop
+        return get_scheduler('ping').schedule(do_ping, PING_TIME_SECS, args=(launchpad, launch_id),
+                                              jitter=PING_JITTER_SECS, owner=threading.current_thread())
 
-def stop_backgrounds(ping_stop, btask_stops):
+def stop_backgrounds(ping_job, btask_jobs):
     fd = FWData()
     if fd.MULTIPROCESSING:
-        m = fd.DATASERVER
-        m.Running_IDs()[os.getpid()] = None
+        fd.RUNNING_IDS[fd.SUB_JOB_ID] = 0
+    elif fd.RUNNING_THREADS is not None:
+        fd.RUNNING_THREADS[threading.current_thread().ident] = None
     else:
-        ping_stop.set()
+        ping_job.cancel()
 
-    for b in btask_stops:
-        b.set()
+    for b in btask_jobs:
+        b.cancel()
 
 
-def background_task(btask, spec, stop_event, master_thread):
-    num_launched = 0
-    while not stop_event.is_set() and master_thread.isAlive():
-        for task in btask.tasks:
-            task.run_task(spec)
-        if btask.sleep_time > 0:
-            stop_event.wait(btask.sleep_time)
-
-        num_launched += 1
-        if num_launched == btask.num_launches:
-            break
+def run_background_task(btask, spec):
+    for task in btask.tasks:
+        task.run_task(spec)
 
 
 def start_background_task(btask, spec):
-    ping_stop = threading.Event()
-    ping_thread = threading.Thread(target=background_task, args=(btask, spec, ping_stop, threading.currentThread()))
-    ping_thread.start()
-    return ping_stop
+    """
+    Schedule a BackgroundTask to run every btask.sleep_time secs while the current thread is alive
+
+    :return: (ScheduledJob) finish() stops the job and runs the task one last time if run_on_finish is set
+    """
+    on_finish = (lambda: run_background_task(btask, spec)) if btask.run_on_finish else None
+    return get_scheduler().schedule(run_background_task, btask.sleep_time, args=(btask, spec),
+                                    num_runs=btask.num_launches, owner=threading.current_thread(),
+                                    on_finish=on_finish)
+
+
+def _log_cache_error(launchpad, msg):
+    # a broken task cache must not fizzle a FireTask, which can always just run
+    if launchpad:
+        launchpad.log_message(logging.WARNING, '{}\n{}'.format(msg, traceback.format_exc()))
+    else:
+        traceback.print_exc()
+
+
+def _replay_from_cache(m_cache, task, spec, launch_dir, launchpad):
+    """
+    :return: (str, FWAction) the cache key of the FireTask (None if it can't be computed) and the
+    cached FWAction (None on a miss or error)
+    """
+    key = None
+    try:
+        key = m_cache.get_key(task, spec, launch_dir)
+        return key, m_cache.replay(key, launch_dir, launchpad)
+    except Exception:
+        _log_cache_error(launchpad, 'Error looking up task {} in the task cache; running '
+                                    'it'.format(task))
+        return key, None
+
+
+def _save_to_cache(m_cache, key, action, launch_dir, launchpad):
+    try:
+        m_cache.save(key, action, launch_dir, launchpad)
+    except Exception:
+        _log_cache_error(launchpad, 'Error saving a result to the task cache')
 
 
 class Rocket():
@@ -85,16 +111,19 @@ class Rocket():
     The Rocket fetches a workflow step from the FireWorks database and executes it.
     """
 
-    def __init__(self, launchpad, fworker, fw_id):
+    def __init__(self, launchpad, fworker, fw_id, launch_dir=None):
         """
 
         :param launchpad: (LaunchPad) A LaunchPad object for interacting with the FW database. If none, reads FireWorks from FW.json and writes to FWAction.json
         :param fworker: (FWorker) A FWorker object describing the computing resource
         :param fw_id: (int) id of a specific FireWork to run (quit if it cannot be found)
+        :param launch_dir: (str) directory to run in. If None, runs in (and may chdir from) the current directory; \
+        otherwise the working directory of the process is never changed, which allows Rockets to run as threads.
         """
         self.launchpad = launchpad
         self.fworker = fworker
         self.fw_id = fw_id
+        self.launch_dir = launch_dir
 
     def run(self):
         """
@@ -105,16 +134,16 @@ class Rocket():
         all_mod_spec = []  # combined mod_spec for *all* the Tasks
 
         lp = self.launchpad
-        launch_dir = os.path.abspath(os.getcwd())
+        launch_dir = os.path.abspath(self.launch_dir if self.launch_dir else os.getcwd())
 
         # check a FW job out of the launchpad
         if lp:
             m_fw, launch_id = lp.checkout_fw(self.fworker, launch_dir, self.fw_id)
         else:  # offline mode
-            m_fw = FireWork.from_file(os.path.join(os.getcwd(), "FW.json"))
+            m_fw = FireWork.from_file(os.path.join(launch_dir, "FW.json"))
 
             # set the run start time
-            with open('FW_offline.json', 'r+') as f:
+            with open(os.path.join(launch_dir, 'FW_offline.json'), 'r+') as f:
                 d = json.loads(f.read())
                 d['started_on'] = datetime.utcnow().isoformat()
                 f.seek(0)
@@ -129,8 +158,11 @@ class Rocket():
 
         if '_launch_dir' in m_fw.spec:
             prev_dir = launch_dir
-            os.chdir(m_fw.spec['_launch_dir'])
-            launch_dir = os.path.abspath(os.getcwd())
+            if self.launch_dir:
+                launch_dir = os.path.abspath(m_fw.spec['_launch_dir'])
+            else:
+                os.chdir(m_fw.spec['_launch_dir'])
+                launch_dir = os.path.abspath(os.getcwd())
 
             if lp:
                 lp.change_launch_dir(launch_id, launch_dir)
@@ -143,41 +175,54 @@ class Rocket():
 
         if lp:
             message = 'RUNNING fw_id: {} in directory: {}'.\
-                format(m_fw.fw_id, os.getcwd())
+                format(m_fw.fw_id, launch_dir)
             lp.log_message(logging.INFO, message)
 
         # write FW.json and/or FW.yaml to the directory
         if PRINT_FW_JSON:
-            m_fw.to_file('FW.json', indent=4)
+            m_fw.to_file(os.path.join(launch_dir, 'FW.json'), indent=4)
         if PRINT_FW_YAML:
-            m_fw.to_file('FW.yaml')
+            m_fw.to_file(os.path.join(launch_dir, 'FW.yaml'))
 
         try:
             my_spec = dict(m_fw.spec)  # make a copy of spec, don't override original
             my_spec["_fw_env"] = self.fworker.env
+            my_spec["_fw_launch_dir"] = launch_dir  # FireTasks should use this rather than the cwd
 
             # set up heartbeat (pinging the server that we're still alive)
-            ping_stop = start_ping_launch(lp, launch_id)
+            ping_job = start_ping_launch(lp, launch_id)
 
             # start background tasks
-            btask_stops = []
+            btask_jobs = []
             if '_background_tasks' in my_spec:
                 for bt in my_spec['_background_tasks']:
-                    btask_stops.append(start_background_task(bt, m_fw.spec))
+                    btask_jobs.append(start_background_task(bt, m_fw.spec))
 
             # execute the FireTasks!
+            m_cache = my_spec.get('_task_cache')
             for t in m_fw.tasks:
-                lp.log_message(logging.INFO, "Running task %s." % str(t))
-                m_action = t.run_task(my_spec)
+                if lp:
+                    lp.log_message(logging.INFO, "Running task %s." % str(t))
+                cache_key, m_action = _replay_from_cache(m_cache, t, my_spec, launch_dir, lp) \
+                    if m_cache else (None, None)
+
+                if m_action:
+                    if lp:
+                        lp.log_message(logging.INFO, "Task %s replayed from the task cache." % str(t))
+                else:
+                    m_action = t.run_task(my_spec)
+
+                    # read in a FWAction from a file, in case the task is not Python and cannot return it explicitly
+                    if os.path.exists(os.path.join(launch_dir, 'FWAction.json')):
+                        m_action = FWAction.from_file(os.path.join(launch_dir, 'FWAction.json'))
+                    elif os.path.exists(os.path.join(launch_dir, 'FWAction.yaml')):
+                        m_action = FWAction.from_file(os.path.join(launch_dir, 'FWAction.yaml'))
 
-                # read in a FWAction from a file, in case the task is not Python and cannot return it explicitly
-                if os.path.exists('FWAction.json'):
-                    m_action = FWAction.from_file('FWAction.json')
-                elif os.path.exists('FWAction.yaml'):
-                    m_action = FWAction.from_file('FWAction.yaml')
+                    if not m_action:
+                        m_action = FWAction()
 
-                if not m_action:
-                    m_action = FWAction()
+                    if m_cache and cache_key:
+                        _save_to_cache(m_cache, cache_key, m_action, launch_dir, lp)
 
                 # update the global stored data with the data to store and update from this particular Task
                 all_stored_data.update(m_action.stored_data)
@@ -188,7 +233,8 @@ class Rocket():
                 my_spec.update(m_action.update_spec)
                 for mod in m_action.mod_spec:
                     apply_mod(mod, my_spec)
-                lp.log_message(logging.INFO, "Task %s completed." % str(t))
+                if lp:
+                    lp.log_message(logging.INFO, "Task %s completed." % str(t))
                 if m_action.skip_remaining_tasks:
                     break
 
@@ -197,16 +243,11 @@ class Rocket():
                 all_stored_data['multiprocess_name'] = multiprocessing.current_process().name
 
             # perform finishing operation
-            stop_backgrounds(ping_stop, btask_stops)
-            for b in btask_stops:
-                b.set()
+            stop_backgrounds(ping_job, btask_jobs)
             do_ping(lp, launch_id)  # one last ping, esp if there is a monitor
             # last background monitors
-            if '_background_tasks' in my_spec:
-                for bt in my_spec['_background_tasks']:
-                    if bt.run_on_finish:
-                        for task in bt.tasks:
-                            task.run_task(m_fw.spec)
+            for b in btask_jobs:
+                b.finish()
 
             m_action.stored_data = all_stored_data
             m_action.mod_spec = all_mod_spec
@@ -215,7 +256,7 @@ class Rocket():
             if lp:
                 lp.complete_launch(launch_id, m_action, 'COMPLETED')
             else:
-                with open('FW_offline.json', 'r+') as f:
+                with open(os.path.join(launch_dir, 'FW_offline.json'), 'r+') as f:
                     d = json.loads(f.read())
                     d['fwaction'] = m_action.to_dict()
                     d['state'] = 'COMPLETED'
@@ -227,7 +268,7 @@ class Rocket():
             return True
 
         except:
-            stop_backgrounds(ping_stop, btask_stops)
+            stop_backgrounds(ping_job, btask_jobs)
             traceback.print_exc()
             try:
                 m_action = FWAction(stored_data={'_message': 'runtime error during task', '_task': t.to_dict(),
@@ -238,7 +279,7 @@ class Rocket():
             if lp:
                 lp.complete_launch(launch_id, m_action, 'FIZZLED')
             else:
-                with open('FW_offline.json', 'r+') as f:
+                with open(os.path.join(launch_dir, 'FW_offline.json'), 'r+') as f:
                     d = json.loads(f.read())
                     d['fwaction'] = m_action.to_dict()
                     d['state'] = 'FIZZLED'
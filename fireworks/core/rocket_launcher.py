@@ -4,6 +4,8 @@
 This module contains methods for launching Rockets, both singly and in rapid-fire mode
 """
 
+from collections import deque
+from concurrent import futures
 import os
 import time
 from fireworks.fw_config import RAPIDFIRE_SLEEP_SECS
@@ -19,26 +21,28 @@ __email__ = 'ajain@lbl.gov'
 __date__ = 'Feb 22, 2013'
 
 
-def launch_rocket(launchpad, fworker=None, fw_id=None, strm_lvl='INFO'):
+def launch_rocket(launchpad, fworker=None, fw_id=None, strm_lvl='INFO', launch_dir=None):
     """
     Run a single rocket in the current directory
     :param launchpad: (LaunchPad)
     :param fworker: (FWorker)
     :param fw_id: (int) if set, a particular FireWork to run
     :param strm_lvl: (str) level at which to output logs to stdout
+    :param launch_dir: (str) if set, run in this directory without changing the current directory
     """
     fworker = fworker if fworker else FWorker()
     l_dir = launchpad.get_logdir() if launchpad else None
     l_logger = get_fw_logger('rocket.launcher', l_dir=l_dir, stream_level=strm_lvl)
 
     log_multi(l_logger, 'Launching Rocket')
-    rocket = Rocket(launchpad, fworker, fw_id)
+    rocket = Rocket(launchpad, fworker, fw_id, launch_dir)
     rocket_ran = rocket.run()
     log_multi(l_logger, 'Rocket finished')
     return rocket_ran
 
 
-def rapidfire(launchpad, fworker=None, m_dir=None, nlaunches=0, max_loops=-1, sleep_time=None, strm_lvl='INFO'):
+def rapidfire(launchpad, fworker=None, m_dir=None, nlaunches=0, max_loops=-1, sleep_time=None, strm_lvl='INFO',
+              prefetch=0):
     """
     Keeps running Rockets in m_dir until we reach an error. Automatically creates subdirectories for each Rocket.
     Usually stops when we run out of FireWorks from the LaunchPad.
@@ -50,8 +54,14 @@ def rapidfire(launchpad, fworker=None, m_dir=None, nlaunches=0, max_loops=-1, sl
     :param max_loops: (int) maximum number of loops
     :param sleep_time: (int) secs to sleep between rapidfire loop iterations
     :param strm_lvl: (str) level at which to output logs to stdout
+    :param prefetch: (int) if > 0, reserve up to this many FireWorks in the background while a Rocket
+    runs and complete Launches asynchronously (see rapidfire_prefetch)
     """
 
+    if prefetch > 0:
+        return rapidfire_prefetch(launchpad, fworker, m_dir, nlaunches, max_loops, sleep_time, strm_lvl,
+                                  prefetch)
+
     sleep_time = sleep_time if sleep_time else RAPIDFIRE_SLEEP_SECS
     curdir = m_dir if m_dir else os.getcwd()
     l_logger = get_fw_logger('rocket.launcher', l_dir=launchpad.get_logdir(), stream_level=strm_lvl)
@@ -81,4 +91,164 @@ def rapidfire(launchpad, fworker=None, m_dir=None, nlaunches=0, max_loops=-1, sl
         log_multi(l_logger, 'Sleeping for {} secs'.format(sleep_time))
         time.sleep(sleep_time)
         num_loops += 1
-        log_multi(l_logger, 'Checking for FWs to run...'.format(sleep_time))
\ No newline at end of file
+        log_multi(l_logger, 'Checking for FWs to run...'.format(sleep_time))
+
+
+class _AsyncCompleter(object):
+    """
+    Wraps a LaunchPad so that complete_launch() is performed in a background thread while the
+    caller moves on. All other calls are passed through to the LaunchPad.
+    """
+
+    def __init__(self, launchpad, l_logger):
+        self.launchpad = launchpad
+        self.l_logger = l_logger
+        self.pending = []
+        self._executor = futures.ThreadPoolExecutor(max_workers=1)  # keep completions in order
+
+    def __getattr__(self, name):
+        return getattr(self.launchpad, name)
+
+    def complete_launch(self, launch_id, action, state='COMPLETED'):
+        """
+        Start completing a Launch in the background. Unlike LaunchPad.complete_launch(), this
+        returns right away.
+
+        :return: (Future) resolves to the dict of the Launch, like LaunchPad.complete_launch()
+        returns, or raises its error
+        """
+        future = self._executor.submit(self.launchpad.complete_launch, launch_id, action, state)
+        self.pending.append(future)
+        return future
+
+    def wait(self):
+        """
+        Wait for all pending completions; log any that failed.
+        """
+        futures.wait(self.pending)
+        for f in self.pending:
+            if f.exception():
+                self.l_logger.error('Error completing a Launch: {}'.format(f.exception()))
+        self.pending = []
+
+    def shutdown(self):
+        self.wait()
+        self._executor.shutdown()
+
+
+def _reserve_rocket(launchpad, fworker, curdir, l_logger):
+    """
+    Internal method to create a launcher dir and reserve a FireWork to run in it
+
+    :return: (int, int, str) the fw_id, launch_id and launcher dir, or Nones if nothing is ready
+    """
+    launcher_dir = create_datestamp_dir(curdir, l_logger, prefix='launcher_')
+    m_fw, launch_id = launchpad.reserve_fw(fworker, launcher_dir)
+    if not m_fw:
+        os.rmdir(launcher_dir)
+        return None, None, None
+    return m_fw.fw_id, launch_id, launcher_dir
+
+
+def rapidfire_prefetch(launchpad, fworker=None, m_dir=None, nlaunches=0, max_loops=-1, sleep_time=None,
+                       strm_lvl='INFO', prefetch=1):
+    """
+    A pipelined version of rapidfire(). While a Rocket runs, up to "prefetch" FireWorks are reserved
+    in a background thread, and each Launch is completed in another background thread so that the
+    next Rocket can start right away. Prefetched reservations that are not run are cancelled on exit.
+
+    :param launchpad: (LaunchPad)
+    :param fworker: (FWorker object)
+    :param m_dir: (str) the directory in which to loop Rocket running
+    :param nlaunches: (int) 0 means 'until completion', -1 or "infinite" means to loop forever
+    :param max_loops: (int) maximum number of loops
+    :param sleep_time: (int) secs to sleep between rapidfire loop iterations
+    :param strm_lvl: (str) level at which to output logs to stdout
+    :param prefetch: (int) maximum number of FireWorks to reserve ahead of time
+    """
+
+    sleep_time = sleep_time if sleep_time else RAPIDFIRE_SLEEP_SECS
+    curdir = m_dir if m_dir else os.getcwd()
+    l_logger = get_fw_logger('rocket.launcher', l_dir=launchpad.get_logdir(), stream_level=strm_lvl)
+    nlaunches = -1 if nlaunches == 'infinite' else int(nlaunches)
+    fworker = fworker if fworker else FWorker()
+
+    completer = _AsyncCompleter(launchpad, l_logger)
+    reserver = futures.ThreadPoolExecutor(max_workers=1)
+    reservations = deque()  # futures of (fw_id, launch_id, launcher_dir)
+    ready = deque()  # reservations that were drained while looking for work
+
+    def fill():
+        n = prefetch - len(reservations) - len(ready)
+        if nlaunches > 0:
+            n = min(n, nlaunches - num_launched - len(reservations) - len(ready))
+        for _ in range(n):
+            reservations.append(reserver.submit(_reserve_rocket, launchpad, fworker, curdir, l_logger))
+
+    def next_rocket():
+        """
+        Get the next reserved Rocket, or None if nothing can be reserved
+        """
+        while True:
+            if ready:
+                return ready.popleft()
+            fill()
+            if not reservations:
+                return None
+            r = reservations.popleft().result()
+            if r[0] is not None:
+                return r
+            if completer.pending:
+                # Launches still being completed might make more FireWorks READY
+                completer.wait()
+                continue
+            # nothing to reserve; keep whatever the other prefetches found
+            while reservations:
+                r = reservations.popleft().result()
+                if r[0] is not None:
+                    ready.append(r)
+            if not ready:
+                return None
+
+    num_launched = 0
+    num_loops = 0
+
+    try:
+        while num_loops != max_loops:
+            while True:
+                r = next_rocket()
+                if r is None:
+                    break
+                fw_id, launch_id, launcher_dir = r
+                os.chdir(launcher_dir)
+                rocket_ran = launch_rocket(completer, fworker, fw_id, strm_lvl=strm_lvl)
+                if rocket_ran:
+                    num_launched += 1
+                elif not os.listdir(launcher_dir):
+                    # remove the empty shell of a directory
+                    os.chdir(curdir)
+                    os.rmdir(launcher_dir)
+                if num_launched == nlaunches:
+                    break
+            if num_launched == nlaunches or nlaunches == 0:
+                break
+            log_multi(l_logger, 'Sleeping for {} secs'.format(sleep_time))
+            time.sleep(sleep_time)
+            num_loops += 1
+            log_multi(l_logger, 'Checking for FWs to run...')
+
+    finally:
+        os.chdir(curdir)
+        # release any prefetched reservations that were not run
+        leftover = list(ready)
+        for f in reservations:
+            if not f.exception():
+                leftover.append(f.result())
+        for fw_id, launch_id, launcher_dir in leftover:
+            if fw_id is not None:
+                log_multi(l_logger, 'Releasing prefetched reservation of fw_id: {}'.format(fw_id))
+                launchpad.cancel_reservation(launch_id)
+                if not os.listdir(launcher_dir):
+                    os.rmdir(launcher_dir)
+        reserver.shutdown()
+        completer.shutdown()
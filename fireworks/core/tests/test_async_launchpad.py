@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Tests for the asyncio interface to the LaunchPad, using an in-memory stand-in
+for the LaunchPad so that MongoDB is not needed.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import sys
+import threading
+import time
+import unittest
+
+# AsyncLaunchPad is a SyntaxError before Python 3.5, and uses asyncio.get_running_loop(); this
+# module itself has no async syntax, so that it can be skipped
+if sys.version_info < (3, 7):
+    raise unittest.SkipTest("AsyncLaunchPad requires Python 3.7+")
+
+import asyncio
+
+from fireworks.core.async_launchpad import AsyncLaunchPad
+
+
+class MemoryLaunchPad(object):
+    def __init__(self):
+        self.pings = []
+        self.lock = threading.Lock()
+
+    def ping_launch(self, launch_id, ptime=None):
+        time.sleep(0.05)
+        with self.lock:
+            self.pings.append(launch_id)
+
+    def get_fw_ids(self, query=None, sort=None, limit=0, count_only=False):
+        return 1 if query.get('state') == 'READY' else 0
+
+
+def run_all(coros):
+    """
+    Run coroutines concurrently on a new event loop
+
+    :return: (list) their results
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        tasks = [loop.create_task(c) for c in coros]
+        return loop.run_until_complete(asyncio.gather(*tasks))
+    finally:
+        loop.close()
+
+
+class AsyncLaunchPadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lp = MemoryLaunchPad()
+        self.alp = AsyncLaunchPad(self.lp, max_workers=4)
+
+    def tearDown(self):
+        self.alp.close()
+
+    def test_ping_coalescing(self):
+        run_all([self.alp.ping_launch(i % 3) for i in range(3000)])
+        self.assertEqual(sorted(self.lp.pings), [0, 1, 2])
+        self.assertEqual(self.alp._pings, {})
+
+    def test_fw_stats(self):
+        stats = run_all([self.alp.get_fw_stats()])[0]
+        self.assertEqual(stats['READY'], 1)
+        self.assertEqual(sum(stats.values()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
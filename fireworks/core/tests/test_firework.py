@@ -13,9 +13,15 @@ __maintainer__ = "Shyue Ping Ong"
 __email__ = "shyuep@gmail.com"
 __date__ = "2/26/14"
 
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
-from fireworks.core.firework import FireWork, Workflow, FireTaskBase
+from fireworks.core.firework import FireWork, Workflow, FireTaskBase, Tracker, Launch, \
+    FWAction
 from fireworks.user_objects.firetasks.script_task import PyTask
 
 
@@ -51,6 +57,161 @@ class WorkflowTest(unittest.TestCase):
         self.assertRaises(ValueError, Workflow, fws,
                           links_dict={0: [1, 2, 3], 1: [4], 2: [100]})
 
+    def test_graph(self):
+        fws = [FireWork([PyTask(func="print", args=[i])], fw_id=i) for i in range(5)]
+        wf = Workflow(fws, links_dict={0: [1, 2, 3], 1: [4], 2: [4]})
+        self.assertEqual(wf.root_fw_ids, [0])
+        self.assertEqual(sorted(wf.leaf_fw_ids), [3, 4])
+        self.assertEqual(wf.links.get_parents(4), [1, 2])
+        self.assertEqual(wf.links.parent_links, {1: [0], 2: [0], 3: [0], 4: [1, 2]})
+
+        # changing the links drops the cached graph
+        wf.links[3] = [4]
+        self.assertEqual(wf.leaf_fw_ids, [4])
+        self.assertEqual(wf.links.get_parents(4), [1, 2, 3])
+
+        for fw in wf.fws:
+            fw.state = "COMPLETED"
+        self.assertEqual(wf.state, "COMPLETED")
+        updated = wf.rerun_fw(1)
+        self.assertEqual(updated, {1, 4})
+        self.assertEqual(wf.id_fw[1].state, "READY")
+        self.assertEqual(wf.id_fw[4].state, "WAITING")
+        self.assertEqual(wf.state_counts, {"COMPLETED": 3, "READY": 1, "WAITING": 1})
+        self.assertEqual(wf.state, "RUNNING")
+
+
+class FireWorkTest(unittest.TestCase):
+
+    def test_lazy_tasks(self):
+        fw = FireWork([PyTask(func="print", args=[1]), PyTask(func="pow", args=[2, 3])],
+                      spec={"_tasks": "overwritten", "x": 1}, fw_id=1)
+        m_dict = fw.to_dict()
+        m_dict["spec"]["_tasks"][0]["_fw_name"] = "{{no.such.module.Task}}"
+
+        # loading a FireWork doesn't instantiate its FireTasks...
+        fw2 = FireWork.from_dict(m_dict)
+        self.assertEqual(fw2.to_dict(), m_dict)
+        self.assertEqual(fw2.spec["x"], 1)
+
+        # ...until they are needed
+        self.assertRaises(ImportError, getattr, fw2, "tasks")
+        fw3 = FireWork.from_dict(fw.to_dict())
+        self.assertEqual([t["func"] for t in fw3.tasks], ["print", "pow"])
+        self.assertIs(fw3.tasks, fw3.tasks)
+
+        fw3.tasks = [PyTask(func="abs", args=[-1])]
+        self.assertEqual(fw3.spec["_tasks"][0]["func"], "abs")
+
+    def test_slots(self):
+        launch = Launch("RUNNING", "/tmp", host="h", ip="1", launch_id=2, fw_id=1)
+        fw = FireWork(PyTask(func="print"), fw_id=1, launches=[launch], state="RUNNING")
+        for obj in [fw, launch, launch.fworker, Tracker("OUTCAR")]:
+            self.assertFalse(hasattr(obj, "__dict__"))
+        fw2 = pickle.loads(pickle.dumps(fw))
+        self.assertEqual(fw2.to_dict(), fw.to_dict())
+        self.assertEqual(fw2.launches[0].launch_id, 2)
+
+    def test_pickle(self):
+        launch = Launch("RUNNING", "/tmp", host="h", ip="1", launch_id=2, fw_id=1,
+                        action=FWAction(stored_data={"x": 1}))
+        fw = FireWork([PyTask(func="print", args=[1])], {"a": [1, 2]}, fw_id=1,
+                      launches=[launch], state="RUNNING")
+        wf = Workflow([fw, FireWork([], fw_id=2)], {1: [2]})
+        wf2 = pickle.loads(pickle.dumps(wf, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(wf2.to_dict(), wf.to_dict())
+        self.assertEqual(wf2.links.get_parents(2), [1])
+
+        # the attributes are pickled as they are, without going through to_dict()
+        fw2 = wf2.id_fw[1]
+        self.assertIsInstance(fw2.tasks[0], PyTask)
+        self.assertIsInstance(fw2.launches[0].action, FWAction)
+        self.assertIsInstance(fw2.created_on, datetime.datetime)
+        self.assertEqual(fw2.launches[0].time_start, launch.time_start)
+
+        task = pickle.loads(pickle.dumps(PyTask(func="print", args=[1])))
+        self.assertEqual(task, {"func": "print", "args": [1]})
+
+
+class LaunchTest(unittest.TestCase):
+
+    def test_times(self):
+        launch = Launch("RESERVED", "/tmp", host="h", ip="1")
+        self.assertIsNone(launch.time_start)
+        self.assertIsNotNone(launch.time_reserved)
+        launch.state = "RUNNING"
+        start = launch.time_start
+        self.assertIsNotNone(start)
+        self.assertIsNone(launch.time_end)
+        launch.touch_history(start + datetime.timedelta(seconds=5))
+        self.assertEqual(launch.last_pinged, start + datetime.timedelta(seconds=5))
+        launch.state = "COMPLETED"
+        self.assertGreaterEqual(launch.runtime_secs, 0)
+
+        # edits of the history in place count once it is assigned
+        launch.state_history[-1]["created_on"] = start + datetime.timedelta(seconds=10)
+        launch.state_history = launch.state_history
+        self.assertEqual(launch.runtime_secs, 10)
+
+
+class TrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.launch_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.launch_dir, 'out.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.launch_dir)
+
+    def write(self, text, mode='a'):
+        with open(self.filename, mode) as f:
+            f.write(text)
+
+    def test_incremental(self):
+        self.write('1\n2\n3\n')
+        t = Tracker('out.txt', nlines=2)
+        self.assertEqual(t.track_file(self.launch_dir), '2\n3')
+
+        # the state survives serialization, as between two pings of a Launch
+        t = Tracker.from_dict(t.to_dict())
+        self.write('4\n5')
+        self.assertEqual(t.track_file(self.launch_dir), '4\n5')
+        self.write('6\n7\n')
+        self.assertEqual(t.track_file(self.launch_dir), '56\n7')
+        self.assertEqual(t.file_stat['offset'], os.path.getsize(self.filename))
+        self.assertEqual(t.track_file(self.launch_dir),
+                         Tracker('out.txt', nlines=2).track_file(self.launch_dir))
+
+    def test_unchanged_and_truncated(self):
+        self.write('1\n2\n')
+        t = Tracker('out.txt', nlines=5)
+        t.track_file(self.launch_dir)
+        t.content = 'not re-read'
+        self.assertEqual(t.track_file(self.launch_dir), 'not re-read')
+
+        self.write('x\n', mode='w')
+        self.assertEqual(t.track_file(self.launch_dir), 'x')
+
+    def test_split_character(self):
+        self.write('x\n')
+        t = Tracker('out.txt', nlines=2)
+        t.track_file(self.launch_dir)
+        with open(self.filename, 'ab') as f:
+            f.write(u'a\u00e9'.encode('utf-8')[:-1])  # half of the "e acute"
+        self.assertEqual(t.track_file(self.launch_dir), 'x\na')
+        with open(self.filename, 'ab') as f:
+            f.write(u'\u00e9'.encode('utf-8')[-1:] + b'\n')
+        self.assertEqual(t.track_file(self.launch_dir), u'x\na\u00e9')
+
+    def test_large_append(self):
+        self.write('1\n')
+        t = Tracker('out.txt', nlines=2)
+        t.track_file(self.launch_dir)
+        # too much to read since the last ping; only the end of the file is read
+        self.write('y' * (2 * Tracker.MAX_APPENDED_BYTES_PER_LINE) + '\n2\n3\n')
+        self.assertEqual(t.track_file(self.launch_dir), '2\n3')
+        self.assertEqual(t.file_stat['offset'], os.path.getsize(self.filename))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""
+Tests for the prefetching rapidfire mode, using an in-memory stand-in for the
+LaunchPad so that MongoDB is not needed.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from fireworks.core.firework import FireWork
+from fireworks.core.rocket_launcher import rapidfire, _AsyncCompleter
+from fireworks.user_objects.firetasks.script_task import ScriptTask
+
+
+class MemoryLaunchPad(object):
+    def __init__(self, nfws, fail_checkout_after=None):
+        self.fws = {i: FireWork(ScriptTask.from_str('echo "{}"'.format(i)),
+                                fw_id=i, state='READY') for i in range(1, nfws + 1)}
+        self.launch_fw = {}
+        self.cancelled = []
+        self.completed = []
+        self.fail_checkout_after = fail_checkout_after
+        self.lock = threading.Lock()
+
+    def get_logdir(self):
+        return None
+
+    def reserve_fw(self, fworker, launch_dir):
+        with self.lock:
+            for fw_id in sorted(self.fws):
+                if self.fws[fw_id].state == 'READY':
+                    self.fws[fw_id].state = 'RESERVED'
+                    launch_id = len(self.launch_fw) + 1
+                    self.launch_fw[launch_id] = fw_id
+                    return self.fws[fw_id], launch_id
+        return None, None
+
+    def checkout_fw(self, fworker, launch_dir, fw_id=None):
+        if self.fail_checkout_after is not None and \
+                len(self.completed) >= self.fail_checkout_after:
+            raise RuntimeError("Lost connection to the database!")
+        launch_id = [l for l, f in self.launch_fw.items() if f == fw_id][0]
+        self.fws[fw_id].state = 'RUNNING'
+        return self.fws[fw_id], launch_id
+
+    def complete_launch(self, launch_id, action, state='COMPLETED'):
+        fw_id = self.launch_fw[launch_id]
+        self.fws[fw_id].state = state
+        self.completed.append(fw_id)
+        return {'launch_id': launch_id, 'state': state}
+
+    def cancel_reservation(self, launch_id):
+        self.fws[self.launch_fw[launch_id]].state = 'READY'
+        self.cancelled.append(launch_id)
+
+    def ping_launch(self, launch_id, ptime=None):
+        pass
+
+    def log_message(self, level, message):
+        pass
+
+
+class PrefetchRapidfireTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old_wd = os.getcwd()
+        self.launch_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        os.chdir(self.old_wd)
+        shutil.rmtree(self.launch_dir)
+
+    def test_run_all(self):
+        lp = MemoryLaunchPad(5)
+        rapidfire(lp, m_dir=self.launch_dir, strm_lvl='ERROR', prefetch=2)
+        self.assertEqual(sorted(lp.completed), [1, 2, 3, 4, 5])
+        self.assertEqual(lp.cancelled, [])
+
+    def test_nlaunches(self):
+        lp = MemoryLaunchPad(5)
+        rapidfire(lp, m_dir=self.launch_dir, nlaunches=2, strm_lvl='ERROR',
+                  prefetch=3)
+        self.assertEqual(sorted(lp.completed), [1, 2])
+        self.assertEqual([fw.state for fw in lp.fws.values()].count('READY'), 3)
+
+    def test_async_completer(self):
+        lp = MemoryLaunchPad(1)
+        lp.reserve_fw(None, None)
+        completer = _AsyncCompleter(lp, None)
+        future = completer.complete_launch(1, None, 'FIZZLED')
+        completer.shutdown()
+        self.assertEqual(future.result(), {'launch_id': 1, 'state': 'FIZZLED'})
+
+    def test_release_on_exit(self):
+        lp = MemoryLaunchPad(5, fail_checkout_after=1)
+        self.assertRaises(RuntimeError, rapidfire, lp, m_dir=self.launch_dir,
+                          strm_lvl='ERROR', prefetch=2)
+        # the prefetched reservation is released; the one whose checkout
+        # failed is left for detect_unreserved, as in plain rapidfire
+        self.assertEqual(lp.cancelled, [3])
+        self.assertEqual([fw.state for fw in lp.fws.values()],
+                         ['COMPLETED', 'RESERVED', 'READY', 'READY', 'READY'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,14 @@
 This module contains methods for launching several Rockets in a parallel environment
 """
 
-from multiprocessing import Process
+from multiprocessing import Array, Process
 import os
 import threading
 import time
-from fireworks.fw_config import FWData, PING_TIME_SECS, DS_PASSWORD
-from fireworks.core.rocket_launcher import rapidfire
-from fireworks.utilities.fw_utilities import DataServer
+from fireworks.fw_config import FWData, PING_TIME_SECS, RAPIDFIRE_SLEEP_SECS
+from fireworks.core.launchpad import LaunchPad
+from fireworks.core.rocket_launcher import rapidfire, launch_rocket
+from fireworks.utilities.fw_utilities import get_fw_logger, create_datestamp_dir, log_multi
 
 
 __author__ = 'Xiaohui Qu, Anubhav Jain'
@@ -19,31 +20,25 @@ __email__ = 'xqu@lbl.gov'
 __date__ = 'Aug 19, 2013'
 
 
-def ping_multilaunch(port, stop_event):
+def ping_multilaunch(launchpad, running_ids, processes, stop_event):
     """
     A single manager to ping all launches during multiprocess launches
 
-    :param port: (int) Listening port number of the DataServer
+    :param launchpad: (LaunchPad) the LaunchPad of the parent process
+    :param running_ids: (multiprocessing.Array) launch_id running in each sub job (0 if none)
+    :param processes: ([multiprocessing.Process]) the sub jobs, in the same order as running_ids
     :param stop_event: (Thread.Event) stop event
     """
-
-    ds = DataServer(address=('127.0.0.1', port), authkey=DS_PASSWORD)
-    ds.connect()
-
-    lp = ds.LaunchPad()
     while not stop_event.is_set():
-        for pid, lid in ds.Running_IDs().items():
-            if lid:
-                try:
-                    os.kill(pid, 0)  # throws OSError if the process is dead
-                    lp.ping_launch(lid)
-                except OSError:
-                    pass  # means this process is dead!
+        for p, lid in zip(processes, running_ids[:]):
+            if lid and p.is_alive():  # skip sub jobs that have died
+                launchpad.ping_launch(lid)
 
         stop_event.wait(PING_TIME_SECS)
 
 
-def rapidfire_process(fworker, nlaunches, sleep, loglvl, port, node_list, sub_nproc):
+def rapidfire_process(fworker, nlaunches, sleep, loglvl, lp_dict, running_ids, job_id, node_list,
+                      sub_nproc):
     """
     Initializes shared data with multiprocessing parameters and starts a rapidfire
 
@@ -51,22 +46,23 @@ def rapidfire_process(fworker, nlaunches, sleep, loglvl, port, node_list, sub_np
     :param nlaunches: (int) 0 means 'until completion', -1 or "infinite" means to loop forever
     :param sleep: (int) secs to sleep between rapidfire loop iterations
     :param loglvl: (str) level at which to output logs to stdout
-    :param port: (int) Listening port number of the shared object manage
-    :param password: (str) security password to access the server
+    :param lp_dict: (dict) LaunchPad settings; each sub job makes its own database connection
+    :param running_ids: (multiprocessing.Array) launch_id running in each sub job
+    :param job_id: (int) index of this sub job in running_ids
     :param node_list: ([str]) computer node list
     :param sub_nproc: (int) number of processors of the sub job
     """
-    ds = DataServer(address=('127.0.0.1', port), authkey=DS_PASSWORD)
-    ds.connect()
-    launchpad = ds.LaunchPad()
-    FWData().DATASERVER = ds
+    launchpad = LaunchPad.from_dict(lp_dict)
+    FWData().RUNNING_IDS = running_ids
+    FWData().SUB_JOB_ID = job_id
     FWData().MULTIPROCESSING = True
     FWData().NODE_LIST = node_list
     FWData().SUB_NPROCS = sub_nproc
     rapidfire(launchpad, fworker, None, nlaunches, -1, sleep, loglvl)
 
 
-def start_rockets(fworker, nlaunches, sleep, loglvl, port, node_lists, sub_nproc_list):
+def start_rockets(fworker, nlaunches, sleep, loglvl, lp_dict, running_ids, node_lists,
+                  sub_nproc_list):
     """
     Create each sub job and start a rocket launch in each one
 
@@ -74,14 +70,16 @@ def start_rockets(fworker, nlaunches, sleep, loglvl, port, node_lists, sub_nproc
     :param nlaunches: nlaunches: (int) 0 means 'until completion', -1 or "infinite" means to loop forever
     :param sleep: (int) secs to sleep between rapidfire loop iterations
     :param loglvl: (str) level at which to output logs to stdout
-    :param port: (int) Listening port number
+    :param lp_dict: (dict) LaunchPad settings
+    :param running_ids: (multiprocessing.Array) launch_id running in each sub job
     :param node_lists: ([str]) computer node list
     :param sub_nproc_list: ([int]) list of the number of the process of sub jobs
     :return: ([multiprocessing.Process]) all the created processes
     """
 
-    processes = [Process(target=rapidfire_process, args=(fworker, nlaunches, sleep, loglvl, port, nl, sub_nproc))
-                 for nl, sub_nproc in zip(node_lists, sub_nproc_list)]
+    processes = [Process(target=rapidfire_process, args=(fworker, nlaunches, sleep, loglvl, lp_dict,
+                                                         running_ids, i, nl, sub_nproc))
+                 for i, (nl, sub_nproc) in enumerate(zip(node_lists, sub_nproc_list))]
     for p in processes:
         p.start()
         time.sleep(0.15)
@@ -127,17 +125,17 @@ def launch_multiprocess(launchpad, fworker, loglvl, nlaunches, num_jobs, sleep_t
     # parse node file contents
     node_lists, sub_nproc_list = split_node_lists(num_jobs, total_node_list, ppn)
 
-    # create shared dataserver
-    ds = DataServer.setup(launchpad)
-    port = ds.address[1]
+    # shared-memory table of the launch_id running in each sub job, for the heartbeat
+    running_ids = Array('l', num_jobs)
 
     # launch rapidfire processes
-    processes = start_rockets(fworker, nlaunches, sleep_time, loglvl, port, node_lists,
-                              sub_nproc_list)
+    processes = start_rockets(fworker, nlaunches, sleep_time, loglvl, launchpad.to_dict(),
+                              running_ids, node_lists, sub_nproc_list)
 
     # start pinging service
     ping_stop = threading.Event()
-    ping_thread = threading.Thread(target=ping_multilaunch, args=(port, ping_stop))
+    ping_thread = threading.Thread(target=ping_multilaunch,
+                                   args=(launchpad, running_ids, processes, ping_stop))
     ping_thread.start()
 
     # wait for completion
@@ -145,4 +143,94 @@ def launch_multiprocess(launchpad, fworker, loglvl, nlaunches, num_jobs, sleep_t
         p.join()
     ping_stop.set()
     ping_thread.join()
-    ds.shutdown()
\ No newline at end of file
+
+
+def ping_multithread(launchpad, running_ids, stop_event):
+    """
+    A single heartbeat for all the Rockets running as threads in this process
+
+    :param launchpad: (LaunchPad) the LaunchPad shared by all threads
+    :param running_ids: (dict) thread ident -> launch_id of the running Rockets
+    :param stop_event: (Thread.Event) stop event
+    """
+    while not stop_event.is_set():
+        alive = set(t.ident for t in threading.enumerate())
+        for ident, lid in list(running_ids.items()):
+            if lid and ident in alive:
+                launchpad.ping_launch(lid)
+        stop_event.wait(PING_TIME_SECS)
+
+
+def rapidfire_thread(launchpad, fworker, m_dir, nlaunches, sleep_time, loglvl):
+    """
+    A version of rapidfire() that never changes the working directory of the process, so that
+    several can run as threads. Each Rocket is told its launch dir and passes it to the FireTasks
+    as fw_spec['_fw_launch_dir'].
+
+    :param launchpad: (LaunchPad) the LaunchPad shared by all threads
+    :param fworker: (FWorker) object
+    :param m_dir: (str) the directory in which to create the launch dirs
+    :param nlaunches: (int) 0 means 'until completion', -1 or "infinite" means to loop forever
+    :param sleep_time: (int) secs to sleep between rapidfire loop iterations
+    :param loglvl: (str) level at which to output logs to stdout
+    """
+    sleep_time = sleep_time if sleep_time else RAPIDFIRE_SLEEP_SECS
+    l_logger = get_fw_logger('rocket.launcher', l_dir=launchpad.get_logdir(), stream_level=loglvl)
+    nlaunches = -1 if nlaunches == 'infinite' else int(nlaunches)
+    num_launched = 0
+
+    while True:
+        while launchpad.run_exists(fworker):
+            launcher_dir = create_datestamp_dir(m_dir, l_logger, prefix='launcher_')
+            rocket_ran = launch_rocket(launchpad, fworker, strm_lvl=loglvl, launch_dir=launcher_dir)
+            if rocket_ran:
+                num_launched += 1
+            elif not os.listdir(launcher_dir):
+                # another thread checked out the FireWork first; remove the empty dir
+                os.rmdir(launcher_dir)
+            if num_launched == nlaunches:
+                break
+        if num_launched == nlaunches or nlaunches == 0:
+            break
+        log_multi(l_logger, 'Sleeping for {} secs'.format(sleep_time))
+        time.sleep(sleep_time)
+        log_multi(l_logger, 'Checking for FWs to run...')
+
+
+def launch_multithread(launchpad, fworker, loglvl, nlaunches, num_jobs, sleep_time, m_dir=None):
+    """
+    Launch num_jobs Rockets at a time as threads of this process. This suits I/O-bound FireTasks
+    (file transfers, calls to external services, waiting on subprocesses): all threads share one
+    LaunchPad connection and one heartbeat. FireTasks must not rely on the current directory,
+    but on fw_spec['_fw_launch_dir'] instead.
+
+    :param launchpad: (LaunchPad) object
+    :param fworker: (FWorker) object
+    :param loglvl: (str) level at which to output logs
+    :param nlaunches: (int) 0 means 'until completion', -1 or "infinite" means to loop forever
+    :param num_jobs: (int) number of threads
+    :param sleep_time: (int) secs to sleep between rapidfire loop iterations
+    :param m_dir: (str) the directory in which to create the launch dirs; default is the current dir
+    """
+    m_dir = os.path.abspath(m_dir if m_dir else os.getcwd())
+    running_ids = {}
+    FWData().RUNNING_THREADS = running_ids
+
+    threads = [threading.Thread(target=rapidfire_thread,
+                                args=(launchpad, fworker, m_dir, nlaunches, sleep_time, loglvl),
+                                name='rocket_thread_{}'.format(i))
+               for i in range(num_jobs)]
+    for t in threads:
+        t.start()
+
+    # start pinging service
+    ping_stop = threading.Event()
+    ping_thread = threading.Thread(target=ping_multithread, args=(launchpad, running_ids, ping_stop))
+    ping_thread.start()
+
+    # wait for completion
+    for t in threads:
+        t.join()
+    ping_stop.set()
+    ping_thread.join()
+    FWData().RUNNING_THREADS = None
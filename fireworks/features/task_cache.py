@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+"""
+This module contains the task cache, which lets a Rocket skip FireTasks whose result is already
+known. The cache is keyed by a hash of the FireTask, the values of the spec keys it declares as
+inputs, and (optionally) the checksums of its input files. On a hit, the stored FWAction is
+returned and the stored output files are written to the launch directory instead of running the
+FireTask.
+
+To use the cache, set the _task_cache key of the FireWork spec to a task cache object, e.g.:
+
+    spec['_task_cache'] = LocalTaskCache('/scratch/fw_cache', input_keys=['structure'],
+                                         output_files=['OUTCAR'])
+
+The cache is only correct if *every* input of the FireTasks is declared: the parameters of the
+FireTask itself are always part of the key, but spec values and files are only included if listed.
+"""
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from fireworks.utilities.fw_serializers import FWSerializable, serialize_fw, recursive_dict
+from fireworks.utilities.fw_utilities import file_checksum
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+class TaskCacheBase(FWSerializable):
+    """
+    This serves an Abstract class for implementing task caches. Subclasses implement get(), put()
+    and evict() for a storage backend.
+    """
+
+    def __init__(self, input_keys=None, input_files=None, output_files=None, max_size=None,
+                 max_age=None):
+        """
+        :param input_keys: ([str]) spec keys read by the FireTasks
+        :param input_files: ([str]) files (relative to the launch dir) read by the FireTasks
+        :param output_files: ([str]) files or glob patterns (relative to the launch dir) written by
+        the FireTasks, to be restored on a cache hit
+        :param max_size: (int) evict the least recently used entries beyond this many bytes
+        :param max_age: (int) evict entries older than this many seconds
+        """
+        self.input_keys = input_keys if input_keys else []
+        self.input_files = input_files if input_files else []
+        self.output_files = output_files if output_files else []
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get_key(self, task, spec, launch_dir):
+        """
+        Compute the cache key of a FireTask
+
+        :param task: (FireTaskBase) the FireTask about to run
+        :param spec: (dict) the spec the FireTask will be run with
+        :param launch_dir: (str) the launch directory
+        :return: (str) sha256 hex digest
+        """
+        m_input = {'task': recursive_dict(task),
+                   'spec': {k: recursive_dict(spec.get(k)) for k in self.input_keys},
+                   'files': {f: file_checksum(os.path.join(launch_dir, f))
+                             for f in self.input_files}}
+        m_str = json.dumps(m_input, sort_keys=True)
+        return hashlib.sha256(m_str.encode('utf-8')).hexdigest()
+
+    def replay(self, key, launch_dir, launchpad=None):
+        """
+        Look up a FireTask in the cache and, on a hit, restore its output files
+
+        :param key: (str) the cache key
+        :param launch_dir: (str) the launch directory to write output files to
+        :param launchpad: (LaunchPad) the LaunchPad of the Rocket
+        :return: (FWAction) the stored FWAction, or None on a miss
+        """
+        from fireworks.core.firework import FWAction
+
+        entry = self.get(key, launchpad)
+        if entry is None:
+            return None
+        action_dict, files = entry
+        for name, data in files.items():
+            path = os.path.join(launch_dir, name)
+            if os.path.dirname(name) and not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(data)
+        return FWAction.from_dict(action_dict)
+
+    def save(self, key, action, launch_dir, launchpad=None):
+        """
+        Store the result of a FireTask in the cache
+
+        :param key: (str) the cache key
+        :param action: (FWAction) the FWAction returned by the FireTask
+        :param launch_dir: (str) the launch directory to read output files from
+        :param launchpad: (LaunchPad) the LaunchPad of the Rocket
+        """
+        files = {}
+        for pattern in self.output_files:
+            for path in glob.glob(os.path.join(launch_dir, pattern)):
+                if os.path.isfile(path):
+                    with open(path, 'rb') as f:
+                        files[os.path.relpath(path, launch_dir)] = f.read()
+        self.put(key, action.to_dict(), files, launchpad)
+        self.evict(launchpad)
+
+    def get(self, key, launchpad=None):
+        """
+        :param key: (str) the cache key
+        :param launchpad: (LaunchPad) the LaunchPad of the Rocket
+        :return: ((dict, dict)) the FWAction dict and {filename: bytes}, or None if not cached
+        """
+        raise NotImplementedError
+
+    def put(self, key, action_dict, files, launchpad=None):
+        """
+        :param key: (str) the cache key
+        :param action_dict: (dict) the FWAction as a dict
+        :param files: (dict) {filename: bytes} of the output files
+        :param launchpad: (LaunchPad) the LaunchPad of the Rocket
+        """
+        raise NotImplementedError
+
+    def evict(self, launchpad=None):
+        """
+        Remove entries older than max_age, then the least recently used entries until the cache
+        is no larger than max_size
+
+        :param launchpad: (LaunchPad) the LaunchPad of the Rocket
+        """
+        raise NotImplementedError
+
+    @serialize_fw
+    def to_dict(self):
+        return {'input_keys': self.input_keys, 'input_files': self.input_files,
+                'output_files': self.output_files, 'max_size': self.max_size,
+                'max_age': self.max_age}
+
+    @classmethod
+    def from_dict(cls, m_dict):
+        return cls(**{k: v for k, v in m_dict.items() if not k.startswith('_')})
+
+
+class LocalTaskCache(TaskCacheBase):
+    """
+    A task cache stored in a local (or shared) directory, one subdirectory per entry. The
+    modification time of an entry is its last use.
+    """
+    _fw_name = 'LocalTaskCache'
+
+    def __init__(self, cache_dir, input_keys=None, input_files=None, output_files=None,
+                 max_size=None, max_age=None):
+        """
+        :param cache_dir: (str) directory holding the cache
+        (see TaskCacheBase for the other parameters)
+        """
+        TaskCacheBase.__init__(self, input_keys, input_files, output_files, max_size, max_age)
+        self.cache_dir = cache_dir
+
+    def get(self, key, launchpad=None):
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, 'FWAction.json')) as f:
+                action_dict = json.load(f)
+            files = {}
+            files_dir = os.path.join(entry_dir, 'files')
+            for root, _, filenames in os.walk(files_dir):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    with open(path, 'rb') as f:
+                        files[os.path.relpath(path, files_dir)] = f.read()
+            os.utime(entry_dir, None)
+        except (IOError, OSError):
+            return None  # not cached, or evicted while reading
+        return action_dict, files
+
+    def put(self, key, action_dict, files, launchpad=None):
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError:
+            if not os.path.isdir(self.cache_dir):
+                raise
+        # write the entry under a temporary name, then move it into place in one step
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp_')
+        try:
+            with open(os.path.join(tmp_dir, 'FWAction.json'), 'w') as f:
+                json.dump(action_dict, f)
+            for name, data in files.items():
+                path = os.path.join(tmp_dir, 'files', name)
+                if not os.path.exists(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                with open(path, 'wb') as f:
+                    f.write(data)
+            os.rename(tmp_dir, os.path.join(self.cache_dir, key))
+        except (IOError, OSError):
+            # e.g. another Rocket cached the same task first, or the disk is full
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def evict(self, launchpad=None):
+        if not self.max_size and not self.max_age:
+            return
+        entries = []  # (last use, size, path)
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('.tmp_'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                size = sum(os.path.getsize(os.path.join(root, f))
+                           for root, _, filenames in os.walk(path) for f in filenames)
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                pass  # evicted by another Rocket meanwhile
+        entries.sort()
+
+        now = time.time()
+        total_size = sum(e[1] for e in entries)
+        for last_used, size, path in entries:
+            if (self.max_age and now - last_used > self.max_age) or \
+                    (self.max_size and total_size > self.max_size):
+                shutil.rmtree(path, ignore_errors=True)
+                total_size -= size
+
+    @serialize_fw
+    def to_dict(self):
+        d = TaskCacheBase.to_dict(self)
+        d['cache_dir'] = self.cache_dir
+        return d
+
+
+class LaunchPadTaskCache(TaskCacheBase):
+    """
+    A task cache stored in a collection of the LaunchPad database, so that it is shared by all
+    FireWorkers. Each entry must fit in a single MongoDB document (16 MB).
+    """
+    _fw_name = 'LaunchPadTaskCache'
+
+    def __init__(self, collection='task_cache', input_keys=None, input_files=None,
+                 output_files=None, max_size=None, max_age=None):
+        """
+        :param collection: (str) name of the collection holding the cache
+        (see TaskCacheBase for the other parameters)
+        """
+        TaskCacheBase.__init__(self, input_keys, input_files, output_files, max_size, max_age)
+        self.collection = collection
+
+    def get(self, key, launchpad=None):
+        if not launchpad:
+            return None
+        doc = launchpad.db[self.collection].find_and_modify(
+            {'key': key}, {'$set': {'last_used': datetime.datetime.utcnow()}})
+        if not doc:
+            return None
+        return doc['action'], {f['name']: bytes(f['data']) for f in doc['files']}
+
+    def put(self, key, action_dict, files, launchpad=None):
+        if not launchpad:
+            return
+        from bson.binary import Binary
+
+        now = datetime.datetime.utcnow()
+        coll = launchpad.db[self.collection]
+        coll.ensure_index('key', unique=True)
+        coll.update({'key': key},
+                    {'key': key, 'action': action_dict,
+                     'files': [{'name': n, 'data': Binary(d)} for n, d in files.items()],
+                     'size': sum(len(d) for d in files.values()),
+                     'created_on': now, 'last_used': now}, upsert=True)
+
+    def evict(self, launchpad=None):
+        if not launchpad:
+            return
+        coll = launchpad.db[self.collection]
+        if self.max_age:
+            cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.max_age)
+            coll.remove({'last_used': {'$lt': cutoff}})
+        if self.max_size:
+            total_size = sum(d['size'] for d in coll.find({}, {'size': 1}))
+            for d in coll.find({}, {'size': 1}).sort('last_used', 1):
+                if total_size <= self.max_size:
+                    break
+                coll.remove({'_id': d['_id']})
+                total_size -= d['size']
+
+    @serialize_fw
+    def to_dict(self):
+        d = TaskCacheBase.to_dict(self)
+        d['collection'] = self.collection
+        return d
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+"""
+Tests for the multi job launcher, using an in-memory stand-in for the
+LaunchPad so that MongoDB is not needed.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import glob
+from multiprocessing import Array, Process
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from fireworks.core.firework import FireWork
+from fireworks.core.rocket import start_ping_launch
+from fireworks.features.multi_launcher import launch_multithread, ping_multilaunch
+from fireworks.fw_config import FWData
+from fireworks.user_objects.firetasks.fileio_tasks import FileWriteTask
+from fireworks.user_objects.firetasks.script_task import ScriptTask
+
+
+class MemoryLaunchPad(object):
+    def __init__(self, nfws):
+        self.fws = {}
+        for i in range(1, nfws + 1):
+            tasks = [FileWriteTask(files_to_write=[{"filename": "hello.txt",
+                                                    "contents": str(i)}]),
+                     ScriptTask.from_str('cat hello.txt > copy.txt')]
+            self.fws[i] = FireWork(tasks, fw_id=i, state='READY')
+        self.launches = {}
+        self.lock = threading.Lock()
+
+    def get_logdir(self):
+        return None
+
+    def run_exists(self, fworker=None):
+        return 'READY' in [fw.state for fw in self.fws.values()]
+
+    def checkout_fw(self, fworker, launch_dir, fw_id=None, host=None, ip=None):
+        with self.lock:
+            for fw_id in sorted(self.fws):
+                if self.fws[fw_id].state == 'READY':
+                    self.fws[fw_id].state = 'RUNNING'
+                    launch_id = len(self.launches) + 1
+                    self.launches[launch_id] = (fw_id, launch_dir)
+                    return self.fws[fw_id], launch_id
+        return None, None
+
+    def complete_launch(self, launch_id, action, state='COMPLETED'):
+        self.fws[self.launches[launch_id][0]].state = state
+
+    def ping_launch(self, launch_id, ptime=None):
+        pass
+
+    def log_message(self, level, message):
+        pass
+
+
+def run_sub_job(running_ids, job_id, launch_id):
+    FWData().MULTIPROCESSING = True
+    FWData().RUNNING_IDS = running_ids
+    FWData().SUB_JOB_ID = job_id
+    start_ping_launch(None, launch_id)
+
+
+class PingingLaunchPad(object):
+    def __init__(self, stop_event):
+        self.pings = []
+        self.stop_event = stop_event
+
+    def ping_launch(self, launch_id, ptime=None):
+        self.pings.append(launch_id)
+        self.stop_event.set()
+
+
+class MultiprocessRunTableTest(unittest.TestCase):
+
+    def test_ping_running_ids(self):
+        running_ids = Array('l', 3)
+        processes = [Process(target=run_sub_job, args=(running_ids, i, 10 + i))
+                     for i in range(3)]
+        for p in processes[1:]:
+            p.start()
+            p.join()
+        self.assertEqual(running_ids[:], [0, 11, 12])
+
+        # only the live sub job with a running launch is pinged
+        processes[1].is_alive = lambda: True
+        stop = threading.Event()
+        lp = PingingLaunchPad(stop)
+        ping_multilaunch(lp, running_ids, processes, stop)
+        self.assertEqual(lp.pings, [11])
+
+
+class MultithreadLaunchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old_wd = os.getcwd()
+        self.launch_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        os.chdir(self.old_wd)
+        shutil.rmtree(self.launch_dir)
+
+    def test_launch_dirs(self):
+        lp = MemoryLaunchPad(8)
+        launch_multithread(lp, None, 'ERROR', 0, 4, None, self.launch_dir)
+
+        self.assertEqual(os.getcwd(), self.old_wd)
+        self.assertIsNone(FWData().RUNNING_THREADS)
+        self.assertEqual(set(fw.state for fw in lp.fws.values()),
+                         set(['COMPLETED']))
+        # every FireWork ran in its own launcher dir
+        self.assertEqual(len(glob.glob(os.path.join(self.launch_dir, 'launcher_*'))), 8)
+        for fw_id, launch_dir in lp.launches.values():
+            with open(os.path.join(launch_dir, 'copy.txt')) as f:
+                self.assertEqual(f.read(), str(fw_id))
+            self.assertTrue(os.path.exists(os.path.join(launch_dir, 'FW.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
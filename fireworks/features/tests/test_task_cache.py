@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Tests for the task cache, using an in-memory stand-in for the LaunchPad so
+that MongoDB is not needed.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fireworks.core.firework import FireWork, FWAction
+from fireworks.core.fworker import FWorker
+from fireworks.core.rocket import Rocket
+from fireworks.features.task_cache import LocalTaskCache
+from fireworks.user_objects.firetasks.script_task import ScriptTask
+
+
+class MemoryLaunchPad(object):
+    def __init__(self, fw):
+        self.fw = fw
+        self.actions = []
+
+    def checkout_fw(self, fworker, launch_dir, fw_id=None, host=None, ip=None):
+        return self.fw, 1
+
+    def complete_launch(self, launch_id, action, state='COMPLETED'):
+        self.actions.append((state, action))
+
+    def ping_launch(self, launch_id, ptime=None):
+        pass
+
+    def log_message(self, level, message):
+        pass
+
+
+class LocalTaskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.scratch_dir, 'cache')
+        self.launch_dir = os.path.join(self.scratch_dir, 'launch')
+        os.mkdir(self.launch_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+
+    def test_key(self):
+        cache = LocalTaskCache(self.cache_dir, input_keys=['a'], input_files=['in.txt'])
+        task = ScriptTask.from_str('cat in.txt')
+        with open(os.path.join(self.launch_dir, 'in.txt'), 'w') as f:
+            f.write('1')
+        key = cache.get_key(task, {'a': 1, 'b': 1}, self.launch_dir)
+
+        self.assertEqual(key, cache.get_key(task, {'a': 1, 'b': 2}, self.launch_dir))
+        self.assertNotEqual(key, cache.get_key(task, {'a': 2, 'b': 1}, self.launch_dir))
+        self.assertNotEqual(key, cache.get_key(ScriptTask.from_str('ls'), {'a': 1},
+                                               self.launch_dir))
+        with open(os.path.join(self.launch_dir, 'in.txt'), 'w') as f:
+            f.write('2')
+        self.assertNotEqual(key, cache.get_key(task, {'a': 1}, self.launch_dir))
+
+    def test_save_replay(self):
+        cache = LocalTaskCache(self.cache_dir, output_files=['*.out'])
+        with open(os.path.join(self.launch_dir, 'a.out'), 'w') as f:
+            f.write('result')
+        cache.save('k', FWAction(stored_data={'x': 1}), self.launch_dir)
+
+        new_dir = os.path.join(self.scratch_dir, 'new')
+        os.mkdir(new_dir)
+        self.assertIsNone(cache.replay('other', new_dir))
+        action = cache.replay('k', new_dir)
+        self.assertEqual(action.stored_data, {'x': 1})
+        with open(os.path.join(new_dir, 'a.out')) as f:
+            self.assertEqual(f.read(), 'result')
+
+    def test_evict(self):
+        cache = LocalTaskCache(self.cache_dir, output_files=['a.out'])
+        with open(os.path.join(self.launch_dir, 'a.out'), 'w') as f:
+            f.write('x' * 1000)
+        for key in ['k1', 'k2', 'k3']:
+            cache.save(key, FWAction(), self.launch_dir)
+            os.utime(os.path.join(self.cache_dir, key), (time.time() - 100, time.time() - 100))
+        cache.get('k1')  # k1 is now the most recently used
+        cache.max_size = 1500
+        cache.evict()
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['k1'])
+
+        cache.max_age = 10
+        os.utime(os.path.join(self.cache_dir, 'k1'), (time.time() - 100, time.time() - 100))
+        cache.evict()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_evict_vanished(self):
+        cache = LocalTaskCache(self.cache_dir, max_size=1)
+        cache.save('k1', FWAction(), self.launch_dir)
+        # an entry that another Rocket removes while it is being listed
+        os.symlink(os.path.join(self.scratch_dir, 'gone'), os.path.join(self.cache_dir, 'k2'))
+        cache.evict()
+        self.assertEqual(os.listdir(self.cache_dir), ['k2'])
+
+    def test_rocket_cache_error(self):
+        # the input file is missing, so the cache key can't be computed; the task just runs
+        cache = LocalTaskCache(self.cache_dir, input_files=['missing.txt'])
+        fw = FireWork(ScriptTask.from_str('echo hello'), spec={'_task_cache': cache}, fw_id=1)
+        lp = MemoryLaunchPad(fw)
+        Rocket(lp, FWorker(), 1, self.launch_dir).run()
+        self.assertEqual([a[0] for a in lp.actions], ['COMPLETED'])
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_rocket(self):
+        count_file = os.path.join(self.scratch_dir, 'count')
+        task = ScriptTask.from_str('echo ran >> {} && echo hello > hello.out'.format(count_file))
+        cache = LocalTaskCache(self.cache_dir, output_files=['hello.out'])
+        fw = FireWork(task, spec={'_task_cache': cache}, fw_id=1)
+        fw = FireWork.from_dict(fw.to_dict())
+        self.assertEqual(fw.spec['_task_cache'].fw_name, 'LocalTaskCache')
+
+        lp = MemoryLaunchPad(fw)
+        for i in range(2):
+            launch_dir = os.path.join(self.scratch_dir, 'launch_{}'.format(i))
+            os.mkdir(launch_dir)
+            Rocket(lp, FWorker(), 1, launch_dir).run()
+            with open(os.path.join(launch_dir, 'hello.out')) as f:
+                self.assertEqual(f.read(), 'hello\n')
+
+        with open(count_file) as f:
+            self.assertEqual(f.read(), 'ran\n')  # the second run was a cache hit
+        self.assertEqual([a[0] for a in lp.actions], ['COMPLETED', 'COMPLETED'])
+        self.assertEqual(lp.actions[1][1].stored_data['returncode'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,12 +31,16 @@ FW_NAME_UPDATES = {'Transfer Task': 'FileTransferTask',
 
 YAML_STYLE = False  # controls whether YAML documents will be nested as braces or blocks (False = blocks)
 
+JSON_USE_ORJSON = False  # read and write JSON with the faster orjson package, if it is installed
+
 FW_BLOCK_FORMAT = '%Y-%m-%d-%H-%M-%S-%f'  # date format for writing block directories in "rapid-fire" mode
 
 FW_LOGGING_FORMAT = '%(asctime)s %(levelname)s %(message)s'  # format for loggers
 
 QUEUE_RETRY_ATTEMPTS = 10  # number of attempts to re-try communicating with queue server in failures
 QUEUE_UPDATE_INTERVAL = 5  # max interval (seconds) needed for queue to update after submitting a job
+QUEUE_SUBMIT_CONCURRENCY = 8  # max number of submit commands (e.g. sbatch) run at once by qlaunch
+QUEUE_SUBMIT_TIMEOUT = 60  # seconds to wait for a submit command before giving up on it
 
 SUBMIT_SCRIPT_NAME = 'FW_submit.script'  # name of submit script
 
@@ -45,9 +49,14 @@ PRINT_FW_YAML = False
 
 PING_TIME_SECS = 3600  # while Running a job, how often to ping back the server that we're still alive
 RUN_EXPIRATION_SECS = PING_TIME_SECS * 4  # mark job as FIZZLED if not pinged in this time
+PING_JITTER_SECS = 60  # random delay added to each ping, so that many Rockets don't ping at once
+
+SCHEDULER_THREADS = 2  # threads running the BackgroundTasks of all Rockets in a process
 
 MAINTAIN_INTERVAL = 120  # seconds between maintenance intervals when running infinite maintenance
 
+OFFLINE_RECOVERY_THREADS = 8  # number of offline runs to recover at once (reading files on a shared filesystem)
+
 RESERVATION_EXPIRATION_SECS = 60 * 60 * 24 * 14  # a job can stay in a queue this long before we
 # cancel its reservation
 
@@ -60,14 +69,17 @@ QUEUEADAPTER_LOC = None  # where to find the my_queueadapter.yaml file
 CONFIG_FILE_DIR = '.'  # directory containing config files (if not individually set)
 
 QSTAT_FREQUENCY = 50  # set this higher to avoid qstats, lower to alwas
+QUEUE_STATE_TTL = 30  # seconds that qlaunch processes share the result of a qstat
+QUEUE_STATE_CACHE_DIR = None  # dir for the shared qstat results (None: a dir in the system temp dir)
 
 ALWAYS_CREATE_NEW_BLOCK = False  # always create new block on queue launcher call
 
 TEMPLATE_DIR = None  # default template dir for TemplateWriterTask
+TEMPLATE_CACHE_DIR = None  # dir for compiled Jinja2 templates (None: a dir in the system temp dir)
 
 REMOVE_USELESS_DIRS = True  # deletes empty launch dir if _launch_dir set
 
-DS_PASSWORD = b'1234'  # dummy password to access DataServer
+DS_PASSWORD = b'1234'  # no longer used (the multi job launcher has no DataServer); kept for old configs
 
 STORE_PACKING_INFO = True  # automatically add job packing info to stored_data
 
@@ -75,10 +87,17 @@ PW_CHECK_NUM = 10  # number of entries that can be modified in single lpad comma
 
 TRACKER_LINES = 25  # number of lines to return in Tracker
 
+SCRIPT_STORED_OUTPUT_BYTES = 1000000  # max bytes of stdout/stderr stored by ScriptTask (the start and end are kept)
+
+FILE_TRANSFER_WORKERS = 4  # number of files FileTransferTask transfers at the same time
+
 SORT_FWS = ''  # sort equal priority FWs? "FILO" or "FIFO".
 
 HOME_FOLDER = os.path.expanduser('~')
 
+# on-disk registry of _fw_name -> module used by load_object() (None = don't persist)
+FW_NAME_CACHE = os.path.join(HOME_FOLDER, '.fireworks', 'fw_name_cache.json')
+
 
 def override_user_settings():
     module_dir = os.path.dirname(os.path.abspath(__file__))
@@ -166,4 +185,6 @@ class FWData(object):
         self.MULTIPROCESSING = None  # default single process framework
         self.NODE_LIST = None  # the node list for sub jobs
         self.SUB_NPROCS = None  # the number of process of the sub job
-        self.DATASERVER = None  # the shared object manager
+        self.RUNNING_IDS = None  # shared array of the launch_id running in each sub job (0 if none)
+        self.SUB_JOB_ID = None  # index of this sub job in RUNNING_IDS
+        self.RUNNING_THREADS = None  # thread ident -> launch_id, when Rockets run as threads
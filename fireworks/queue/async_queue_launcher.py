@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""
+This module submits a batch of separate jobs to the queue concurrently, with asyncio (Python 3.7+). \
+It is imported by the Queue Launcher only when a batch is requested (qlaunch rapidfire \
+--batch_size), so the rest of FireWorks runs on older versions of Python.
+
+Queue adapters can define a coroutine method submit_to_queue_async(script_file, timeout) that \
+submits a job from the directory of the script and returns its job id. Otherwise, the submit \
+command of a CommonAdapter is run as an asyncio subprocess, and the submit_to_queue() method of \
+other adapters runs in a thread.
+"""
+
+import asyncio
+import os
+import signal
+
+from fireworks.core.fworker import FWorker
+from fireworks.queue.queue_launcher import _check_launch_options, _write_job_script
+from fireworks.user_objects.queue_adapters.common_adapter import CommonAdapter
+from fireworks.utilities.fw_utilities import get_fw_logger, log_exception, log_fancy
+from fireworks.fw_config import QUEUE_SUBMIT_CONCURRENCY, QUEUE_SUBMIT_TIMEOUT
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+def launch_rockets_to_queue(launchpad, fworker, qadapter, launcher_dirs, reserve=False,
+                            strm_lvl='INFO', max_concurrent=None, timeout=None):
+    """
+    Submit a job per launcher directory, concurrently. The queue scripts are written in threads \
+    and the submit commands run as asyncio subprocesses, at most max_concurrent at a time. In \
+    reservation mode, the FireWorks are reserved, and their reservation ids recorded, in bulk.
+
+    :param launchpad: (LaunchPad)
+    :param fworker: (FWorker)
+    :param qadapter: (QueueAdapterBase)
+    :param launcher_dirs: ([str]) a directory per job. Directories left without a FireWork to \
+    run are removed.
+    :param reserve: (bool) Whether to queue in reservation mode
+    :param strm_lvl: (str) level at which to stream log messages
+    :param max_concurrent: (int) number of submit commands to run at once (default \
+    QUEUE_SUBMIT_CONCURRENCY)
+    :param timeout: (float) seconds to wait for each submit command (default QUEUE_SUBMIT_TIMEOUT)
+    :return: (int) the number of jobs submitted
+    """
+
+    fworker = fworker if fworker else FWorker()
+    launcher_dirs = [os.path.abspath(d) for d in launcher_dirs]
+    max_concurrent = max_concurrent if max_concurrent else QUEUE_SUBMIT_CONCURRENCY
+    timeout = timeout if timeout else QUEUE_SUBMIT_TIMEOUT
+    l_logger = get_fw_logger('queue.launcher', l_dir=launchpad.logdir, stream_level=strm_lvl)
+
+    for launcher_dir in launcher_dirs:
+        if not os.path.exists(launcher_dir):
+            raise ValueError('Desired launch directory {} does not exist!'.format(launcher_dir))
+
+    _check_launch_options(qadapter, reserve)
+
+    if not launchpad.run_exists(fworker):
+        l_logger.info('No jobs exist in the LaunchPad for submission to queue!')
+        return 0
+
+    tasks = []
+    job_ids = []
+    try:
+        if reserve:
+            l_logger.debug('finding FWs to reserve...')
+            reserved = launchpad.reserve_fws(fworker, launcher_dirs)
+            l_logger.info('reserved FWs with fw_ids: {}'.format([fw.fw_id for fw, _ in reserved]))
+            tasks = [(fw, launch_id, launcher_dir)
+                     for (fw, launch_id), launcher_dir in zip(reserved, launcher_dirs)]
+        else:
+            # don't submit more jobs than there are FireWorks to run
+            query = dict(fworker.query, state='READY')
+            n_ready = launchpad.get_fw_ids(query, count_only=True)
+            tasks = [(None, None, launcher_dir) for launcher_dir in launcher_dirs[:n_ready]]
+        for launcher_dir in launcher_dirs[len(tasks):]:
+            os.rmdir(launcher_dir)
+
+        l_logger.info('submitting {} queue scripts'.format(len(tasks)))
+        job_ids = asyncio.run(_submit_jobs(launchpad, qadapter, tasks, reserve, max_concurrent,
+                                           timeout, l_logger))
+    except:
+        log_exception(l_logger, 'Error writing/submitting queue scripts!')
+        job_ids = [None] * len(tasks)
+
+    if reserve:
+        launchpad.set_reservation_ids({launch_id: job_id for (_, launch_id, _), job_id
+                                       in zip(tasks, job_ids) if job_id}, qadapter)
+        failed = [launch_id for (_, launch_id, _), job_id in zip(tasks, job_ids) if not job_id]
+        if failed:
+            l_logger.info('Un-reserving FWs with launch_ids: {}'.format(failed))
+            launchpad.cancel_reservations(failed)
+    return len([job_id for job_id in job_ids if job_id])
+
+
+async def submit_to_queue_async(qadapter, script_file, timeout=None):
+    """
+    Submit a job to the queue without blocking the event loop
+
+    :param qadapter: (QueueAdapterBase)
+    :param script_file: (str) absolute path of the script file
+    :param timeout: (float) seconds to wait for the submission
+    :return: job_id, or None if the submission failed
+    """
+    if hasattr(qadapter, 'submit_to_queue_async'):
+        return await qadapter.submit_to_queue_async(script_file, timeout)
+    if isinstance(qadapter, CommonAdapter):
+        return await _submit_common_adapter(qadapter, script_file, timeout)
+    # submitted from the current directory
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(None, qadapter.submit_to_queue,
+                                                       script_file), timeout)
+
+
+async def _submit_jobs(launchpad, qadapter, tasks, reserve, max_concurrent, timeout, l_logger):
+    """
+    Internal method to write the queue scripts of jobs and submit them concurrently
+
+    :param tasks: ([(FireWork, int, str)]) the reserved FireWork, its launch_id and the launcher \
+    directory of each job (the FireWork and launch_id are None outside of reservation mode)
+    :return: ([]) the job id of each task, or None if it was not submitted
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def submit(task):
+        # writing the files (and registering offline runs) blocks, so it is left to threads
+        script_file = await loop.run_in_executor(None, _write_job_script, launchpad, qadapter,
+                                                 task, reserve)
+        async with semaphore:
+            return await submit_to_queue_async(qadapter, script_file, timeout)
+
+    results = await asyncio.gather(*[submit(task) for task in tasks], return_exceptions=True)
+    job_ids = []
+    for (_, _, launcher_dir), result in zip(tasks, results):
+        if isinstance(result, BaseException):
+            l_logger.error('Error writing/submitting queue script in {}: {!r}'.format(launcher_dir,
+                                                                                     result))
+            result = None
+        job_ids.append(result if result else None)
+    return job_ids
+
+
+async def _submit_common_adapter(qadapter, script_file, timeout):
+    """
+    Internal method to run the submit command of a CommonAdapter from the directory of the script
+
+    :return: (int) job_id, or None if the submission failed
+    """
+    if not os.path.exists(script_file):
+        raise ValueError(
+            'Cannot find script file located at: {}'.format(
+                script_file))
+
+    queue_logger = qadapter.get_qlogger('qadapter.{}'.format(qadapter.q_name))
+    submit_cmd = CommonAdapter.supported_q_types[qadapter.q_type]
+    cmd = [submit_cmd, script_file]
+    try:
+        p = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            cwd=os.path.dirname(script_file), start_new_session=True)
+        try:
+            out, err = await asyncio.wait_for(p.communicate(), timeout)
+        except asyncio.TimeoutError:
+            # kill the children of the command too, which may be holding on to its output
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except (AttributeError, OSError):
+                p.kill()
+            await p.wait()
+            log_fancy(queue_logger, ['Job submission with cmd {} timed out after {} '
+                                     'seconds'.format(cmd, timeout)], 'error')
+            return None
+    except Exception:
+        # random error, e.g. no qsub on machine!
+        log_exception(queue_logger,
+                      'Running the command: {} caused an error...'
+                      .format(submit_cmd))
+        return None
+    return qadapter._get_submitted_job_id(cmd, script_file, p.returncode,
+                                          out.decode(errors='replace'),
+                                          err.decode(errors='replace'))
@@ -11,8 +11,11 @@ import threading
 import traceback
 import abc
 import collections
+import six
+from six.moves import shlex_quote
 from fireworks.utilities.fw_serializers import FWSerializable, serialize_fw
 from fireworks.utilities.fw_utilities import get_fw_logger
+from fireworks.utilities.template_cache import TemplateCache
 
 __author__ = 'Anubhav Jain'
 __credits__ = 'Shyue Ping Ong'
@@ -40,7 +43,7 @@ class Command(object):
         initialize the object
         :param command: command to run
         """
-        if isinstance(command, basestring):
+        if isinstance(command, six.string_types):
             command = shlex.split(command)
         self.command = command
 
@@ -64,6 +67,7 @@ class Command(object):
             kwargs['stdout'] = subprocess.PIPE
         if 'stderr' not in kwargs:
             kwargs['stderr'] = subprocess.PIPE
+        kwargs.setdefault('universal_newlines', True)  # parse the output as text
         # thread
         thread = threading.Thread(target=target, kwargs=kwargs)
         thread.start()
@@ -102,28 +106,52 @@ class QueueAdapterBase(collections.defaultdict, FWSerializable):
         :param launch_dir: (str) The directory the job will be launched in
         :return: (str) the queue script
         """
-        with open(self.template_file) as f:
-            a = QScriptTemplate(f.read())
+        return self._get_script_str({'launch_dir': os.path.abspath(launch_dir)})
 
-            # set substitution dict for replacements into the template
-            subs_dict = {k: v for k, v in self.items()
-                         if v is not None}  # clean null values
+    def get_array_script_str(self, launch_dirs_file, fw_ids_file=None):
+        """
+        returns the queue script of a job array. Task i of the array (counting from 1) runs in the \
+        directory on line i of launch_dirs_file and, if fw_ids_file is given, runs the FireWork whose \
+        id is on line i of fw_ids_file.
+
+        :param launch_dirs_file: (str) file listing the launch directories of the tasks
+        :param fw_ids_file: (str) file listing the fw_ids of the tasks (reservation mode)
+        :return: (str) the queue script
+        """
+        index_var = self.get_array_index_var()
+        if not index_var:
+            raise ValueError('Queue adapter {} does not support job arrays!'.format(self.q_name))
+
+        def task_line(filename):
+            return '"$(sed -n "${{{}}}p" {})"'.format(index_var,
+                                                     shlex_quote(os.path.abspath(filename)))
+
+        subs_dict = {'launch_dir': task_line(launch_dirs_file)}
+        if fw_ids_file:
+            subs_dict['rocket_launch'] = '{} --fw_id {}'.format(self['rocket_launch'],
+                                                                task_line(fw_ids_file))
+        return self._get_script_str(subs_dict)
 
-            for k, v in self.defaults.items():
-                subs_dict.setdefault(k, v)
+    def _get_script_str(self, extra_subs):
+        a = _qscript_templates.get(self.template_file)
 
-            subs_dict['job_name'] = subs_dict.get('job_name', 'FW_job')
+        # set substitution dict for replacements into the template
+        subs_dict = {k: v for k, v in self.items()
+                     if v is not None}  # clean null values
 
-            launch_dir = os.path.abspath(launch_dir)
-            subs_dict['launch_dir'] = launch_dir
+        for k, v in self.defaults.items():
+            subs_dict.setdefault(k, v)
 
-            # might contain unused parameters as leftover $$
-            unclean_template = a.safe_substitute(subs_dict)
+        subs_dict['job_name'] = subs_dict.get('job_name', 'FW_job')
+        subs_dict.update(extra_subs)
 
-            clean_template = filter(lambda l: "$$" not in l,
-                                    unclean_template.split('\n'))
+        # might contain unused parameters as leftover $$
+        unclean_template = a.safe_substitute(subs_dict)
 
-            return '\n'.join(clean_template)
+        clean_template = filter(lambda l: "$$" not in l,
+                                unclean_template.split('\n'))
+
+        return '\n'.join(clean_template)
 
     @abc.abstractmethod
     def submit_to_queue(self, script_file):
@@ -135,6 +163,42 @@ class QueueAdapterBase(collections.defaultdict, FWSerializable):
         """
         pass
 
+    def get_array_index_var(self):
+        """
+        :return: (str) environment variable holding the index (counting from 1) of a task of a job \
+        array, or None if the adapter can't submit job arrays
+        """
+        return None
+
+    def submit_array_to_queue(self, script_file, n_tasks):
+        """
+        submits a job array of n_tasks tasks to the queue and returns its job id
+
+        :param script_file: (str) name of the script file to use (String)
+        :param n_tasks: (int) number of tasks in the array
+        :return: job_id of the array
+        """
+        raise NotImplementedError('Queue adapter {} does not support job arrays!'.format(
+            self.q_name))
+
+    def get_array_task_id(self, job_id, index):
+        """
+        :param job_id: the job id of an array
+        :param index: (int) the index of a task, counting from 1
+        :return: (str) the id of the task in the queue
+        """
+        return '{}[{}]'.format(job_id, index)
+
+    def get_queue_jobs(self, username=None, max_age=None):
+        """
+        returns the jobs of the user in the queue
+
+        :param username: (str) the username of the jobs to list (default is to autodetect)
+        :param max_age: (float) accept a list at most this many seconds old (default QUEUE_STATE_TTL)
+        :return: (dict) job_id (str) -> QueueJob, or None if the adapter can't list the jobs
+        """
+        return None
+
     @abc.abstractmethod
     def get_njobs_in_queue(self, username=None):
         """
@@ -162,3 +226,6 @@ class QueueAdapterBase(collections.defaultdict, FWSerializable):
 
 class QScriptTemplate(string.Template):
     delimiter = '$$'
+
+
+_qscript_templates = TemplateCache(QScriptTemplate)  # parsed queue script templates
@@ -7,8 +7,11 @@ The details of job submission and queue communication are handled using Queueada
 which specifies a QueueAdapter as well as desired properties of the submit script.
 """
 
+from collections import OrderedDict
 import os
+import sys
 import glob
+import json
 import time
 from monty.os import cd
 from fireworks.core.fworker import FWorker
@@ -26,6 +29,9 @@ __maintainer__ = 'Anubhav Jain'
 __email__ = 'ajain@lbl.gov'
 __date__ = 'Dec 12, 2012'
 
+ARRAY_LAUNCH_DIRS_FILE = 'FW_array_launch_dirs.txt'  # launch directory of each task of a job array
+ARRAY_FW_IDS_FILE = 'FW_array_fw_ids.txt'  # fw_id of each task of a job array (reservation mode)
+
 # TODO: clean up method signatures
 
 def launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir='.', reserve=False, strm_lvl='INFO'):
@@ -53,11 +59,7 @@ def launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir='.', reser
     if not os.path.exists(launcher_dir):
         raise ValueError('Desired launch directory {} does not exist!'.format(launcher_dir))
 
-    if '--offline' in qadapter['rocket_launch'] and not reserve:
-                raise ValueError("Must use reservation mode (-r option) of qlaunch when using offline option of rlaunch!!")
-
-    if reserve and 'singleshot' not in qadapter.get('rocket_launch', ''):
-        raise ValueError('Reservation mode of queue launcher only works for singleshot Rocket Launcher!')
+    _check_launch_options(qadapter, reserve)
 
     if launchpad.run_exists(fworker):
         try:
@@ -111,7 +113,7 @@ def launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir='.', reser
                         launchpad.cancel_reservation(launch_id)
                     raise RuntimeError('queue script could not be submitted, check queue script/queue adapter/queue server status!')
                 elif reserve:
-                    launchpad.set_reservation_id(launch_id, reservation_id)
+                    launchpad.set_reservation_id(launch_id, reservation_id, qadapter)
             return reservation_id
 
         except:
@@ -126,8 +128,190 @@ def launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir='.', reser
         return False
 
 
+def launch_array_to_queue(launchpad, fworker, qadapter, launcher_dirs, reserve=False, strm_lvl='INFO'):
+    """
+    Submit a job array to the queue, with one task per launcher directory. In reservation mode, a \
+    FireWork is reserved for each task; FireWorks that override queue parameters (_queueadapter) \
+    are submitted as one array per set of parameters.
+
+    :param launchpad: (LaunchPad)
+    :param fworker: (FWorker)
+    :param qadapter: (QueueAdapterBase) an adapter that supports job arrays
+    :param launcher_dirs: ([str]) the directories of the tasks; the job script is submitted from \
+    the first one. Directories left without a FireWork to reserve are removed.
+    :param reserve: (bool) Whether to queue in reservation mode
+    :param strm_lvl: (str) level at which to stream log messages
+    :return: (int) the number of tasks submitted
+    """
+
+    fworker = fworker if fworker else FWorker()
+    launcher_dirs = [os.path.abspath(d) for d in launcher_dirs]
+    l_logger = get_fw_logger('queue.launcher', l_dir=launchpad.logdir, stream_level=strm_lvl)
+
+    for launcher_dir in launcher_dirs:
+        if not os.path.exists(launcher_dir):
+            raise ValueError('Desired launch directory {} does not exist!'.format(launcher_dir))
+
+    _check_launch_options(qadapter, reserve)
+
+    if not qadapter.get_array_index_var():
+        raise ValueError('Queue adapter {} does not support job arrays!'.format(qadapter.q_name))
+
+    if not launchpad.run_exists(fworker):
+        l_logger.info('No jobs exist in the LaunchPad for submission to queue!')
+        return 0
+
+    arrays = []
+    try:
+        if reserve:
+            l_logger.debug('finding FWs to reserve...')
+            reserved = launchpad.reserve_fws(fworker, launcher_dirs)
+            l_logger.info('reserved FWs with fw_ids: {}'.format([fw.fw_id for fw, _ in reserved]))
+            groups = OrderedDict()
+            for (fw, launch_id), launcher_dir in zip(reserved, launcher_dirs):
+                key = json.dumps(fw.spec.get('_queueadapter'), sort_keys=True, default=str)
+                groups.setdefault(key, []).append((fw, launch_id, launcher_dir))
+            arrays = list(groups.values())
+            for launcher_dir in launcher_dirs[len(reserved):]:
+                os.rmdir(launcher_dir)
+        else:
+            # don't start more tasks than there are FireWorks to run
+            query = dict(fworker.query, state='READY')
+            n_ready = launchpad.get_fw_ids(query, count_only=True)
+            for launcher_dir in launcher_dirs[n_ready:]:
+                os.rmdir(launcher_dir)
+            tasks = [(None, None, launcher_dir) for launcher_dir in launcher_dirs[:n_ready]]
+            arrays = [tasks] if tasks else []
+
+        n_submitted = 0
+        while arrays:
+            n_submitted += _submit_array(launchpad, qadapter, arrays[0], reserve, l_logger)
+            arrays.pop(0)
+        return n_submitted
+
+    except:
+        log_exception(l_logger, 'Error writing/submitting job array!')
+        if reserve:
+            for tasks in arrays:
+                for fw, launch_id, _ in tasks:
+                    l_logger.info('Un-reserving FW with fw_id, launch_id: {}, {}'.format(
+                        fw.fw_id, launch_id))
+                    launchpad.cancel_reservation(launch_id)
+        return 0
+
+
+def _submit_array(launchpad, qadapter, tasks, reserve, l_logger):
+    """
+    Internal method to write and submit the script of a job array
+
+    :param tasks: ([(FireWork, int, str)]) the reserved FireWork, its launch_id and the launcher \
+    directory of each task (the FireWork and launch_id are None outside of reservation mode)
+    :return: (int) the number of tasks submitted
+    """
+    qadapter = load_object(qadapter.to_dict())  # make a defensive copy
+    submit_dir = tasks[0][2]
+
+    if reserve:
+        # the queue parameters are shared by the whole array
+        first_fw = tasks[0][0]
+        qadapter.update({'job_name': get_slug(first_fw.name)[0:20]})
+        if '_queueadapter' in first_fw.spec:
+            l_logger.debug('updating queue params using FireWork spec..')
+            qadapter.update(first_fw.spec['_queueadapter'])
+
+    launch_dirs = []
+    for fw, launch_id, launcher_dir in tasks:
+        launch_dir = launcher_dir
+        if reserve and '--offline' in qadapter['rocket_launch']:
+            launch_dir = _write_offline_files(launchpad, fw, launch_id, launcher_dir)
+        launch_dirs.append(launch_dir)
+
+    l_logger.info('moving to launch_dir {}'.format(submit_dir))
+    with cd(submit_dir):
+        l_logger.debug('writing queue script')
+        if len(tasks) == 1:
+            # a plain job; some queues don't take arrays of a single task
+            if reserve:
+                qadapter['rocket_launch'] += ' --fw_id {}'.format(tasks[0][0].fw_id)
+            queue_script = qadapter.get_script_str(launch_dirs[0])
+        else:
+            with open(ARRAY_LAUNCH_DIRS_FILE, 'w') as f:
+                f.write(''.join('{}\n'.format(d) for d in launch_dirs))
+            fw_ids_file = None
+            if reserve:
+                fw_ids_file = ARRAY_FW_IDS_FILE
+                with open(fw_ids_file, 'w') as f:
+                    f.write(''.join('{}\n'.format(fw.fw_id) for fw, _, _ in tasks))
+            queue_script = qadapter.get_array_script_str(ARRAY_LAUNCH_DIRS_FILE, fw_ids_file)
+        with open(SUBMIT_SCRIPT_NAME, 'w') as f:
+            f.write(queue_script)
+
+        if len(tasks) == 1:
+            l_logger.info('submitting queue script')
+            reservation_id = qadapter.submit_to_queue(SUBMIT_SCRIPT_NAME)
+        else:
+            l_logger.info('submitting job array of {} tasks'.format(len(tasks)))
+            reservation_id = qadapter.submit_array_to_queue(SUBMIT_SCRIPT_NAME, len(tasks))
+
+    if not reservation_id:
+        raise RuntimeError('queue script could not be submitted, check queue script/queue adapter/queue server status!')
+    if reserve:
+        if len(tasks) == 1:
+            launchpad.set_reservation_id(tasks[0][1], reservation_id, qadapter)
+        else:
+            launchpad.set_reservation_ids(
+                {launch_id: qadapter.get_array_task_id(reservation_id, i)
+                 for i, (fw, launch_id, _) in enumerate(tasks, 1)}, qadapter)
+    return len(tasks)
+
+
+def _write_offline_files(launchpad, fw, launch_id, launcher_dir):
+    """
+    Internal method to write the files of a reserved FireWork run in --offline mode, without \
+    changing the working directory (see launch_rocket_to_queue)
+
+    :return: (str) the launch directory, which is the _launch_dir of the FireWork if set
+    """
+    launch_dir = launcher_dir
+    # handle _launch_dir parameter now b/c we can't call launchpad.change_launch_dir() later on
+    if '_launch_dir' in fw.spec:
+        launch_dir = os.path.abspath(os.path.join(launcher_dir, fw.spec['_launch_dir']))
+        launchpad.change_launch_dir(launch_id, launch_dir)
+    fw.to_file(os.path.join(launch_dir, "FW.json"))
+    with open(os.path.join(launch_dir, 'FW_offline.json'), 'w') as f:
+        f.write('{"launch_id":%s}' % launch_id)
+    launchpad.add_offline_run(launch_id, fw.fw_id, fw.name)
+    return launch_dir
+
+
+def _write_job_script(launchpad, qadapter, task, reserve):
+    """
+    Internal method to write the queue script of a job, without changing the working directory \
+    (see launch_rocket_to_queue). Used by async_queue_launcher.launch_rockets_to_queue.
+
+    :return: (str) the path of the queue script
+    """
+    fw, launch_id, launcher_dir = task
+    qadapter = load_object(qadapter.to_dict())  # make a defensive copy
+    launch_dir = launcher_dir
+    if reserve:
+        # update qadapter job_name based on FW name
+        qadapter.update({'job_name': get_slug(fw.name)[0:20]})
+        if '_queueadapter' in fw.spec:
+            qadapter.update(fw.spec['_queueadapter'])
+        # reservation mode includes --fw_id in rocket launch
+        qadapter['rocket_launch'] += ' --fw_id {}'.format(fw.fw_id)
+        if '--offline' in qadapter['rocket_launch']:
+            launch_dir = _write_offline_files(launchpad, fw, launch_id, launcher_dir)
+
+    script_file = os.path.join(launch_dir, SUBMIT_SCRIPT_NAME)
+    with open(script_file, 'w') as f:
+        f.write(qadapter.get_script_str(launch_dir))
+    return script_file
+
+
 def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_queue=10, njobs_block=500,
-              sleep_time=None, reserve=False, strm_lvl='INFO'):
+              sleep_time=None, reserve=False, strm_lvl='INFO', array_size=0, batch_size=0):
     """
     Submit many jobs to the queue.
     
@@ -141,6 +325,10 @@ def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_q
     :param sleep_time: (int) secs to sleep between rapidfire loop iterations
     :param reserve: (bool) Whether to queue in reservation mode
     :param strm_lvl: (str) level at which to stream log messages
+    :param array_size: (int) submit up to this many jobs at once as a job array, if the queue \
+    adapter supports it (0 or 1 submits the jobs one by one)
+    :param batch_size: (int) otherwise, submit up to this many separate jobs at once, \
+    concurrently (0 or 1 submits the jobs one by one). Requires Python 3.7+.
     """
 
     sleep_time = sleep_time if sleep_time else RAPIDFIRE_SLEEP_SECS
@@ -152,6 +340,14 @@ def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_q
     if not os.path.exists(launch_dir):
         raise ValueError('Desired launch directory {} does not exist!'.format(launch_dir))
 
+    if batch_size > 1:
+        if sys.version_info >= (3, 7):
+            from fireworks.queue.async_queue_launcher import launch_rockets_to_queue
+        else:
+            l_logger.warning('Submitting batches of jobs requires Python 3.7+; '
+                             'submitting the jobs one by one')
+            batch_size = 0
+
     num_launched = 0
     try:
         l_logger.info('getting queue adapter')
@@ -164,6 +360,9 @@ def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_q
             block_dir = create_datestamp_dir(launch_dir, l_logger)
 
         while True:
+            if reserve:
+                _cancel_unqueued_reservations(launchpad, fworker, qadapter, l_logger)
+
             # get number of jobs in queue
             jobs_in_queue = _get_number_of_jobs_in_queue(qadapter, njobs_queue, l_logger)
             job_counter = 0  # this is for QSTAT_FREQUENCY option
@@ -176,20 +375,42 @@ def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_q
                     l_logger.info('Block got bigger than {} jobs.'.format(njobs_block))
                     block_dir = create_datestamp_dir(launch_dir, l_logger)
 
-                # create launcher_dir
-                launcher_dir = create_datestamp_dir(block_dir, l_logger, prefix='launcher_')
-                # launch a single job
-                if not launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir, reserve, strm_lvl):
-                    raise RuntimeError("Launch unsuccessful!")
-                num_launched += 1
+                n_jobs = 1
+                use_array = array_size > 1 and qadapter.get_array_index_var()
+                n_batch = array_size if use_array else batch_size
+                if n_batch > 1:
+                    n_jobs = min(n_batch, njobs_queue - jobs_in_queue,
+                                 njobs_block - _njobs_in_dir(block_dir))
+                    if nlaunches > 0:
+                        n_jobs = min(n_jobs, nlaunches - num_launched)
+
+                if n_jobs > 1:
+                    # launch a job array or a batch of jobs, with a launcher_dir per job
+                    launcher_dirs = [create_datestamp_dir(block_dir, l_logger, prefix='launcher_')
+                                     for _ in range(n_jobs)]
+                    if use_array:
+                        n_jobs = launch_array_to_queue(launchpad, fworker, qadapter,
+                                                       launcher_dirs, reserve, strm_lvl)
+                    else:
+                        n_jobs = launch_rockets_to_queue(launchpad, fworker, qadapter,
+                                                         launcher_dirs, reserve, strm_lvl)
+                    if not n_jobs:
+                        raise RuntimeError("Launch unsuccessful!")
+                else:
+                    # create launcher_dir
+                    launcher_dir = create_datestamp_dir(block_dir, l_logger, prefix='launcher_')
+                    # launch a single job
+                    if not launch_rocket_to_queue(launchpad, fworker, qadapter, launcher_dir, reserve, strm_lvl):
+                        raise RuntimeError("Launch unsuccessful!")
+                num_launched += n_jobs
                 if num_launched == nlaunches:
                     break
                 # wait for the queue system to update
                 l_logger.info('Sleeping for {} seconds...zzz...'.format(QUEUE_UPDATE_INTERVAL))
                 time.sleep(QUEUE_UPDATE_INTERVAL)
-                jobs_in_queue += 1
-                job_counter += 1
-                if job_counter % QSTAT_FREQUENCY == 0:
+                jobs_in_queue += n_jobs
+                job_counter += n_jobs
+                if job_counter >= QSTAT_FREQUENCY:
                     job_counter = 0
                     jobs_in_queue = _get_number_of_jobs_in_queue(qadapter, njobs_queue, l_logger)
 
@@ -203,6 +424,38 @@ def rapidfire(launchpad, fworker, qadapter, launch_dir='.', nlaunches=0, njobs_q
         log_exception(l_logger, 'Error with queue launcher rapid fire!')
 
 
+def _cancel_unqueued_reservations(launchpad, fworker, qadapter, l_logger):
+    """
+    Internal method to free the FireWorks reserved by jobs that left the queue without running them
+
+    :param launchpad: (LaunchPad)
+    :param fworker: (FWorker)
+    :param qadapter: (QueueAdapterBase)
+    :param l_logger: (logger)
+    """
+    try:
+        launch_ids = launchpad.detect_unqueued(qadapter, fworker, rerun=True)
+        if launch_ids:
+            l_logger.info('Cancelled {} reservations whose jobs are no longer in the queue: '
+                          '{}'.format(len(launch_ids), launch_ids))
+    except Exception:
+        log_exception(l_logger, 'Could not check the reservations against the queue')
+
+
+def _check_launch_options(qadapter, reserve):
+    """
+    Internal method to check that the rocket_launch command of the queue adapter fits the mode
+
+    :param qadapter: (QueueAdapterBase)
+    :param reserve: (bool) Whether to queue in reservation mode
+    """
+    if '--offline' in qadapter['rocket_launch'] and not reserve:
+        raise ValueError("Must use reservation mode (-r option) of qlaunch when using offline option of rlaunch!!")
+
+    if reserve and 'singleshot' not in qadapter.get('rocket_launch', ''):
+        raise ValueError('Reservation mode of queue launcher only works for singleshot Rocket Launcher!')
+
+
 def _njobs_in_dir(block_dir):
     """
     Internal method to count the number of jobs inside a block
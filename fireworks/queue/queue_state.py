@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+"""
+A shared poller of the state of the batch queue. A status command (e.g. squeue for one user) is run
+at most once every QUEUE_STATE_TTL seconds: its output is parsed into a table of jobs, which is
+cached in memory and in a file in QUEUE_STATE_CACHE_DIR. A lock file next to the cache makes
+concurrent qlaunch processes on a host wait for a single poll and then share its result, rather
+than each loading the queue server with its own qstat.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+import getpass
+import hashlib
+import json
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # e.g. on Windows; processes then poll without waiting for each other
+
+from fireworks.fw_config import QUEUE_STATE_TTL, QUEUE_STATE_CACHE_DIR
+from fireworks.queue.queue_adapter import Command
+from fireworks.utilities.fw_utilities import get_fw_logger
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+# the normalized states of a job; DONE jobs have finished but are still listed by the queue
+JOB_STATES = ('PENDING', 'RUNNING', 'HELD', 'ERROR', 'DONE', 'UNKNOWN')
+
+# a job, or a task of a job array, in the queue. job_id is a str, e.g. "1234", or "1234_5" for a
+# task of a SLURM array (see QueueAdapterBase.get_array_task_id). queue and name may be None if
+# the status command doesn't list them.
+QueueJob = namedtuple('QueueJob', ['job_id', 'state', 'queue', 'name'])
+
+
+class QueueStatePoller(object):
+    """
+    Runs status commands and caches their parsed job tables, keyed by host and command
+    """
+
+    def __init__(self, cache_dir=None, ttl=QUEUE_STATE_TTL, timeout=5):
+        """
+        :param cache_dir: (str) directory of the cache files shared by processes (None: only cache
+        in memory). It is created with mode 0700, and only used if it belongs to the user and
+        others can't write to it, since the job tables decide which reservations are cancelled.
+        :param ttl: (float) seconds a job table stays valid
+        :param timeout: (float) seconds to wait for a status command
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = timeout
+        self._tables = {}  # key -> (poll time, {job_id: QueueJob})
+        self._lock = threading.Lock()
+        self._cache_dir_checked = False
+
+    def get_jobs(self, command, parse, max_age=None):
+        """
+        :param command: ([str]) the status command
+        :param parse: (callable) turns the output of the command into a dict of job_id -> QueueJob
+        :param max_age: (float) accept a table polled at most this many seconds ago (default: ttl)
+        :return: (dict) job_id -> QueueJob
+        """
+        max_age = self.ttl if max_age is None else max_age
+        key = self._get_key(command)
+        # threads wait for each other here, and processes for the lock file, so that only one of
+        # them runs the command when the table expires
+        with self._lock:
+            entry = self._tables.get(key)
+            if not self._is_fresh(entry, max_age):
+                with self._lock_file(key):
+                    entry = self._read_cache(key)
+                    if not self._is_fresh(entry, max_age):
+                        status, output, error = Command(command).run(timeout=self.timeout)
+                        if status != 0:
+                            raise RuntimeError('Status command {} failed with: {}'.format(
+                                command, error))
+                        entry = (time.time(), parse(output))
+                        self._write_cache(key, entry)
+                self._tables[key] = entry
+            return entry[1]
+
+    def invalidate(self, command):
+        """
+        Forget the job table of a command, e.g. after submitting a job that it does not list yet
+
+        :param command: ([str]) the status command
+        """
+        key = self._get_key(command)
+        with self._lock:
+            self._tables.pop(key, None)
+            if self._check_cache_dir():
+                try:
+                    os.remove(self._get_cache_file(key))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _get_key(command):
+        # the host is part of the key, as QUEUE_STATE_CACHE_DIR may be on a shared filesystem
+        return hashlib.sha1(json.dumps([socket.gethostname(), list(command)]).encode(
+            'utf-8')).hexdigest()
+
+    @staticmethod
+    def _is_fresh(entry, max_age):
+        return entry is not None and time.time() - entry[0] <= max_age
+
+    def _get_cache_file(self, key):
+        return os.path.join(self.cache_dir, '{}.json'.format(key))
+
+    def _check_cache_dir(self):
+        """
+        Create the cache directory if needed, and stop using it if other users could plant job
+        tables in it
+
+        :return: (bool) whether the cache directory can be used
+        """
+        if self.cache_dir and not self._cache_dir_checked:
+            self._cache_dir_checked = True
+            try:
+                os.makedirs(self.cache_dir, 0o700)
+            except OSError:
+                pass  # e.g. it exists already
+            try:
+                st = os.lstat(self.cache_dir)
+                is_safe = stat.S_ISDIR(st.st_mode) and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+                if hasattr(os, 'getuid'):
+                    is_safe = is_safe and st.st_uid == os.getuid()
+            except OSError:
+                is_safe = False
+            if not is_safe:
+                get_fw_logger('queue.state', stream_level='WARNING').warning(
+                    'Not caching the queue state in {}: it must be a directory owned by the user '
+                    'and not writable by others'.format(self.cache_dir))
+                self.cache_dir = None
+        return bool(self.cache_dir)
+
+    @contextmanager
+    def _lock_file(self, key):
+        f = None
+        if self._check_cache_dir() and fcntl:
+            try:
+                f = open(os.path.join(self.cache_dir, '{}.lock'.format(key)), 'a')
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except (IOError, OSError):
+                pass  # e.g. a read-only directory; just poll without waiting
+        try:
+            yield
+        finally:
+            if f:
+                f.close()  # releases the lock
+
+    def _read_cache(self, key):
+        if not self._check_cache_dir():
+            return None
+        try:
+            with open(self._get_cache_file(key)) as f:
+                d = json.load(f)
+            return d['time'], {j[0]: QueueJob(*j) for j in d['jobs']}
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_cache(self, key, entry):
+        if not self._check_cache_dir():
+            return
+        try:
+            # write to a temporary file, then move it into place so readers never see a partial file
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, prefix='.queue_state')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'time': entry[0], 'jobs': [list(j) for j in entry[1].values()]}, f)
+            os.rename(tmp_name, self._get_cache_file(key))
+        except (IOError, OSError):
+            pass  # the table is just not shared with other processes
+
+
+def _get_default_cache_dir():
+    # the system temp dir is on local disk; each user gets a private directory of their own, see
+    # QueueStatePoller._check_cache_dir()
+    return os.path.join(tempfile.gettempdir(), 'fw_queue_state_{}'.format(getpass.getuser()))
+
+
+# the poller used by the queue adapters; replace it to use other settings
+poller = QueueStatePoller(QUEUE_STATE_CACHE_DIR or _get_default_cache_dir())
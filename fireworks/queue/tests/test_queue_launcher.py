@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+"""
+Tests for the submission of job arrays and concurrent batches of jobs by the queue launcher, using
+an in-memory stand-in for the LaunchPad and a fake sbatch command.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import glob
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from fireworks.core.firework import FireWork
+from fireworks.core.fworker import FWorker
+from fireworks.queue import queue_launcher, queue_state
+from fireworks.queue.queue_launcher import launch_array_to_queue, rapidfire, \
+    ARRAY_LAUNCH_DIRS_FILE, ARRAY_FW_IDS_FILE
+from fireworks.user_objects.queue_adapters.common_adapter import CommonAdapter
+
+if sys.version_info >= (3, 7):
+    from fireworks.queue.async_queue_launcher import launch_rockets_to_queue
+
+
+class MemoryLaunchPad(object):
+    def __init__(self, nfws):
+        self.fws = {i: FireWork([], fw_id=i, state='READY') for i in range(1, nfws + 1)}
+        self.fws[nfws].spec['_queueadapter'] = {'walltime': '10:00'}
+        self.reservations = {}  # launch_id -> [fw_id, reservation_id, qadapter]
+        self.launch_ids = itertools.count(1)
+        self.logdir = None
+
+    def run_exists(self, fworker=None):
+        return 'READY' in [fw.state for fw in self.fws.values()]
+
+    def get_fw_ids(self, query=None, sort=None, limit=0, count_only=False):
+        fw_ids = [i for i, fw in self.fws.items() if fw.state == query['state']]
+        return len(fw_ids) if count_only else fw_ids
+
+    def reserve_fws(self, fworker, launch_dirs, host=None, ip=None):
+        reserved = []
+        for fw_id, launch_dir in zip(self.get_fw_ids({'state': 'READY'}), launch_dirs):
+            self.fws[fw_id].state = 'RESERVED'
+            launch_id = next(self.launch_ids)
+            self.reservations[launch_id] = [fw_id, None, None]
+            reserved.append((self.fws[fw_id], launch_id))
+        return reserved
+
+    def reserve_fw(self, fworker, launch_dir, host=None, ip=None):
+        return self.reserve_fws(fworker, [launch_dir])[0]
+
+    def change_launch_dir(self, launch_id, launch_dir):
+        pass
+
+    def set_reservation_id(self, launch_id, reservation_id, qadapter=None):
+        self.reservations[launch_id][1:] = [reservation_id, qadapter]
+
+    def set_reservation_ids(self, reservation_ids, qadapter=None):
+        for launch_id, reservation_id in reservation_ids.items():
+            self.set_reservation_id(launch_id, reservation_id, qadapter)
+
+    def cancel_reservation(self, launch_id):
+        self.fws[self.reservations.pop(launch_id)[0]].state = 'READY'
+
+    def cancel_reservations(self, launch_ids):
+        for launch_id in launch_ids:
+            self.cancel_reservation(launch_id)
+
+    def detect_unqueued(self, qadapter, fworker=None, max_age=None, rerun=False):
+        jobs = qadapter.get_queue_jobs(max_age=max_age)
+        launch_ids = [l_id for l_id, (_, r_id, q) in self.reservations.items()
+                      if q is qadapter and str(r_id) not in jobs]
+        if rerun:
+            for l_id in launch_ids:
+                self.cancel_reservation(l_id)
+        return launch_ids
+
+
+class QueueLauncherTestBase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.old_path = os.environ["PATH"]
+        self.bin_dir = os.path.join(self.dir, "bin")
+        os.mkdir(self.bin_dir)
+        self._write_sbatch('echo "Submitted batch job 42"')
+        with open(os.path.join(self.bin_dir, "squeue"), "w") as f:
+            f.write('#!/bin/bash\n')  # an empty queue
+        os.chmod(os.path.join(self.bin_dir, "squeue"), 0o755)
+        os.environ["PATH"] = self.bin_dir + os.pathsep + self.old_path
+        # don't share the state of the fake queue with other processes
+        self.old_poller = queue_state.poller
+        queue_state.poller = queue_state.QueueStatePoller()
+        self.qadapter = CommonAdapter(q_type="SLURM", rocket_launch="rlaunch singleshot")
+        self.launcher_dirs = [os.path.join(self.dir, "launcher_{}".format(i)) for i in range(5)]
+        for d in self.launcher_dirs:
+            os.mkdir(d)
+
+    def tearDown(self):
+        os.environ["PATH"] = self.old_path
+        queue_state.poller = self.old_poller
+        shutil.rmtree(self.dir)
+
+    def _write_sbatch(self, body):
+        # a fake sbatch that logs its arguments
+        with open(os.path.join(self.bin_dir, "sbatch"), "w") as f:
+            f.write('#!/bin/bash\necho "$@" >> {}\n{}\n'.format(
+                os.path.join(self.dir, "sbatch.log"), body))
+        os.chmod(os.path.join(self.bin_dir, "sbatch"), 0o755)
+
+    def _sbatch_calls(self):
+        with open(os.path.join(self.dir, "sbatch.log")) as f:
+            return [l.split() for l in f]
+
+
+
+class JobArrayTest(QueueLauncherTestBase):
+
+    def test_reserve(self):
+        lp = MemoryLaunchPad(4)
+        n = launch_array_to_queue(lp, FWorker(), self.qadapter, self.launcher_dirs, reserve=True,
+                                  strm_lvl='ERROR')
+        self.assertEqual(n, 4)
+        # FW 4 has its own queue parameters, so it gets its own array
+        self.assertEqual([c[0] for c in self._sbatch_calls()], ["--array=1-3", "FW_submit.script"])
+        self.assertEqual(sorted(str(r[1]) for r in lp.reservations.values()),
+                         ["42", "42_1", "42_2", "42_3"])
+        self.assertEqual([r[2].q_type for r in lp.reservations.values()], ["SLURM"] * 4)
+        self.assertFalse(os.path.exists(self.launcher_dirs[4]))  # nothing left to reserve
+
+        with open(os.path.join(self.launcher_dirs[0], ARRAY_LAUNCH_DIRS_FILE)) as f:
+            self.assertEqual(f.read().split("\n")[:-1], self.launcher_dirs[0:3])
+        with open(os.path.join(self.launcher_dirs[0], ARRAY_FW_IDS_FILE)) as f:
+            self.assertEqual(f.read().split(), ["1", "2", "3"])
+        with open(os.path.join(self.launcher_dirs[3], "FW_submit.script")) as f:
+            script = f.read()
+        self.assertIn("--time=10:00", script)
+        self.assertIn("rlaunch singleshot --fw_id 4", script)
+
+    def test_no_reserve(self):
+        lp = MemoryLaunchPad(2)
+        n = launch_array_to_queue(lp, None, self.qadapter, self.launcher_dirs, strm_lvl='ERROR')
+        self.assertEqual(n, 2)  # no more tasks than READY FireWorks
+        self.assertEqual(self._sbatch_calls()[0][0], "--array=1-2")
+        self.assertEqual(len([d for d in self.launcher_dirs if os.path.exists(d)]), 2)
+
+    def test_failed_submission(self):
+        self._write_sbatch('exit 1')
+        lp = MemoryLaunchPad(3)
+        n = launch_array_to_queue(lp, None, self.qadapter, self.launcher_dirs, reserve=True,
+                                  strm_lvl='CRITICAL')
+        self.assertEqual(n, 0)
+        self.assertEqual([fw.state for fw in lp.fws.values()], ['READY'] * 3)
+        self.assertEqual(lp.reservations, {})
+
+    def test_rapidfire(self):
+        lp = MemoryLaunchPad(7)
+        old_interval = queue_launcher.QUEUE_UPDATE_INTERVAL
+        queue_launcher.QUEUE_UPDATE_INTERVAL = 0
+        try:
+            rapidfire(lp, None, self.qadapter, self.dir, nlaunches=7, njobs_queue=100,
+                      reserve=True, strm_lvl='ERROR', array_size=5)
+        finally:
+            queue_launcher.QUEUE_UPDATE_INTERVAL = old_interval
+        # the second batch has FWs 6 and 7, and FW 7 needs an array of its own
+        self.assertEqual([c[0] for c in self._sbatch_calls()],
+                         ["--array=1-5", "FW_submit.script", "FW_submit.script"])
+        self.assertEqual(len(glob.glob(os.path.join(self.dir, "block_*", "launcher_*"))), 7)
+
+    def test_rapidfire_unqueued(self):
+        # job 41 left the queue without running its FireWork
+        with open(os.path.join(self.bin_dir, "squeue"), "w") as f:
+            f.write('#!/bin/bash\necho "42|PENDING|debug|FW_job"\n')
+        lp = MemoryLaunchPad(3)
+        for (fw, launch_id), r_id in zip(lp.reserve_fws(None, ["a", "b"]), [41, 42]):
+            lp.set_reservation_id(launch_id, r_id, self.qadapter)
+        # job 40 was submitted to another queue
+        fw, launch_id = lp.reserve_fw(None, "c")
+        lp.set_reservation_id(launch_id, 40, CommonAdapter(q_type="PBS"))
+        rapidfire(lp, None, self.qadapter, self.dir, nlaunches=1, reserve=True,
+                  strm_lvl='ERROR')
+        self.assertEqual(len(self._sbatch_calls()), 1)
+        self.assertEqual(sorted(r[1] for r in lp.reservations.values()), [40, 42, 42])
+        self.assertEqual([fw.state for fw in lp.fws.values()], ['RESERVED'] * 3)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "concurrent submission requires Python 3.7+")
+class ConcurrentSubmissionTest(QueueLauncherTestBase):
+
+    def setUp(self):
+        super(ConcurrentSubmissionTest, self).setUp()
+        # a job id per call; sbatch.log gets the working directory and the script of each call
+        self._write_sbatch('echo "$PWD" >> {}\necho "Submitted batch job $$"'.format(
+            os.path.join(self.dir, "cwd.log")))
+
+    def test_reserve(self):
+        lp = MemoryLaunchPad(4)
+        n = launch_rockets_to_queue(lp, FWorker(), self.qadapter, self.launcher_dirs, reserve=True,
+                                    strm_lvl='ERROR')
+        self.assertEqual(n, 4)
+        self.assertFalse(os.path.exists(self.launcher_dirs[4]))  # nothing left to reserve
+        job_ids = [r[1] for r in lp.reservations.values()]
+        self.assertEqual(len(set(job_ids)), 4)
+        self.assertNotIn(None, job_ids)
+
+        # each job is submitted from its own directory, and runs its own FireWork
+        scripts = sorted(c[0] for c in self._sbatch_calls())
+        self.assertEqual(scripts, [os.path.join(d, "FW_submit.script")
+                                   for d in self.launcher_dirs[:4]])
+        with open(os.path.join(self.dir, "cwd.log")) as f:
+            self.assertEqual(sorted(f.read().split()), self.launcher_dirs[:4])
+        for fw_id, (launch_id, (r_fw_id, _, q)) in enumerate(sorted(lp.reservations.items()), 1):
+            self.assertIs(q, self.qadapter)
+            with open(os.path.join(self.launcher_dirs[launch_id - 1], "FW_submit.script")) as f:
+                script = f.read()
+            self.assertIn("rlaunch singleshot --fw_id {}".format(r_fw_id), script)
+            self.assertEqual("--time=10:00" in script, r_fw_id == 4)
+
+    def test_no_reserve(self):
+        lp = MemoryLaunchPad(2)
+        n = launch_rockets_to_queue(lp, None, self.qadapter, self.launcher_dirs, strm_lvl='ERROR')
+        self.assertEqual(n, 2)  # no more jobs than READY FireWorks
+        self.assertEqual(len(self._sbatch_calls()), 2)
+        self.assertEqual(len([d for d in self.launcher_dirs if os.path.exists(d)]), 2)
+
+    def test_concurrency(self):
+        # each sbatch logs how many sbatch calls are running
+        running = os.path.join(self.dir, "running")
+        os.mkdir(running)
+        self._write_sbatch('touch {0}/$$; ls {0} | wc -l >> {1}; sleep 0.2; rm {0}/$$\n'
+                           'echo "Submitted batch job $$"'.format(
+                               running, os.path.join(self.dir, "nrunning.log")))
+        lp = MemoryLaunchPad(5)
+        n = launch_rockets_to_queue(lp, None, self.qadapter, self.launcher_dirs, reserve=True,
+                                    strm_lvl='ERROR', max_concurrent=2)
+        self.assertEqual(n, 5)
+        with open(os.path.join(self.dir, "nrunning.log")) as f:
+            self.assertLessEqual(max(int(l) for l in f), 2)
+
+    def test_failures(self):
+        # the job of FW 2 is refused, and the others time out or are submitted
+        self._write_sbatch('grep -q "fw_id 2$" "$1" && exit 1\n'
+                           'grep -q "fw_id 3$" "$1" && sleep 5\n'
+                           'echo "Submitted batch job $$"')
+        lp = MemoryLaunchPad(3)
+        t_start = time.time()
+        n = launch_rockets_to_queue(lp, None, self.qadapter, self.launcher_dirs, reserve=True,
+                                    strm_lvl='CRITICAL', timeout=0.5)
+        self.assertLess(time.time() - t_start, 4)
+        self.assertEqual(n, 1)
+        self.assertEqual([fw.state for fw in lp.fws.values()], ['RESERVED', 'READY', 'READY'])
+        self.assertEqual([r[0] for r in lp.reservations.values()], [1])
+
+    def test_rapidfire(self):
+        lp = MemoryLaunchPad(7)
+        old_interval = queue_launcher.QUEUE_UPDATE_INTERVAL
+        queue_launcher.QUEUE_UPDATE_INTERVAL = 0
+        try:
+            rapidfire(lp, None, self.qadapter, self.dir, nlaunches=7, njobs_queue=100,
+                      reserve=True, strm_lvl='ERROR', batch_size=5)
+        finally:
+            queue_launcher.QUEUE_UPDATE_INTERVAL = old_interval
+        self.assertEqual(len(self._sbatch_calls()), 7)
+        self.assertEqual([fw.state for fw in lp.fws.values()], ['RESERVED'] * 7)
+        self.assertEqual(len(glob.glob(os.path.join(self.dir, "block_*", "launcher_*"))), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""
+Tests for the shared poller of the queue state, using a fake status command that counts its calls.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fireworks.queue.queue_state import QueueJob, QueueStatePoller
+
+
+class QueueStatePollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.calls_file = os.path.join(self.dir, "calls")
+        self.command = [os.path.join(self.dir, "qstat"), "-u", "me"]
+        self._write_qstat('echo "1 R"; echo "2 Q"')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write_qstat(self, body):
+        with open(self.command[0], "w") as f:
+            f.write('#!/bin/bash\necho >> {}\n{}\n'.format(self.calls_file, body))
+        os.chmod(self.command[0], 0o755)
+
+    def _ncalls(self):
+        if not os.path.exists(self.calls_file):
+            return 0
+        with open(self.calls_file) as f:
+            return len(f.read())
+
+    @staticmethod
+    def _parse(output):
+        jobs = [QueueJob(l.split()[0], l.split()[1], None, None) for l in output.split("\n") if l]
+        return {j.job_id: j for j in jobs}
+
+    def test_shared_cache(self):
+        p1 = QueueStatePoller(self.cache_dir, ttl=60)
+        p2 = QueueStatePoller(self.cache_dir, ttl=60)  # e.g. another qlaunch process
+        jobs = p1.get_jobs(self.command, self._parse)
+        self.assertEqual(jobs, {"1": QueueJob("1", "R", None, None),
+                                "2": QueueJob("2", "Q", None, None)})
+        self.assertEqual(p2.get_jobs(self.command, self._parse), jobs)
+        self.assertEqual(p1.get_jobs(self.command, self._parse), jobs)
+        self.assertEqual(self._ncalls(), 1)
+
+        # an expired or invalidated table is polled again
+        self._write_qstat('echo "1 R"')
+        self.assertEqual(list(p2.get_jobs(self.command, self._parse, max_age=0)), ["1"])
+        self.assertEqual(self._ncalls(), 2)
+        self.assertEqual(len(p1.get_jobs(self.command, self._parse)), 2)  # p1's memory cache
+        p1.invalidate(self.command)
+        self.assertEqual(list(p1.get_jobs(self.command, self._parse)), ["1"])
+        self.assertEqual(self._ncalls(), 3)
+
+    def test_memory_only(self):
+        p = QueueStatePoller(ttl=60)
+        p.get_jobs(self.command, self._parse)
+        p.get_jobs(self.command, self._parse)
+        self.assertEqual(self._ncalls(), 1)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_failure(self):
+        p = QueueStatePoller(self.cache_dir, ttl=60)
+        self._write_qstat('echo "server down" >&2; exit 1')
+        self.assertRaises(RuntimeError, p.get_jobs, self.command, self._parse)
+        # failures are not cached
+        self._write_qstat('echo "1 R"')
+        self.assertEqual(list(p.get_jobs(self.command, self._parse)), ["1"])
+        self.assertEqual(self._ncalls(), 2)
+
+    def test_cache_dir_permissions(self):
+        p = QueueStatePoller(self.cache_dir, ttl=60)
+        p.get_jobs(self.command, self._parse)
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+
+        # a directory that others can write to is not trusted
+        os.chmod(self.cache_dir, 0o777)
+        p = QueueStatePoller(self.cache_dir, ttl=60)
+        self.assertEqual(len(p.get_jobs(self.command, self._parse)), 2)
+        self.assertIsNone(p.cache_dir)
+        self.assertEqual(self._ncalls(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
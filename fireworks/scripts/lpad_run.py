@@ -18,7 +18,7 @@ import yaml
 
 from fireworks.fw_config import RESERVATION_EXPIRATION_SECS, \
     RUN_EXPIRATION_SECS, PW_CHECK_NUM, MAINTAIN_INTERVAL, CONFIG_FILE_DIR, \
-    LAUNCHPAD_LOC
+    LAUNCHPAD_LOC, OFFLINE_RECOVERY_THREADS
 from fireworks.core.launchpad import LaunchPad
 from fireworks.core.firework import Workflow, FireWork
 from fireworks import __version__ as FW_VERSION
@@ -433,15 +433,17 @@ def add_scripts(args):
 
 def recover_offline(args):
     lp = get_lp(args)
-    failed_fws = []
-    for l in lp.offline_runs.find({"completed": False, "deprecated": False}, {"launch_id": 1}):
-        fw = lp.recover_offline(l['launch_id'], args.ignore_errors)
-        if fw:
-            failed_fws.append(fw)
+    while True:
+        failed_fws = lp.recover_offline_runs(args.ignore_errors, args.threads)
 
-    lp.m_logger.info("FINISHED recovering offline runs.")
-    if failed_fws:
-        lp.m_logger.info("FAILED to recover offline fw_ids: {}".format(failed_fws))
+        lp.m_logger.info("FINISHED recovering offline runs.")
+        if failed_fws:
+            lp.m_logger.info("FAILED to recover offline fw_ids: {}".format(failed_fws))
+
+        if not args.daemon:
+            break
+        lp.m_logger.debug('Sleeping for {} secs...'.format(args.interval))
+        time.sleep(args.interval)
 
 
 def forget_offline(args):
@@ -728,6 +730,12 @@ def lpad():
 
     recover_parser = subparsers.add_parser('recover_offline', help='recover offline workflows')
     recover_parser.add_argument('-i', '--ignore_errors', help='ignore errors', action='store_true')
+    recover_parser.add_argument('--threads', help='number of runs to recover at once', type=int,
+                                default=OFFLINE_RECOVERY_THREADS)
+    recover_parser.add_argument('--daemon', help='keep recovering runs as their files change',
+                                action='store_true')
+    recover_parser.add_argument('--interval', help='secs between recovery passes in daemon mode', type=int,
+                                default=MAINTAIN_INTERVAL)
     recover_parser.set_defaults(func=recover_offline)
 
     forget_parser = subparsers.add_parser('forget_offline', help='forget offline workflows')
@@ -10,7 +10,7 @@ import os
 from fireworks.fw_config import CONFIG_FILE_DIR, FWORKER_LOC, LAUNCHPAD_LOC
 from fireworks.core.fworker import FWorker
 from fireworks.core.launchpad import LaunchPad
-from fireworks.features.multi_launcher import launch_multiprocess
+from fireworks.features.multi_launcher import launch_multiprocess, launch_multithread
 
 
 __author__ = 'Xiaohui Qu, Anubhav Jain'
@@ -43,6 +43,8 @@ def mlaunch():
 
     parser.add_argument('--nodefile', help='nodefile name or environment variable name containing the node file name (for populating FWData only)', default=None, type=str)
     parser.add_argument('--ppn', help='processors per node (for populating FWData only)', default=1, type=int)
+    parser.add_argument('--threads', help='run the jobs as threads of a single process that share one database '
+                                          'connection (for I/O-bound FireTasks)', action='store_true')
 
     args = parser.parse_args()
 
@@ -68,8 +70,12 @@ def mlaunch():
         with open(args.nodefile, 'r') as f:
             total_node_list = [line.strip() for line in f.readlines()]
 
-    launch_multiprocess(launchpad, fworker, args.loglvl, args.nlaunches, args.num_jobs,
-                        args.sleep, total_node_list, args.ppn)
+    if args.threads:
+        launch_multithread(launchpad, fworker, args.loglvl, args.nlaunches, args.num_jobs,
+                           args.sleep)
+    else:
+        launch_multiprocess(launchpad, fworker, args.loglvl, args.nlaunches, args.num_jobs,
+                            args.sleep, total_node_list, args.ppn)
 
 
 if __name__ == "__main__":
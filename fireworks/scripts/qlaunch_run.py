@@ -46,7 +46,8 @@ def do_launch(args):
     if args.command == 'rapidfire':
         rapidfire(launchpad, fworker, queueadapter, args.launch_dir,
                   args.nlaunches, args.maxjobs_queue,
-                  args.maxjobs_block, args.sleep, args.reserve, args.loglvl)
+                  args.maxjobs_block, args.sleep, args.reserve, args.loglvl,
+                  args.array_size, args.batch_size)
     else:
         launch_rocket_to_queue(launchpad, fworker, queueadapter,
                                args.launch_dir, args.reserve, args.loglvl)
@@ -115,6 +116,12 @@ def qlaunch():
                               default=500, type=int)
     rapid_parser.add_argument('--nlaunches', help='num_launches (int or "infinite"; default 0 is all jobs in DB)', default=0)
     rapid_parser.add_argument('--sleep', help='sleep time between loops', default=None, type=int)
+    rapid_parser.add_argument('-a', '--array_size',
+                              help='submit up to this many jobs at once as a job array '
+                                   '(SLURM, PBS and SGE queues)', default=0, type=int)
+    rapid_parser.add_argument('--batch_size',
+                              help='submit up to this many separate jobs at once, concurrently',
+                              default=0, type=int)
 
     args = parser.parse_args()
 
@@ -140,7 +147,7 @@ def qlaunch():
                             if os.path.isfile(f):
                                 put(f, os.path.join(r, f))
     non_default = []
-    for k in ["maxjobs_queue", "maxjobs_block", "nlaunches", "sleep"]:
+    for k in ["maxjobs_queue", "maxjobs_block", "nlaunches", "sleep", "array_size"]:
         v = getattr(args, k, None)
         if v != rapid_parser.get_default(k):
             non_default.append("--{} {}".format(k, v))
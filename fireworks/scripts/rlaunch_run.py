@@ -46,6 +46,9 @@ def rlaunch():
 
     rapid_parser.add_argument('--nlaunches', help='num_launches (int or "infinite"; default 0 is all jobs in DB)', default=0)
     rapid_parser.add_argument('--sleep', help='sleep time between loops (secs)', default=None, type=int)
+    rapid_parser.add_argument('--prefetch', help='reserve up to this many FWs in the background while '
+                                                 'a Rocket runs (default 0 is no prefetching)',
+                              default=0, type=int)
 
     parser.add_argument('-l', '--launchpad_file', help='path to launchpad file', default=LAUNCHPAD_LOC)
     parser.add_argument('-w', '--fworker_file', help='path to fworker file', default=FWORKER_LOC)
@@ -84,7 +87,8 @@ def rlaunch():
     get_my_ip()
 
     if args.command == 'rapidfire':
-        rapidfire(launchpad, fworker, None, args.nlaunches, -1, args.sleep, args.loglvl)
+        rapidfire(launchpad, fworker, None, args.nlaunches, -1, args.sleep, args.loglvl,
+                  args.prefetch)
 
     else:
         launch_rocket(launchpad, fworker, args.fw_id, args.loglvl)
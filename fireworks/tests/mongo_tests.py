@@ -1,4 +1,5 @@
 from multiprocessing import Pool
+import datetime
 import os
 import random
 import shutil
@@ -10,6 +11,7 @@ from fireworks.core.fworker import FWorker
 from fireworks.core.launchpad import LaunchPad
 from fireworks.core.rocket_launcher import launch_rocket, rapidfire
 from fireworks.features.background_task import BackgroundTask
+from fireworks.queue.queue_state import QueueJob
 from fireworks.user_objects.firetasks.fileio_tasks import FileTransferTask, FileWriteTask
 from fireworks.user_objects.firetasks.script_task import ScriptTask
 from fireworks.user_objects.firetasks.templatewriter_task import TemplateWriterTask
@@ -206,6 +208,133 @@ class MongoTests(unittest.TestCase):
         self.assertEqual(self.lp.get_fw_by_id(1).tasks[0]['script'][0], 'echo "Task 1"')
         self.assertEqual(self.lp.get_fw_by_id(2).tasks[0]['script'][0], 'echo "Task 2"')
 
+    def test_recover_offline(self):
+        self.lp.add_wf(FireWork(ScriptTask.from_str('echo "offline"')))
+        launch_dir = os.path.join(MODULE_DIR, 'launcher_offline')
+        os.mkdir(launch_dir)
+        fw, launch_id = self.lp.reserve_fw(self.fworker, launch_dir)
+        fw.to_file(os.path.join(launch_dir, 'FW.json'))
+        with open(os.path.join(launch_dir, 'FW_offline.json'), 'w') as f:
+            f.write('{"launch_id":%s}' % launch_id)
+        self.lp.add_offline_run(launch_id, fw.fw_id, fw.name)
+
+        # nothing has run yet; a second pass skips the unchanged run
+        self.assertEqual(self.lp.recover_offline_runs(), [])
+        updated_on = self.lp.offline_runs.find_one({'launch_id': launch_id})['updated_on']
+        self.assertEqual(self.lp.recover_offline_runs(), [])
+        self.assertEqual(self.lp.offline_runs.find_one({'launch_id': launch_id})['updated_on'],
+                         updated_on)
+
+        os.chdir(launch_dir)
+        launch_rocket(None, self.fworker)
+        self.assertEqual(self.lp.recover_offline_runs(num_threads=2), [])
+        self.assertEqual(self.lp.get_fw_by_id(fw.fw_id).state, 'COMPLETED')
+        self.assertTrue(self.lp.offline_runs.find_one({'launch_id': launch_id})['completed'])
+
+    def test_recover_offline_runs_stats(self):
+        self.lp.add_wf(Workflow([FireWork(ScriptTask.from_str('echo "{}"'.format(i)))
+                                 for i in range(3)]))
+        fw_ids, launch_ids = [], []
+        for i in range(3):
+            launch_dir = os.path.join(MODULE_DIR, 'launcher_offline_{}'.format(i))
+            os.mkdir(launch_dir)
+            fw, launch_id = self.lp.reserve_fw(self.fworker, launch_dir)
+            if i < 2:
+                # the last run has not written its files yet
+                with open(os.path.join(launch_dir, 'FW_offline.json'), 'w') as f:
+                    f.write('{"launch_id":%s}' % launch_id)
+            self.lp.add_offline_run(launch_id, fw.fw_id, fw.name)
+            fw_ids.append(fw.fw_id)
+            launch_ids.append(launch_id)
+
+        # the file stats of the recovered runs are recorded in one bulk write
+        self.assertEqual(self.lp.recover_offline_runs(ignore_errors=True, num_threads=2),
+                         [fw_ids[2]])
+        for launch_id in launch_ids[:2]:
+            file_stats = self.lp.offline_runs.find_one({'launch_id': launch_id})['file_stats']
+            self.assertIsNone(file_stats['ping'])
+            self.assertIsNotNone(file_stats['offline'])
+        self.assertNotIn('file_stats', self.lp.offline_runs.find_one({'launch_id': launch_ids[2]}))
+
+    def test_detect_unqueued(self):
+        queue_jobs = {'1': QueueJob('1', 'RUNNING', None, None),
+                      '3': QueueJob('3', 'DONE', None, None)}
+
+        class FakeQueueAdapter(object):
+            def __init__(self, q_name):
+                self.q_name = q_name
+
+            def get_queue_jobs(self, username=None, max_age=None):
+                return queue_jobs
+
+        qadapter = FakeQueueAdapter('slurm')
+        self.lp.add_wf(Workflow([FireWork(ScriptTask.from_str('echo "{}"'.format(i)))
+                                 for i in range(7)]))
+        fws, launch_ids = {}, {}
+        for job_id in ['1', '2', '3', '4', '5', '6']:
+            fws[job_id], launch_ids[job_id] = self.lp.reserve_fw(self.fworker, MODULE_DIR)
+            launch_id = launch_ids[job_id]
+            if job_id == '5':
+                # job 5 was submitted to another queue
+                self.lp.set_reservation_id(launch_id, job_id, FakeQueueAdapter('pbs'))
+            elif job_id == '6':
+                # job 6 was submitted without recording its queue
+                self.lp.set_reservation_id(launch_id, job_id)
+            else:
+                self.lp.set_reservation_id(launch_id, job_id, qadapter)
+        # job 4 is an offline run, which stays RESERVED after its job ends
+        self.lp.add_offline_run(launch_ids['4'], fws['4'].fw_id, fws['4'].name)
+        # job 7 was submitted from another host to the same kind of queue
+        fw, launch_id = self.lp.reserve_fw(self.fworker, MODULE_DIR)
+        self.lp.set_reservation_id(launch_id, '7', qadapter)
+        self.lp.launches.update({'launch_id': launch_id, 'state_history.state': 'RESERVED'},
+                                {'$set': {'state_history.$.queue.host': 'other_host'}})
+        future_timestr = (datetime.datetime.utcnow() +
+                          datetime.timedelta(minutes=1)).isoformat()
+        launch_jobs = self.lp.get_reserved_launch_jobs(qadapter, reserved_before=future_timestr)
+        self.assertEqual(launch_jobs, {launch_ids['1']: ('1', queue_jobs['1']),
+                                       launch_ids['2']: ('2', None),
+                                       launch_ids['3']: ('3', queue_jobs['3'])})
+        # the jobs were just submitted, and may be missing from an older listing of the queue
+        self.assertEqual(self.lp.get_reserved_launch_jobs(
+            qadapter, reserved_before=datetime.datetime(2000, 1, 1).isoformat()), {})
+
+        bad_launch_ids = sorted([launch_ids['2'], launch_ids['3']])
+        self.assertEqual(self.lp.detect_unqueued(qadapter, max_age=-60), bad_launch_ids)
+        self.assertEqual(self.lp.get_fw_ids({'state': 'RESERVED'}, count_only=True), 7)
+        self.assertEqual(len(self.lp.cancel_reservations(bad_launch_ids)), 2)
+        for job_id, state in [('1', 'RESERVED'), ('2', 'READY'), ('3', 'READY'),
+                              ('4', 'RESERVED'), ('5', 'RESERVED'), ('6', 'RESERVED')]:
+            self.assertEqual(self.lp.launches.find_one({'launch_id': launch_ids[job_id]})['state'],
+                             state)
+        self.assertEqual(self.lp.get_fw_ids({'state': 'READY'}, count_only=True), 2)
+        self.assertEqual(self.lp.detect_unqueued(qadapter, max_age=-60, rerun=True), [])
+        self.assertEqual(self.lp.detect_unqueued(FakeQueueAdapter('pbs'), max_age=-60),
+                         [launch_ids['5']])
+
+    def test_set_reservation_ids(self):
+        self.lp.add_wf(Workflow([FireWork(ScriptTask.from_str('echo "{}"'.format(i)))
+                                 for i in range(3)]))
+        reserved = self.lp.reserve_fws(self.fworker, [MODULE_DIR] * 3)
+        reserved_on = {}
+        for fw, launch_id in reserved:
+            l = self.lp.launches.find_one({'launch_id': launch_id})
+            reserved_on[launch_id] = l['state_history'][-1]['updated_on']
+        time.sleep(0.01)
+        # the last job could not be submitted
+        launch_ids = [launch_id for _, launch_id in reserved]
+        self.lp.set_reservation_ids({launch_ids[0]: 41, launch_ids[1]: '42'})
+
+        for launch_id, job_id in zip(launch_ids, ['41', '42', None]):
+            state_history = self.lp.launches.find_one({'launch_id': launch_id})['state_history']
+            self.assertEqual([d['state'] for d in state_history], ['RESERVED'])
+            self.assertEqual(state_history[0].get('reservation_id'), job_id)
+            if job_id:
+                self.assertGreater(state_history[0]['updated_on'], reserved_on[launch_id])
+            else:
+                self.assertEqual(state_history[0]['updated_on'], reserved_on[launch_id])
+        self.assertEqual(self.lp.get_reservation_id_from_fw_id(reserved[1][0].fw_id), '42')
+
     def tearDown(self):
         self.lp.reset(password=None, require_password=False)
         if os.path.exists(os.path.join('FW.json')):
@@ -4,7 +4,9 @@ import traceback
 
 from os.path import expandvars, expanduser, abspath
 from fireworks.core.firework import FireTaskBase
-from monty.shutil import compress_dir
+from fireworks.fw_config import FILE_TRANSFER_WORKERS
+from fireworks.utilities.compression import compress_dir, make_archive
+from fireworks.utilities.file_transfer import TransferEngine
 
 __author__ = 'Anubhav Jain, David Waroquiers, Shyue Ping Ong'
 __copyright__ = 'Copyright 2013, The Materials Project'
@@ -26,7 +28,7 @@ class FileWriteTask(FireTaskBase):
     required_params = ["files_to_write"]
 
     def run_task(self, fw_spec):
-        pth = self.get("dest", os.getcwd())
+        pth = self.get("dest", fw_spec.get("_fw_launch_dir", os.getcwd()))
         for d in self["files_to_write"]:
             with open(os.path.join(pth, d["filename"]), "w") as f:
                 f.write(d["contents"])
@@ -45,7 +47,7 @@ class FileDeleteTask(FireTaskBase):
 
 
     def run_task(self, fw_spec):
-        pth = self.get("dest", os.getcwd())
+        pth = self.get("dest", fw_spec.get("_fw_launch_dir", os.getcwd()))
         for f in self["files_to_delete"]:
             os.remove(os.path.join(pth, f))
 
@@ -60,121 +62,105 @@ class FileTransferTask(FireTaskBase):
     Optional params:
         - server: (str) server host for remote transfer
         - key_filename: (str) optional SSH key location for remote transfer
+        - num_workers: (int) number of files transferred at the same time
+        - skip: (str) don't copy files whose destination already matches: 'mtime' (same size and
+        destination not older than the source) or 'checksum' (same size and contents)
     """
     _fw_name = 'FileTransferTask'
     required_params = ["mode", "files"]
 
-    fn_list = {
-            "move": shutil.move,
-            "mv": shutil.move,
-            "copy": shutil.copy,
-            "cp": shutil.copy,
-            "copy2": shutil.copy2,
-            "copytree": shutil.copytree,
-            "copyfile": shutil.copyfile,
-    }
+    fn_list = TransferEngine.fn_list
 
     def run_task(self, fw_spec):
         shell_interpret = self.get('shell_interpret', True)
-        ignore_errors = self.get('ignore_errors')
         mode = self.get('mode', 'move')
+        cwd = fw_spec.get('_fw_launch_dir', os.getcwd())
 
-        if mode == 'rtransfer':
-            # remote transfers
-            # Create SFTP connection
-            import paramiko
-            ssh = paramiko.SSHClient()
-            ssh.load_host_keys(expanduser(os.path.join("~", ".ssh", "known_hosts")))
-            ssh.connect(self['server'], key_filename=self.get['key_filename'])
-            sftp = ssh.open_sftp()
+        engine = TransferEngine(mode, num_workers=self.get('num_workers', FILE_TRANSFER_WORKERS),
+                                skip=self.get('skip'), server=self.get('server'),
+                                key_filename=self.get('key_filename'),
+                                ignore_errors=self.get('ignore_errors'))
 
         for f in self["files"]:
             try:
                 if 'src' in f:
-                    src = os.path.abspath(expanduser(expandvars(f['src']))) if shell_interpret \
+                    src = abspath(os.path.join(cwd, expanduser(expandvars(f['src'])))) if shell_interpret \
                         else f['src']
                 else:
-                    src = abspath(expanduser(expandvars(f))) if shell_interpret else f
+                    src = abspath(os.path.join(cwd, expanduser(expandvars(f)))) if shell_interpret else f
 
                 if mode == 'rtransfer':
                     dest = self['dest']
-                    if os.path.isdir(src):
-                        if not self._rexists(sftp, dest):
-                            sftp.mkdir(dest)
-
-                        for f in os.listdir(src):
-                            if os.path.isfile(os.path.join(src,f)):
-                                sftp.put(os.path.join(src, f), os.path.join(dest, f))
-                    else:
-                        sftp.put(src, dest)
-
+                elif 'dest' in f:
+                    dest = abspath(os.path.join(cwd, expanduser(expandvars(f['dest'])))) if shell_interpret \
+                        else f['dest']
                 else:
-                    if 'dest' in f:
-                        dest = abspath(expanduser(expandvars(f['dest']))) if shell_interpret \
-                            else f['dest']
-                    else:
-                        dest = abspath(expanduser(expandvars(self['dest']))) if shell_interpret \
-                            else self['dest']
-                    FileTransferTask.fn_list[mode](src, dest)
+                    dest = abspath(os.path.join(cwd, expanduser(expandvars(self['dest'])))) if shell_interpret \
+                        else self['dest']
+                engine.add(src, dest)
 
             except:
                 traceback.print_exc()
-                if not ignore_errors:
+                if not self.get('ignore_errors'):
                     raise ValueError(
                         "There was an error performing operation {} from {} "
-                        "to {}".format(mode, self["files"], self["dest"]))
-        if mode == 'rtransfer':
-            sftp.close()
-            ssh.close()
-
-    def _rexists(self, sftp, path):
-        """
-        os.path.exists for paramiko's SCP object
-        """
-        try:
-            sftp.stat(path)
-        except IOError as e:
-            if e[0] == 2:
-                return False
-            raise
-        else:
-            return True
+                        "to {}".format(mode, self["files"], self.get("dest")))
+
+        engine.run()
 
 
 class CompressDirTask(FireTaskBase):
     """
-    Compress all files in a directory.
+    Compress all files in a directory, on several cores.
 
     Args:
         dest (str): Optional. Path to compress.
-        compression (str): Optional. Can only be gz or bz2. Defaults to gz.
+        compression (str): Optional. Can be gz, bz2 or xz. Defaults to gz.
+        num_workers (int): Optional. Number of processes. Defaults to the number of cores.
+        min_size (int): Optional. Don't compress files smaller than this many bytes.
+        delete (bool): Optional. Remove the original files. Defaults to True.
+        verify (bool): Optional. Check each compressed file before removing the original.
+            Defaults to False.
     """
 
     _fw_name = 'CompressDirTask'
-    optional_params = ["compression", "dest"]
+    optional_params = ["compression", "dest", "num_workers", "min_size", "delete", "verify"]
 
     def run_task(self, fw_spec):
-        pth = self.get("dest", os.getcwd())
-        compress_dir(pth, compression=self["compression"])
+        pth = self.get("dest", fw_spec.get("_fw_launch_dir", os.getcwd()))
+        compress_dir(pth, compression=self.get("compression", "gz"),
+                     num_workers=self.get("num_workers"), min_size=self.get("min_size", 0),
+                     delete=self.get("delete", True), verify=self.get("verify", False))
 
 
 class ArchiveDirTask(FireTaskBase):
     """
-    Wrapper around shutil.make_archive to make tar archives.
+    Wrapper around shutil.make_archive to make tar archives. Compressed tar
+    archives are compressed on several cores.
 
     Args:
         base_name (str): Name of the file to create, including the path,
         minus any
             format-specific extension.
-        format (str): Optional. one of "zip", "tar", "bztar" or "gztar".
-            Defaults to gztar.
+        format (str): Optional. one of "zip", "tar", "bztar", "gztar" or
+            "xztar". Defaults to gztar.
+        num_workers (int): Optional. Number of threads compressing the
+            archive. Defaults to the number of cores.
     """
 
     _fw_name = 'ArchiveDirTask'
     required_params = ["base_name"]
-    optional_params = ["format"]
+    optional_params = ["format", "num_workers"]
+
+    archive_compressions = {"gztar": "gz", "bztar": "bz2", "xztar": "xz"}
 
     def run_task(self, fw_spec):
-        shutil.make_archive(self["base_name"],
-                            format=self.get("format", "gztar"),
-                            root_dir=".")
+        cwd = fw_spec.get("_fw_launch_dir", os.getcwd())
+        m_format = self.get("format", "gztar")
+        if m_format in self.archive_compressions:
+            make_archive(os.path.join(cwd, self["base_name"]), root_dir=cwd,
+                         compression=self.archive_compressions[m_format],
+                         num_workers=self.get("num_workers"))
+        else:
+            shutil.make_archive(os.path.join(cwd, self["base_name"]),
+                                format=m_format, root_dir=cwd)
@@ -1,9 +1,13 @@
+import os
 import shlex
 import subprocess
 import sys
+import threading
 
 from fireworks.core.firework import FireTaskBase, FWAction
-from six.moves import builtins
+from fireworks.fw_config import SCRIPT_STORED_OUTPUT_BYTES
+from fireworks.utilities.forkserver import get_func, run_in_forkserver, FORKSERVER_AVAILABLE
+from fireworks.utilities.fw_utilities import get_fw_logger
 
 __author__ = 'Anubhav Jain'
 __copyright__ = 'Copyright 2013, The Materials Project'
@@ -13,7 +17,86 @@ __email__ = 'ajain@lbl.gov'
 __date__ = 'Feb 18, 2013'
 
 # TODO: document!
-# TODO: add maximum length of 10,000 chars for stored fields
+
+STREAM_CHUNK_SIZE = 1 << 16  # bytes read from / written to the script's pipes at a time
+
+
+class OutputCapture(object):
+    """
+    Consumes an output stream of a script chunk by chunk: the data is appended to a file (if any),
+    and only the first and last max_bytes/2 bytes are kept in memory for storing.
+
+    The file is opened by open(), in the calling thread, so that an error is raised there rather
+    than in the reader thread. An error writing to the file is kept in self.error while the stream
+    is drained to the end; otherwise the script would block on a full pipe.
+    """
+
+    def __init__(self, filename=None, max_bytes=SCRIPT_STORED_OUTPUT_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.nbytes = 0
+        self.file = None
+        self.error = None
+
+    def open(self):
+        if self.filename:
+            self.file = open(self.filename, 'ab')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def consume(self, stream):
+        try:
+            for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                if self.file and self.error is None:
+                    try:
+                        self.file.write(chunk)
+                    except (IOError, OSError) as e:
+                        self.error = e
+                self.add(chunk)
+        finally:
+            stream.close()
+
+    def add(self, chunk):
+        self.nbytes += len(chunk)
+        head_room = self.max_bytes // 2 - len(self.head)
+        if head_room > 0:
+            self.head += chunk[:head_room]
+            chunk = chunk[head_room:]
+        if chunk:
+            # trim the tail in place, so that each chunk costs its own length, not the tail's
+            self.tail += chunk
+            n_extra = len(self.tail) - (self.max_bytes - self.max_bytes // 2)
+            if n_extra > 0:
+                del self.tail[:n_extra]
+
+    def get_text(self):
+        """
+        :return: (str) the output, with the middle cut out if it was longer than max_bytes
+        """
+        n_cut = self.nbytes - len(self.head) - len(self.tail)
+        if n_cut > 0:
+            return '{}\n... [{} bytes truncated] ...\n{}'.format(
+                self.head.decode('utf-8', 'replace'), n_cut, self.tail.decode('utf-8', 'replace'))
+        return (self.head + self.tail).decode('utf-8', 'replace')
+
+
+def _write_stdin(stream, data):
+    try:
+        for i in range(0, len(data), STREAM_CHUNK_SIZE):
+            chunk = data[i:i + STREAM_CHUNK_SIZE]
+            stream.write(chunk.encode('utf-8') if not isinstance(chunk, bytes) else chunk)
+    except IOError:
+        pass  # the script exited without reading all of its input
+    finally:
+        try:
+            stream.close()
+        except IOError:
+            pass
 
 
 class ScriptTask(FireTaskBase):
@@ -25,57 +108,69 @@ class ScriptTask(FireTaskBase):
             self._load_params(fw_spec)
         else:
             self._load_params(self)
+        self.cwd = fw_spec.get('_fw_launch_dir', os.getcwd())
 
         # get the standard in and run task internally
         if self.stdin_file:
-            with open(self.stdin_file) as stdin_f:
+            with open(os.path.join(self.cwd, self.stdin_file)) as stdin_f:
                 return self._run_task_internal(fw_spec, stdin_f)
         stdin = subprocess.PIPE if self.stdin_key else None
         return self._run_task_internal(fw_spec, stdin)
 
     def _run_task_internal(self, fw_spec, stdin):
+        # the output is streamed to the files as it is produced; only a bounded part is kept in
+        # memory for storing
+        captures = {}
+        for name, store, filename in [('stdout', self.store_stdout, self.stdout_file),
+                                      ('stderr', self.store_stderr, self.stderr_file)]:
+            if store or filename:
+                m_file = os.path.join(self.cwd, filename) if filename else None
+                captures[name] = OutputCapture(m_file)
+        stdout = subprocess.PIPE if 'stdout' in captures else sys.stdout
+        stderr = subprocess.PIPE if 'stderr' in captures else sys.stderr
+
         # run the program
-        stdout = subprocess.PIPE if self.store_stdout or self.stdout_file else sys.stdout
-        stderr = subprocess.PIPE if self.store_stderr or self.stderr_file else sys.stderr
         returncodes = []
-        for s in self.script:
-            p = subprocess.Popen(
-                s, executable=self.shell_exe, stdin=stdin,
-                stdout=stdout, stderr=stderr,
-                shell=self.use_shell)
-
-            # communicate in the standard in and get back the standard out and returncode
-            if self.stdin_key:
-                (stdout, stderr) = p.communicate(fw_spec[self.stdin_key])
-            else:
-                (stdout, stderr) = p.communicate()
-            returncodes.append(p.returncode)
-
-            #Stop execution if any script command fails.
-            if p.returncode != 0:
-                break
-
-        # write out the output, error files if specified
-
-        stdout = stdout.decode('utf-8') if isinstance(stdout, bytes) else stdout
-        stderr = stderr.decode('utf-8') if isinstance(stderr, bytes) else stderr
-
-        if self.stdout_file:
-            with open(self.stdout_file, 'a+') as f:
-                f.write(stdout)
-
-        if self.stderr_file:
-            with open(self.stderr_file, 'a+') as f:
-                f.write(stderr)
+        try:
+            for capture in captures.values():
+                capture.open()
+            for s in self.script:
+                p = subprocess.Popen(
+                    s, executable=self.shell_exe, stdin=stdin,
+                    stdout=stdout, stderr=stderr,
+                    shell=self.use_shell, cwd=self.cwd)
+
+                threads = [threading.Thread(target=captures[name].consume,
+                                            args=(getattr(p, name),))
+                           for name in sorted(captures)]
+                if self.stdin_key:
+                    threads.append(threading.Thread(target=_write_stdin,
+                                                    args=(p.stdin, fw_spec[self.stdin_key])))
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                p.wait()
+                returncodes.append(p.returncode)
+                for capture in captures.values():
+                    if capture.error:
+                        raise capture.error
+
+                #Stop execution if any script command fails.
+                if p.returncode != 0:
+                    break
+        finally:
+            for capture in captures.values():
+                capture.close()
 
         # write the output keys
         output = {}
 
         if self.store_stdout:
-            output['stdout'] = stdout
+            output['stdout'] = captures['stdout'].get_text()
 
         if self.store_stderr:
-            output['stderr'] = stderr
+            output['stderr'] = captures['stderr'].get_text()
 
         output['returncode'] = returncodes[-1]
         output['all_returncodes'] = returncodes
@@ -144,25 +239,34 @@ class PyTask(FireTaskBase):
 
         All other params not starting with "_" are supplied as keyword args
         to the Python method.
+
+    If the FWorker env has a "pytask_forkserver" key (a list of modules to
+    preload), the function runs in a child of a warm forkserver instead of in
+    the Rocket process. See fireworks.utilities.forkserver. The forkserver
+    requires Python 3.4+ on a Unix system; elsewhere, the function runs in
+    the Rocket process, with a warning.
     """
 
     required_params = ["func"]
     optional_params = ["args", "stored_data_varname"]
 
     def run_task(self, fw_spec):
-        toks = self["func"].rsplit(".", 1)
-        if len(toks) == 2:
-            modname, funcname = toks
-            mod = __import__(modname, globals(), locals(), [funcname], 0)
-            func = getattr(mod, funcname)
-        else:
-            #Handle built in functions.
-            func = getattr(builtins, toks[0])
         args = self.get("args", [])
         kwargs = {k: v for k, v in self.items()
                   if not (k.startswith("_") or k in ["func",
                                                      "args",
                                                      "stored_data_varname"])}
-        output = func(*args, **kwargs)
+        preload = fw_spec.get("_fw_env", {}).get("pytask_forkserver")
+        if preload is not None and not FORKSERVER_AVAILABLE:
+            get_fw_logger("forkserver", stream_level="WARNING").warning(
+                "pytask_forkserver requires Python 3.4+ on a Unix system; running {} in the "
+                "Rocket process".format(self["func"]))
+            preload = None
+        if preload is not None:
+            output = run_in_forkserver(self["func"], args, kwargs,
+                                       cwd=fw_spec.get("_fw_launch_dir", os.getcwd()),
+                                       preload=preload)
+        else:
+            output = get_func(self["func"])(*args, **kwargs)
         if self.get("stored_data_varname"):
             return FWAction(stored_data={self["stored_data_varname"]: output})
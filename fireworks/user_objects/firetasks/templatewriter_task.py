@@ -3,9 +3,9 @@ This module contains the TemplateWriterTask, which writes files based on a templ
 """
 
 import os
-from jinja2 import Template
 from fireworks.core.firework import FireTaskBase
 from fireworks.fw_config import TEMPLATE_DIR
+from fireworks.utilities.template_cache import get_jinja_template
 
 __author__ = 'Anubhav Jain'
 __copyright__ = 'Copyright 2013, The Materials Project'
@@ -34,13 +34,14 @@ class TemplateWriterTask(FireTaskBase):
         else:
             self._load_params(self)
 
-        with open(self.template_file) as f:
-            t = Template(f.read())
-            output = t.render(self.context)
+        t = get_jinja_template(os.path.dirname(self.template_file),
+                               os.path.basename(self.template_file))
+        output = t.render(self.context)
 
-            write_mode = 'w+' if self.append_file else 'w'
-            with open(self.output_file, write_mode) as of:
-                of.write(output)
+        write_mode = 'w+' if self.append_file else 'w'
+        with open(os.path.join(fw_spec.get('_fw_launch_dir', os.getcwd()), self.output_file),
+                  write_mode) as of:
+            of.write(output)
 
     def _load_params(self, d):
 
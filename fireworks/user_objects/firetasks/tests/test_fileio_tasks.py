@@ -7,12 +7,22 @@ __date__ = '1/6/14'
 
 import unittest
 import os
+import gzip
+import shutil
+import tarfile
+import tempfile
 
 from fireworks.user_objects.firetasks.fileio_tasks import FileWriteTask, \
-    CompressDirTask, ArchiveDirTask
+    CompressDirTask, ArchiveDirTask, FileTransferTask
+from fireworks.utilities.compression import compress_file
 from fireworks.utilities.fw_serializers import load_object_from_file
 from monty.shutil import decompress_dir
 
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
 module_dir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -57,5 +67,123 @@ class CompressArchiveDirTest(unittest.TestCase):
         os.chdir(self.cwd)
 
 
+class ParallelCompressionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data = {"big.txt": b"".join(str(i).encode() for i in range(200000)),
+                     "tiny.txt": b"x",
+                     "sub/small.txt": b"hello world" * 100}
+        os.makedirs(os.path.join(self.dir, "sub"))
+        for f, data in self.data.items():
+            with open(os.path.join(self.dir, f), "wb") as fp:
+                fp.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    @unittest.skipIf(lzma is None, "lzma is not available")
+    def test_compress_dir(self):
+        c = CompressDirTask(compression="xz", num_workers=2, min_size=10, verify=True)
+        c.run_task({"_fw_launch_dir": self.dir})
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "tiny.txt")))
+        for f in ["big.txt", "sub/small.txt"]:
+            self.assertFalse(os.path.exists(os.path.join(self.dir, f)))
+            with lzma.open(os.path.join(self.dir, f + ".xz")) as fp:
+                self.assertEqual(fp.read(), self.data[f])
+
+    def test_chunked_file(self):
+        f = os.path.join(self.dir, "big.txt")
+        out = compress_file(f, "gz", num_workers=4, chunk_size=10000, delete=False,
+                            verify=True)
+        self.assertTrue(os.path.exists(f))
+        with gzip.open(out) as fp:
+            self.assertEqual(fp.read(), self.data["big.txt"])
+
+    def test_archive_dir(self):
+        a = ArchiveDirTask(base_name="archive", format="gztar", num_workers=2)
+        a.run_task({"_fw_launch_dir": self.dir})
+        with tarfile.open(os.path.join(self.dir, "archive.tar.gz")) as tar:
+            self.assertEqual(tar.extractfile("./sub/small.txt").read(),
+                             self.data["sub/small.txt"])
+            self.assertEqual(len([m for m in tar.getmembers() if m.isfile()]), 3)
+
+
+class FileTransferTaskTest(unittest.TestCase):
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp()
+        self.dest_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.src_dir, "sub"))
+        self.files = ["file{}.txt".format(i) for i in range(50)]
+        for f in self.files + ["sub/nested.txt"]:
+            with open(os.path.join(self.src_dir, f), "w") as fp:
+                fp.write(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir)
+        shutil.rmtree(self.dest_dir)
+
+    def test_copy(self):
+        t = FileTransferTask({"files": self.files, "dest": self.dest_dir,
+                              "mode": "copy", "num_workers": 8})
+        t.run_task({"_fw_launch_dir": self.src_dir})
+        self.assertEqual(sorted(os.listdir(self.dest_dir)), sorted(self.files))
+        with open(os.path.join(self.dest_dir, "file7.txt")) as f:
+            self.assertEqual(f.read(), "file7.txt")
+
+    def test_copytree(self):
+        dest = os.path.join(self.dest_dir, "tree")
+        t = FileTransferTask({"files": [{"src": self.src_dir, "dest": dest}],
+                              "mode": "copytree"})
+        t.run_task({})
+        self.assertTrue(os.path.exists(os.path.join(dest, "sub", "nested.txt")))
+        self.assertEqual(len(os.listdir(dest)), 51)
+        self.assertEqual(os.stat(os.path.join(dest, "sub")).st_mtime,
+                         os.stat(os.path.join(self.src_dir, "sub")).st_mtime)
+        # like shutil.copytree, an existing destination is an error...
+        self.assertRaises(ValueError, t.run_task, {})
+        # ...unless unchanged files are skipped
+        t["skip"] = "checksum"
+        t.run_task({})
+
+    def test_copytree_symlink(self):
+        # the contents of a symlinked directory are copied
+        linked_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(linked_dir, "linked.txt"), "w") as fp:
+                fp.write("linked")
+            os.symlink(linked_dir, os.path.join(self.src_dir, "link"))
+            dest = os.path.join(self.dest_dir, "tree")
+            FileTransferTask({"files": [{"src": self.src_dir, "dest": dest}],
+                              "mode": "copytree"}).run_task({})
+            self.assertFalse(os.path.islink(os.path.join(dest, "link")))
+            with open(os.path.join(dest, "link", "linked.txt")) as fp:
+                self.assertEqual(fp.read(), "linked")
+        finally:
+            shutil.rmtree(linked_dir)
+
+    def test_skip(self):
+        for skip in ["mtime", "checksum"]:
+            t = FileTransferTask({"files": self.files, "dest": self.dest_dir,
+                                  "mode": "copy2", "skip": skip})
+            t.run_task({"_fw_launch_dir": self.src_dir})
+            with open(os.path.join(self.src_dir, "file3.txt"), "w") as fp:
+                fp.write("changed!!")
+            with open(os.path.join(self.dest_dir, "file4.txt"), "w") as fp:
+                fp.write("file4.tx_")  # same size and newer, different contents
+            t.run_task({"_fw_launch_dir": self.src_dir})
+            with open(os.path.join(self.dest_dir, "file3.txt")) as fp:
+                self.assertEqual(fp.read(), "changed!!")
+            with open(os.path.join(self.dest_dir, "file4.txt")) as fp:
+                self.assertEqual(fp.read(), "file4.tx_" if skip == "mtime" else "file4.txt")
+
+    def test_errors(self):
+        t = FileTransferTask({"files": ["missing.txt"] + self.files,
+                              "dest": self.dest_dir, "mode": "copy"})
+        self.assertRaises(ValueError, t.run_task, {"_fw_launch_dir": self.src_dir})
+        t["ignore_errors"] = True
+        t.run_task({"_fw_launch_dir": self.src_dir})
+        self.assertEqual(len(os.listdir(self.dest_dir)), 50)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -13,9 +13,17 @@ __maintainer__ = "Shyue Ping Ong"
 __email__ = "shyuep@gmail.com"
 __date__ = "2/16/14"
 
+import io
+import os
+import shutil
+import tempfile
 import unittest
 
-from fireworks.user_objects.firetasks.script_task import PyTask
+from fireworks.user_objects.firetasks import script_task
+from fireworks.user_objects.firetasks.script_task import PyTask, ScriptTask, \
+    OutputCapture
+from fireworks.utilities import forkserver
+from fireworks.utilities.forkserver import start_forkserver
 
 class PythonTaskTest(unittest.TestCase):
 
@@ -30,6 +38,102 @@ class PythonTaskTest(unittest.TestCase):
         p = PyTask(func="print", args=[3])
         a = p.run_task({})
 
+    @unittest.skipIf(not forkserver.FORKSERVER_AVAILABLE,
+                     "the forkserver requires Python 3.4+ on a Unix system")
+    def test_forkserver(self):
+        launch_dir = tempfile.mkdtemp()
+        spec = {"_fw_env": {"pytask_forkserver": ["json"]}, "_fw_launch_dir": launch_dir}
+        try:
+            p = PyTask(func="os.getpid", stored_data_varname="pid")
+            self.assertNotEqual(p.run_task(spec).stored_data["pid"], os.getpid())
+            p = PyTask(func="os.getcwd", stored_data_varname="cwd")
+            self.assertEqual(os.path.realpath(p.run_task(spec).stored_data["cwd"]),
+                             os.path.realpath(launch_dir))
+            p = PyTask(func="json.loads", args=["{"])
+            self.assertRaises(ValueError, p.run_task, spec)
+            # a crash of the function doesn't take down the Rocket
+            p = PyTask(func="os._exit", args=[3])
+            self.assertRaises(RuntimeError, p.run_task, spec)
+        finally:
+            shutil.rmtree(launch_dir)
+
+    @unittest.skipIf(not forkserver.FORKSERVER_AVAILABLE,
+                     "the forkserver requires Python 3.4+ on a Unix system")
+    def test_forkserver_preload(self):
+        start_forkserver(["json"])
+        self.assertIn("fireworks.utilities.forkserver", forkserver._preload)
+        # only the modules of the first call are preloaded
+        with self.assertLogs("forkserver", "WARNING") as cm:
+            start_forkserver(["json", "csv"])
+        self.assertIn("['csv'] are not preloaded", cm.output[0])
+
+    def test_forkserver_unavailable(self):
+        spec = {"_fw_env": {"pytask_forkserver": ["json"]}}
+        old_available = script_task.FORKSERVER_AVAILABLE
+        script_task.FORKSERVER_AVAILABLE = False
+        try:
+            # the function runs in this process instead
+            p = PyTask(func="os.getpid", stored_data_varname="pid")
+            self.assertEqual(p.run_task(spec).stored_data["pid"], os.getpid())
+        finally:
+            script_task.FORKSERVER_AVAILABLE = old_available
+
+
+class ScriptTaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.launch_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.launch_dir)
+
+    def test_stream_output(self):
+        # more output than fits in a pipe buffer, on both streams, over two scripts
+        t = ScriptTask({'script': ['seq 1 100000', 'seq 1 50000 >&2'],
+                        'stdout_file': 'out.txt', 'stderr_file': 'err.txt',
+                        'store_stdout': True})
+        a = t.run_task({'_fw_launch_dir': self.launch_dir})
+        with open(os.path.join(self.launch_dir, 'out.txt')) as f:
+            self.assertEqual(f.read().split(), [str(i) for i in range(1, 100001)])
+        with open(os.path.join(self.launch_dir, 'err.txt')) as f:
+            self.assertEqual(len(f.read().split()), 50000)
+        self.assertEqual(a.stored_data['stdout'].split()[:3], ['1', '2', '3'])
+        self.assertNotIn('stderr', a.stored_data)
+        self.assertEqual(a.stored_data['all_returncodes'], [0, 0])
+
+    def test_stdin_key(self):
+        data = 'x' * 200000 + '\n'
+        t = ScriptTask({'script': 'wc -c', 'stdin_key': 'data', 'store_stdout': True})
+        a = t.run_task({'_fw_launch_dir': self.launch_dir, 'data': data})
+        self.assertEqual(a.stored_data['stdout'].strip(), '200001')
+
+    def test_output_file_errors(self):
+        # the file can't be opened: the error is raised before the script runs
+        t = ScriptTask({'script': 'seq 1 200000', 'stdout_file': 'nosuchdir/out.txt'})
+        self.assertRaises(IOError, t.run_task, {'_fw_launch_dir': self.launch_dir})
+
+        # the file can't be written: the stream is still drained to the end
+        filename = os.path.join(self.launch_dir, 'out.txt')
+        open(filename, 'w').close()
+        c = OutputCapture(filename)
+        c.file = open(filename, 'rb')
+        try:
+            c.consume(io.BytesIO(b'x' * 200000))
+        finally:
+            c.close()
+        self.assertIsInstance(c.error, (IOError, OSError))
+        self.assertEqual(c.nbytes, 200000)
+
+    def test_bounded_capture(self):
+        c = OutputCapture(max_bytes=10)
+        for i in range(100):
+            c.add(str(i % 10).encode('utf-8'))
+        self.assertEqual(c.nbytes, 100)
+        self.assertEqual(c.get_text(), '01234\n... [90 bytes truncated] ...\n56789')
+        c = OutputCapture(max_bytes=10)
+        c.add(b'abc')
+        self.assertEqual(c.get_text(), 'abc')
+
 
 if __name__ == '__main__':
     unittest.main()
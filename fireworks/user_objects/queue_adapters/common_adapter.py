@@ -7,8 +7,11 @@ queues.
 import getpass
 import os
 import re
+import shlex
 import subprocess
-from fireworks.queue.queue_adapter import QueueAdapterBase, Command
+from fireworks.queue import queue_state
+from fireworks.queue.queue_adapter import QueueAdapterBase
+from fireworks.queue.queue_state import QueueJob
 from fireworks.utilities.fw_serializers import serialize_fw
 from fireworks.utilities.fw_utilities import log_exception, log_fancy
 
@@ -32,6 +35,14 @@ class CommonAdapter(QueueAdapterBase):
         "SLURM": "sbatch",
         "LoadLeveler": "llsubmit"
     }
+    # q_type -> (option of the submit command for an array of n tasks, environment variable with
+    # the index of a task, id of a task in the queue). PBS Pro users should set the
+    # "array_option" and "array_index_var" parameters to "-J 1-{n}" and "PBS_ARRAY_INDEX".
+    array_options = {
+        "SLURM": ("--array=1-{n}", "SLURM_ARRAY_TASK_ID", "{job_id}_{index}"),
+        "PBS": ("-t 1-{n}", "PBS_ARRAYID", "{job_id}[{index}]"),
+        "SGE": ("-t 1-{n}", "SGE_TASK_ID", "{job_id}.{index}")
+    }
 
     def __init__(self, q_type, q_name=None, template_file=None, **kwargs):
         """
@@ -73,47 +84,152 @@ class CommonAdapter(QueueAdapterBase):
         raise RuntimeError("Unable to parse jobid")
 
     def _get_status_cmd(self, username):
+        # the tasks of job arrays are listed one per line (-r, -t), so that each counts as a job
         if self.q_type == 'SLURM':
-            return ['squeue', '-o "%u"', '-u', username]
+            return ['squeue', '-r', '-h', '-o', '%i|%T|%P|%j', '-u', username]
         elif self.q_type == "LoadLeveler":
             return ['llq', '-u', username]
+        elif self.q_type == "PBS":
+            return ['qstat', '-t', '-u', username]
         else:
             return ['qstat', '-u', username]
 
-    def _parse_njobs(self, output_str, username):
-        # TODO: what if username is too long for the output and is cut off?
-
-        if self.q_type == 'SLURM': # this special case might not be needed
-            # TODO: currently does not filter on queue name or job state
-            outs = output_str.split('\n')
-            return len([line.split() for line in outs if username in line])
+    def _parse_jobs(self, output_str, username):
+        """
+        :param output_str: (str) output of the status command
+        :param username: (str) only the jobs of this user are returned
+        :return: ([QueueJob])
+        """
+        jobs = []
+        if self.q_type == 'SLURM':
+            # squeue -u only lists the jobs of the user; the name goes last as it may contain a |
+            for l in output_str.split('\n'):
+                toks = l.strip().split('|', 3)
+                if len(toks) == 4:
+                    jobs.append(QueueJob(toks[0], self._get_slurm_state(toks[1]), toks[2], toks[3]))
 
-        if self.q_type == "LoadLeveler":
-            if 'There is currently no job status to report' in output_str:
-                return 0
-            else:
-                # last line is: "1 job step(s) in query, 0 waiting, ..."
-                return int(output_str.split('\n')[-2].split()[0])
+        elif self.q_type == 'LoadLeveler':
+            # Id  Owner  Submitted  ST  PRI  Class  Running On, where Submitted is e.g. "5/20 11:31"
+            in_table = False
+            for l in output_str.split('\n'):
+                toks = l.split()
+                if not toks:
+                    in_table = False
+                elif toks[0].startswith('---'):
+                    in_table = True
+                elif in_table and len(toks) >= 6 and self._is_user(toks[1], username):
+                    # the Id of a job step, e.g. mars.498.0, is the job id of llsubmit plus a step
+                    jobs.append(QueueJob(toks[0].rsplit('.', 1)[0], self._get_ll_state(toks[4]),
+                                         toks[6] if len(toks) > 6 else None, None))
 
-        count = 0
-        for l in output_str.split('\n'):
-            if l.lower().startswith("job"):
-                header = l.split()
+        else:
+            header = None
+            for l in output_str.split('\n'):
+                if l.lower().startswith("job"):
+                    header = l.split()
+                    if self.q_type == "PBS":
+                        # PBS has a ridiculous two word "Job ID" in header
+                        indices = [header.index(h) - 1 for h in ["Username", "S", "Queue", "Jobname"]]
+                    continue
+                toks = l.split()
+                if not header or not toks or toks[0].startswith('-'):
+                    continue
                 if self.q_type == "PBS":
-                    #PBS has a ridiculous two word "Job ID" in header
-                    state_index = header.index("S") - 1
-                    queue_index = header.index("Queue") - 1
+                    user_index, state_index, queue_index, name_index = indices
+                    if len(toks) > state_index and self._is_user(toks[user_index], username):
+                        # drop the server name, e.g. 1234.tscc-mgr.local or 1234[5].tscc-mgr.local
+                        jobs.append(QueueJob(toks[0].split('.')[0],
+                                             self._get_pbs_state(toks[state_index]),
+                                             toks[queue_index], toks[name_index]))
                 else:
-                    state_index = header.index("state")
-                    queue_index = header.index("queue")
-            if username in l:
-                toks = l.split()
-                if toks[state_index] != "C":
-                    # note: the entire queue name might be cutoff from the output if long queue name
-                    # so we are only ensuring that our queue matches up until cutoff point
-                    if "queue" in self and self["queue"][0:len(toks[queue_index])] in toks[queue_index]:
-                        count += 1
+                    jobs.extend(self._parse_sge_line(toks, username))
 
+        return jobs
+
+    def _parse_sge_line(self, toks, username):
+        # job-ID prior name user state submit/start at queue slots ja-task-ID, where the "at" is
+        # the time of day, and the queue is blank for pending jobs
+        if len(toks) < 8 or not self._is_user(toks[3], username):
+            return []
+        state = self._get_sge_state(toks[4])
+        queue = None if toks[7].isdigit() else toks[7]
+        ja_task_ids = toks[8 if queue is None else 9:]
+        if not ja_task_ids:
+            return [QueueJob(toks[0], state, queue, toks[2])]
+        # pending tasks of an array share a line, e.g. with ja-task-ID "3-100:1" or "3,5"
+        jobs = []
+        for task_range in ja_task_ids[0].split(','):
+            m = re.match(r"^(\d+)-(\d+):(\d+)$", task_range)
+            first, last, step = map(int, m.groups()) if m else (int(task_range), int(task_range), 1)
+            jobs.extend(QueueJob(self.get_array_task_id(toks[0], i), state, queue, toks[2])
+                        for i in range(first, last + 1, step))
+        return jobs
+
+    @staticmethod
+    def _is_user(user, username):
+        # the username might be cut off in the output if it is long
+        return username[0:len(user)] == user
+
+    @staticmethod
+    def _get_slurm_state(state):
+        if state in ('PENDING', 'CONFIGURING', 'REQUEUED', 'RESIZING'):
+            return 'PENDING'
+        if state in ('RUNNING', 'COMPLETING', 'SIGNALING', 'STAGE_OUT'):
+            return 'RUNNING'
+        if state in ('SUSPENDED', 'STOPPED', 'REQUEUE_HOLD', 'RESV_DEL_HOLD'):
+            return 'HELD'
+        if state in ('COMPLETED', 'CANCELLED', 'FAILED', 'TIMEOUT', 'NODE_FAIL', 'PREEMPTED',
+                     'BOOT_FAIL', 'DEADLINE', 'OUT_OF_MEMORY', 'SPECIAL_EXIT'):
+            return 'DONE'
+        return 'UNKNOWN'
+
+    @staticmethod
+    def _get_pbs_state(state):
+        return {'Q': 'PENDING', 'W': 'PENDING', 'T': 'PENDING', 'R': 'RUNNING', 'E': 'RUNNING',
+                'B': 'RUNNING', 'H': 'HELD', 'S': 'HELD', 'U': 'HELD', 'C': 'DONE',
+                'F': 'DONE', 'X': 'DONE'}.get(state, 'UNKNOWN')
+
+    @staticmethod
+    def _get_sge_state(state):
+        # the state is a combination of letters, e.g. "qw", "hqw", "r", "Rr", "dr" or "Eqw"
+        if 'd' in state:
+            return 'DONE'
+        if 'E' in state:
+            return 'ERROR'
+        if any(c in state for c in 'hsST'):
+            return 'HELD'
+        if 'r' in state or 't' in state:
+            return 'RUNNING'
+        if 'q' in state or 'w' in state:
+            return 'PENDING'
+        return 'UNKNOWN'
+
+    @staticmethod
+    def _get_ll_state(state):
+        if state in ('I', 'NQ', 'ST', 'P'):
+            return 'PENDING'
+        if state in ('R', 'CK', 'CP', 'E', 'EP', 'MP', 'RP'):
+            return 'RUNNING'
+        if state in ('H', 'S', 'HS', 'D'):
+            return 'HELD'
+        if state in ('C', 'CA', 'NR', 'RM', 'TX', 'V', 'VP', 'X', 'XP'):
+            return 'DONE'
+        return 'UNKNOWN'
+
+    def _parse_njobs(self, output_str, username):
+        return self._count_jobs(self._parse_jobs(output_str, username))
+
+    def _count_jobs(self, jobs):
+        # the jobs that take up a slot in our queue
+        count = 0
+        for job in jobs:
+            if job.state == 'DONE':
+                continue
+            # note: the entire queue name might be cutoff from the output if long queue name
+            # so we are only ensuring that our queue matches up until cutoff point
+            if self.get("queue") and job.queue and self["queue"][0:len(job.queue)] not in job.queue:
+                continue
+            count += 1
         return count
 
     def submit_to_queue(self, script_file):
@@ -123,6 +239,30 @@ class CommonAdapter(QueueAdapterBase):
         :param script_file: (str) name of the script file to use (String)
         :return: (int) job_id
         """
+        return self._submit(script_file)
+
+    def get_array_index_var(self):
+        if self.q_type not in CommonAdapter.array_options:
+            return None
+        return self.get("array_index_var") or CommonAdapter.array_options[self.q_type][1]
+
+    def submit_array_to_queue(self, script_file, n_tasks):
+        """
+        submits a job array of n_tasks tasks to the queue and returns its job id
+
+        :param script_file: (str) name of the script file to use (String)
+        :param n_tasks: (int) number of tasks in the array
+        :return: (int) job_id of the array
+        """
+        if self.q_type not in CommonAdapter.array_options:
+            raise NotImplementedError('{} does not support job arrays!'.format(self.q_type))
+        option = self.get("array_option") or CommonAdapter.array_options[self.q_type][0]
+        return self._submit(script_file, shlex.split(option.format(n=n_tasks)))
+
+    def get_array_task_id(self, job_id, index):
+        return CommonAdapter.array_options[self.q_type][2].format(job_id=job_id, index=index)
+
+    def _submit(self, script_file, options=()):
         if not os.path.exists(script_file):
             raise ValueError(
                 'Cannot find script file located at: {}'.format(
@@ -131,38 +271,69 @@ class CommonAdapter(QueueAdapterBase):
         queue_logger = self.get_qlogger('qadapter.{}'.format(self.q_name))
         submit_cmd = CommonAdapter.supported_q_types[self.q_type]
         # submit the job
+        cmd = [submit_cmd] + list(options) + [script_file]
         try:
-            cmd = [submit_cmd, script_file]
             p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE)
-            p.wait()
-
-            # grab the returncode. PBS returns 0 if the job was successful
-            if p.returncode == 0:
-                try:
-                    job_id = self._parse_jobid(p.stdout.read())
-                    queue_logger.info(
-                        'Job submission was successful and job_id is {}'.format(
-                            job_id))
-                    return job_id
-                except Exception as ex:
-                    # probably error parsing job code
-                    log_exception(queue_logger,
-                                  'Could not parse job id following {} due to error {}...'
-                                  .format(submit_cmd, str(ex)))
-            else:
-                # some qsub error, e.g. maybe wrong queue specified, don't have permission to submit, etc...
-                msgs = [
-                    'Error in job submission with {n} file {f} and cmd {c}'.format(
-                        n=self.q_name, f=script_file, c=cmd),
-                    'The error response reads: {}'.format(p.stderr.read())]
-                log_fancy(queue_logger, msgs, 'error')
-
-        except Exception as ex:
+                                 stderr=subprocess.PIPE, universal_newlines=True)
+            out, err = p.communicate()
+        except Exception:
             # random error, e.g. no qsub on machine!
             log_exception(queue_logger,
                           'Running the command: {} caused an error...'
                           .format(submit_cmd))
+            return None
+        return self._get_submitted_job_id(cmd, script_file, p.returncode, out, err)
+
+    def _get_submitted_job_id(self, cmd, script_file, returncode, out, err):
+        queue_logger = self.get_qlogger('qadapter.{}'.format(self.q_name))
+        # grab the returncode. PBS returns 0 if the job was successful
+        if returncode == 0:
+            try:
+                job_id = self._parse_jobid(out)
+                queue_logger.info(
+                    'Job submission was successful and job_id is {}'.format(
+                        job_id))
+                # the new job isn't in the cached list of jobs yet
+                queue_state.poller.invalidate(self._get_status_cmd(getpass.getuser()))
+                return job_id
+            except Exception as ex:
+                # probably error parsing job code
+                log_exception(queue_logger,
+                              'Could not parse job id following {} due to error {}...'
+                              .format(cmd[0], str(ex)))
+        else:
+            # some qsub error, e.g. maybe wrong queue specified, don't have permission to submit, etc...
+            msgs = [
+                'Error in job submission with {n} file {f} and cmd {c}'.format(
+                    n=self.q_name, f=script_file, c=cmd),
+                'The error response reads: {}'.format(err)]
+            log_fancy(queue_logger, msgs, 'error')
+        return None
+
+    def get_queue_jobs(self, username=None, max_age=None):
+        """
+        returns the jobs of the user in the queue. The status command is run at most once every \
+        QUEUE_STATE_TTL seconds, by all the processes of the user on this host.
+
+        :param username: (str) the username of the jobs to list (default is to autodetect)
+        :param max_age: (float) accept a list at most this many seconds old (default QUEUE_STATE_TTL)
+        :return: (dict) job_id -> QueueJob, or None if the queue could not be queried
+        """
+        # initialize username
+        if username is None:
+            username = getpass.getuser()
+
+        try:
+            return queue_state.poller.get_jobs(
+                self._get_status_cmd(username),
+                lambda out: {j.job_id: j for j in self._parse_jobs(out, username)}, max_age)
+        except Exception as ex:
+            # there's a problem talking to qstat server?
+            queue_logger = self.get_qlogger('qadapter.{}'.format(self.q_name))
+            msgs = ['Error trying to get the jobs in the queue',
+                    'The error response reads: {}'.format(ex)]
+            log_fancy(queue_logger, msgs, 'error')
+            return None
 
     def get_njobs_in_queue(self, username=None):
         """
@@ -171,29 +342,13 @@ class CommonAdapter(QueueAdapterBase):
         :param username: (str) the username of the jobs to count (default is to autodetect)
         :return: (int) number of jobs in the queue
         """
+        jobs = self.get_queue_jobs(username)
+        if jobs is None:
+            return None
+        njobs = self._count_jobs(jobs.values())
         queue_logger = self.get_qlogger('qadapter.{}'.format(self.q_name))
-
-        # initialize username
-        if username is None:
-            username = getpass.getuser()
-
-        # run qstat
-        qstat = Command(self._get_status_cmd(username))
-        p = qstat.run(timeout=5)
-
-        # parse the result
-        if p[0] == 0:
-            njobs = self._parse_njobs(p[1], username)
-            queue_logger.info(
-                'The number of jobs currently in the queue is: {}'.format(
-                    njobs))
-            return njobs
-
-        # there's a problem talking to qstat server?
-        msgs = ['Error trying to get the number of jobs in the queue',
-                'The error response reads: {}'.format(p[2])]
-        log_fancy(queue_logger, msgs, 'error')
-        return None
+        queue_logger.info('The number of jobs currently in the queue is: {}'.format(njobs))
+        return njobs
 
     @staticmethod
     def _get_default_template_file(q_type):
@@ -13,6 +13,9 @@ __maintainer__ = "Shyue Ping Ong"
 __email__ = "shyuep@gmail.com"
 __date__ = "12/31/13"
 
+import shutil
+import subprocess
+import tempfile
 import unittest
 
 from fireworks.user_objects.queue_adapters.common_adapter import *
@@ -113,5 +116,105 @@ Submitted batch job 1234"""
         qsub_output = "Your job 44275 (\"jobname\") has been submitted"
         self.assertEqual(p._parse_jobid(qsub_output), '44275')
 
+    def test_parse_njobs_sge_array(self):
+        sge = """
+job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+-----------------------------------------------------------------------------------------------------------------
+  44275 10.55000 test3         ongsp        r     12/31/2013 19:35:04     all.q                               8 1
+  44275 10.55000 test3         ongsp        qw    12/31/2013 19:35:04     all.q                               8 2-100:1
+"""
+        p = CommonAdapter(q_type="SGE", queue="all.q")
+        self.assertEqual(p._parse_njobs(sge, "ongsp"), 100)
+
+    def test_parse_jobs(self):
+        squeue = """1234|RUNNING|regular|my job
+1235_1|PENDING|debug|a|b
+1235_2|COMPLETED|debug|a|b
+"""
+        p = CommonAdapter(q_type="SLURM", queue="debug")
+        jobs = p._parse_jobs(squeue, "ongsp")
+        self.assertEqual(jobs, [QueueJob("1234", "RUNNING", "regular", "my job"),
+                                QueueJob("1235_1", "PENDING", "debug", "a|b"),
+                                QueueJob("1235_2", "DONE", "debug", "a|b")])
+        self.assertEqual(p._count_jobs(jobs), 1)
+
+        qstat = """
+Job ID                  Username    Queue    Jobname          SessID  NDS   TSK   Memory   Time    S   Time
+----------------------- ----------- -------- ---------------- ------ ----- ------ ------ --------- - ---------
+1039795[1].tscc-mgr.loc ongsp       home-ong test9             19382     1      8    --  240:00:00 R  35:08:40
+1039796.tscc-mgr.local  ongsp       home-ong test8               --      1      8    --  240:00:00 C       -- """
+        p = CommonAdapter(q_type="PBS")
+        jobs = p._parse_jobs(qstat, "ongsp")
+        self.assertEqual(jobs, [QueueJob("1039795[1]", "RUNNING", "home-ong", "test9"),
+                                QueueJob("1039796", "DONE", "home-ong", "test8")])
+
+        sge = """
+job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+-----------------------------------------------------------------------------------------------------------------
+  44275 10.55000 test3         ongsp        r     12/31/2013 19:35:04     all.q@node1                         8 1
+  44275 10.55000 test3         ongsp        qw    12/31/2013 19:35:04                                         8 3-7:2
+  44276 10.55000 test4         ongsp        Eqw   12/31/2013 19:35:04                                         8
+"""
+        p = CommonAdapter(q_type="SGE", queue="all.q")
+        jobs = p._parse_jobs(sge, "ongsp")
+        self.assertEqual([j.job_id for j in jobs], ["44275.1", "44275.3", "44275.5", "44275.7",
+                                                    "44276"])
+        self.assertEqual(jobs[0], QueueJob("44275.1", "RUNNING", "all.q@node1", "test3"))
+        self.assertEqual(jobs[1], QueueJob("44275.3", "PENDING", None, "test3"))
+        self.assertEqual(jobs[4].state, "ERROR")
+        self.assertEqual(p._count_jobs(jobs), 5)
+
+        llq = """Id                       Owner      Submitted   ST PRI Class        Running On
+------------------------ ---------- ----------- -- --- ------------ -----------
+mars.498.0               ongsp       5/20 11:31 R  100 silver       mars
+mars.499.0               ongsp       5/20 11:31 I  50  silver
+
+2 job step(s) in query, 1 waiting, 0 pending, 1 running, 0 held, 0 preempted
+"""
+        p = CommonAdapter(q_type="LoadLeveler")
+        self.assertEqual(p._parse_jobs(llq, "ongsp"),
+                         [QueueJob("mars.498", "RUNNING", "silver", None),
+                          QueueJob("mars.499", "PENDING", "silver", None)])
+
+    def test_array(self):
+        tmp_dir = tempfile.mkdtemp()
+        old_path = os.environ["PATH"]
+        try:
+            # a fake sbatch that records its arguments
+            with open(os.path.join(tmp_dir, "sbatch"), "w") as f:
+                f.write('#!/bin/bash\necho "$@" > {}\necho "Submitted batch job 42"\n'.format(
+                    os.path.join(tmp_dir, "args")))
+            os.chmod(os.path.join(tmp_dir, "sbatch"), 0o755)
+            os.environ["PATH"] = tmp_dir + os.pathsep + old_path
+
+            task_dirs = [os.path.join(tmp_dir, "task {}".format(i)) for i in range(3)]
+            for d in task_dirs:
+                os.mkdir(d)
+            dirs_file = os.path.join(tmp_dir, "dirs")
+            with open(dirs_file, "w") as f:
+                f.write("".join(d + "\n" for d in task_dirs))
+
+            p = CommonAdapter(q_type="SLURM", rocket_launch="rlaunch singleshot")
+            self.assertEqual(p.get_array_index_var(), "SLURM_ARRAY_TASK_ID")
+            script = p.get_array_script_str(dirs_file)
+            cd_line = [l for l in script.split("\n") if l.startswith("cd ")][0]
+            out = subprocess.check_output(["bash", "-c", cd_line + " && pwd"],
+                                          env=dict(os.environ, SLURM_ARRAY_TASK_ID="2"))
+            self.assertEqual(out.decode().strip(), task_dirs[1])
+
+            script_file = os.path.join(tmp_dir, "FW_submit.script")
+            with open(script_file, "w") as f:
+                f.write(script)
+            self.assertEqual(p.submit_array_to_queue(script_file, 3), 42)
+            with open(os.path.join(tmp_dir, "args")) as f:
+                self.assertEqual(f.read().split(), ["--array=1-3", script_file])
+            self.assertEqual(p.get_array_task_id(42, 3), "42_3")
+
+            self.assertIsNone(CommonAdapter(q_type="LoadLeveler").get_array_index_var())
+        finally:
+            os.environ["PATH"] = old_path
+            shutil.rmtree(tmp_dir)
+
+
 if __name__ == '__main__':
     unittest.main()
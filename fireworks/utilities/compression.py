@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""
+Multi-core compression for CompressDirTask and ArchiveDirTask.
+
+The files of a directory are compressed by a pool of processes, one file per process. Files larger
+than the chunk size are instead split into chunks that are compressed by all cores at once and
+written as consecutive members (streams) of the same file. gzip, bzip2 and xz readers - including
+the Python modules and command line tools - read such multi-member files transparently.
+"""
+
+import bz2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import tarfile
+
+try:
+    import lzma
+except ImportError:
+    lzma = None  # Python 2; xz compression is then unavailable
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+CHUNK_SIZE = 1 << 25  # files larger than this (32 MB) are compressed in parallel chunks
+
+
+def _gzip_compress(data):
+    # gzip.compress() is missing before Python 3.2
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+COMPRESSORS = {'gz': (_gzip_compress, gzip.open),
+               'bz2': (bz2.compress, bz2.BZ2File)}  # compression -> (compress, open)
+if lzma is not None:
+    COMPRESSORS['xz'] = (lzma.compress, lzma.open)
+
+
+def get_num_workers(num_workers=None):
+    return num_workers if num_workers else multiprocessing.cpu_count()
+
+
+class ParallelCompressedWriter(object):
+    """
+    A write-only file object that compresses the data written to it in chunks, on several threads
+    (the compression libraries release the GIL). At most 2 * num_workers chunks are held in memory.
+    """
+
+    def __init__(self, fileobj, compression='gz', num_workers=None, chunk_size=CHUNK_SIZE):
+        """
+        :param fileobj: (file) binary file to write the compressed data to
+        :param compression: (str) 'gz', 'bz2' or 'xz'
+        :param num_workers: (int) number of threads (default: number of cores)
+        :param chunk_size: (int) number of uncompressed bytes per member
+        """
+        self.fileobj = fileobj
+        self.compress = COMPRESSORS[compression][0]
+        self.num_workers = get_num_workers(num_workers)
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers)
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size:
+            self._submit()
+        return len(data)
+
+    def _submit(self):
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if data:
+            self._pending.append(self._executor.submit(self.compress, data))
+        while len(self._pending) > 2 * self.num_workers:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        try:
+            self._submit()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _file_digest(filename, compression=None):
+    """
+    :return: (str) sha256 of the (uncompressed) contents of a file
+    """
+    h = hashlib.sha256()
+    f = COMPRESSORS[compression][1](filename, 'rb') if compression else open(filename, 'rb')
+    with f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compress_file(filename, compression='gz', num_workers=1, chunk_size=CHUNK_SIZE, delete=True,
+                  verify=False):
+    """
+    Compress a file to filename.<compression>, like the gzip/bzip2/xz command line tools
+
+    :param filename: (str) the file to compress
+    :param compression: (str) 'gz', 'bz2' or 'xz'
+    :param num_workers: (int) number of threads compressing chunks of the file
+    :param chunk_size: (int) number of uncompressed bytes per member
+    :param delete: (bool) remove the original file afterwards
+    :param verify: (bool) only remove the original file after decompressing the compressed one and
+    checking that the contents are identical
+    :return: (str) the name of the compressed file
+    """
+    out_name = '{}.{}'.format(filename, compression)
+    tmp_name = out_name + '.part'
+    h = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as f_in, open(tmp_name, 'wb') as f_out, \
+                ParallelCompressedWriter(f_out, compression, num_workers, chunk_size) as writer:
+            for block in iter(lambda: f_in.read(1 << 20), b''):
+                h.update(block)
+                writer.write(block)
+        if verify and _file_digest(tmp_name, compression) != h.hexdigest():
+            raise IOError("Verification of compressed file {} failed!".format(out_name))
+        os.rename(tmp_name, out_name)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+    if delete:
+        os.remove(filename)
+    return out_name
+
+
+def _compress_small_file(args):
+    filename, compression, delete, verify = args
+    return compress_file(filename, compression, 1, delete=delete, verify=verify)
+
+
+def compress_dir(path, compression='gz', num_workers=None, min_size=0, chunk_size=CHUNK_SIZE,
+                 delete=True, verify=False):
+    """
+    Recursively compress each file in a directory. Symlinks and files that are already compressed
+    with the same compression are left alone.
+
+    :param path: (str) the directory
+    :param compression: (str) 'gz', 'bz2' or 'xz'
+    :param num_workers: (int) number of processes (default: number of cores)
+    :param min_size: (int) don't compress files smaller than this many bytes
+    :param chunk_size: (int) files larger than this are compressed by all workers at once
+    :param delete: (bool) remove the original files afterwards
+    :param verify: (bool) verify each compressed file before removing its original
+    :return: ([str]) the compressed files
+    """
+    if compression not in COMPRESSORS:
+        raise ValueError("Supported compression formats are {}".format(sorted(COMPRESSORS)))
+    num_workers = get_num_workers(num_workers)
+    small, large = [], []
+    for parent, _, files in os.walk(path):
+        for f in files:
+            filename = os.path.join(parent, f)
+            if f.lower().endswith('.' + compression) or os.path.islink(filename):
+                continue
+            size = os.path.getsize(filename)
+            if size < min_size:
+                continue
+            (large if size > chunk_size else small).append(filename)
+
+    compressed = []
+    if small:
+        if num_workers > 1 and len(small) > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                compressed.extend(executor.map(
+                    _compress_small_file, [(f, compression, delete, verify) for f in small]))
+        else:
+            compressed.extend(_compress_small_file((f, compression, delete, verify))
+                              for f in small)
+    for f in large:
+        compressed.append(compress_file(f, compression, num_workers, chunk_size, delete, verify))
+    return compressed
+
+
+def make_archive(base_name, root_dir, compression='gz', num_workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Archive a directory into a compressed tar file, compressing on several cores
+
+    :param base_name: (str) name of the archive, minus the .tar.<compression> extension
+    :param root_dir: (str) the directory to archive
+    :param compression: (str) 'gz', 'bz2' or 'xz'
+    :param num_workers: (int) number of threads (default: number of cores)
+    :param chunk_size: (int) number of uncompressed bytes per member
+    :return: (str) the name of the archive
+    """
+    out_name = '{}.tar.{}'.format(base_name, compression)
+    with open(out_name, 'wb') as f_out, \
+            ParallelCompressedWriter(f_out, compression, num_workers, chunk_size) as writer:
+        with tarfile.open(fileobj=writer, mode='w|') as tar:
+            for name in sorted(os.listdir(root_dir)):
+                path = os.path.join(root_dir, name)
+                if os.path.abspath(path) != os.path.abspath(out_name):
+                    tar.add(path, arcname=os.path.join(os.curdir, name))
+    return out_name
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""
+A compact, read-only representation of the DAG of a Workflow. The nodes are numbered 0..n-1 in
+order of fw_id, and the edges in both directions are stored as CSR (compressed sparse row) index
+arrays, so that a graph of millions of FireWorks takes a few machine words per node and edge and
+is traversed without building Python lists for every node.
+"""
+
+from array import array
+from collections import Counter, deque
+from itertools import chain, repeat
+import operator
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+try:
+    _TYPECODE = 'q'  # 64-bit signed integers
+    array(_TYPECODE)
+except ValueError:
+    _TYPECODE = 'l'  # 'q' is missing before Python 3.3
+
+
+def _offsets(counts):
+    """
+    :param counts: (iterable) number of neighbors of each node
+    :return: (array) the n + 1 offsets of the neighbors of each node in the index array
+    """
+    offsets = array(_TYPECODE, [0])
+    total = 0
+    for count in counts:
+        total += count
+        offsets.append(total)
+    return offsets
+
+
+class CompactDAG(object):
+    """
+    The children of node i are child_idx[child_ptr[i]:child_ptr[i + 1]], and its parents are
+    parent_idx[parent_ptr[i]:parent_ptr[i + 1]]. The public methods take and return fw_ids.
+    """
+
+    def __init__(self, links):
+        """
+        :param links: (dict) parent fw_id -> [child fw_ids]; children need not be keys themselves
+        """
+        nodes = set(links)
+        nodes.update(chain.from_iterable(links.values()))
+        self.ids = array(_TYPECODE, sorted(nodes))
+        self.index = dict(zip(self.ids, range(len(self.ids))))
+        n = len(self.ids)
+
+        # the loops are left to map() and friends, which keeps building 1M nodes at a second or two
+        rows = list(map(links.get, self.ids, repeat(())))
+        self.child_ptr = _offsets(map(len, rows))
+        self.child_idx = array(_TYPECODE, map(self.index.__getitem__, chain.from_iterable(rows)))
+
+        # sort the edges by child to get the reverse direction; the sort is stable, so the parents
+        # of each node stay in fw_id order
+        child_ptr, child_idx = self.child_ptr, self.child_idx
+        n_children = map(operator.sub, child_ptr[1:], child_ptr[:-1])
+        sources = array(_TYPECODE, chain.from_iterable(map(repeat, range(n), n_children)))
+        by_child = sorted(range(len(child_idx)), key=child_idx.__getitem__)
+        self.parent_idx = array(_TYPECODE, map(sources.__getitem__, by_child))
+        n_parents = Counter(child_idx)
+        self.parent_ptr = _offsets(map(n_parents.get, range(n), repeat(0)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, fw_id):
+        return fw_id in self.index
+
+    @property
+    def num_edges(self):
+        return len(self.child_idx)
+
+    def children(self, fw_id):
+        """
+        :param fw_id: (int)
+        :return: ([int]) fw_ids of the children
+        """
+        i = self.index[fw_id]
+        ids = self.ids
+        return [ids[j] for j in self.child_idx[self.child_ptr[i]:self.child_ptr[i + 1]]]
+
+    def parents(self, fw_id):
+        """
+        :param fw_id: (int)
+        :return: ([int]) fw_ids of the parents
+        """
+        i = self.index.get(fw_id)
+        if i is None:
+            return []
+        ids = self.ids
+        return [ids[j] for j in self.parent_idx[self.parent_ptr[i]:self.parent_ptr[i + 1]]]
+
+    def parent_links(self):
+        """
+        :return: (dict) child fw_id -> [parent fw_ids], for the nodes that have parents
+        """
+        ids, ptr, idx = self.ids, self.parent_ptr, self.parent_idx
+        return {ids[i]: [ids[j] for j in idx[ptr[i]:ptr[i + 1]]]
+                for i in range(len(ids)) if ptr[i] != ptr[i + 1]}
+
+    def roots(self):
+        """
+        :return: ([int]) fw_ids of the nodes without parents
+        """
+        ptr = self.parent_ptr
+        return [fw_id for fw_id, a, b in zip(self.ids, ptr, ptr[1:]) if a == b]
+
+    def leaves(self):
+        """
+        :return: ([int]) fw_ids of the nodes without children
+        """
+        ptr = self.child_ptr
+        return [fw_id for fw_id, a, b in zip(self.ids, ptr, ptr[1:]) if a == b]
+
+    def descendants(self, fw_ids, include_self=True):
+        """
+        :param fw_ids: ([int]) the nodes to start from
+        :param include_self: (bool) include the starting nodes in the result
+        :return: ([int]) fw_ids of all the nodes reachable from fw_ids, in breadth-first order
+        """
+        ptr, idx = self.child_ptr, self.child_idx
+        seen = bytearray(len(self.ids))
+        start = [self.index[fw_id] for fw_id in fw_ids]
+        queue = deque()
+        order = []
+        for i in start:
+            if not seen[i]:
+                seen[i] = 1
+                queue.append(i)
+                if include_self:
+                    order.append(i)
+        while queue:
+            i = queue.popleft()
+            for j in idx[ptr[i]:ptr[i + 1]]:
+                if not seen[j]:
+                    seen[j] = 1
+                    queue.append(j)
+                    order.append(j)
+        ids = self.ids
+        return [ids[i] for i in order]
+
+    def topological_order(self):
+        """
+        :return: ([int]) all fw_ids, every parent before its children
+        """
+        ptr, idx = self.child_ptr, self.child_idx
+        p_ptr = self.parent_ptr
+        in_degree = array(_TYPECODE, [b - a for a, b in zip(p_ptr, p_ptr[1:])])
+        queue = deque(i for i, d in enumerate(in_degree) if d == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in idx[ptr[i]:ptr[i + 1]]:
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    queue.append(j)
+        if len(order) != len(self.ids):
+            raise ValueError("The workflow contains a cycle!")
+        ids = self.ids
+        return [ids[i] for i in order]
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+"""
+The engine behind FileTransferTask. Transfers are split into one job per file and run on a pool of
+threads, so that moving many small files is bound by bandwidth rather than by the latency of each
+file. Remote (SFTP) connections are kept open and reused by all transfers of the process.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import hashlib
+import os
+import shutil
+import threading
+import traceback
+
+from fireworks.fw_config import FILE_TRANSFER_WORKERS
+from fireworks.utilities.fw_utilities import file_checksum
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+SKIP_MODES = [None, 'mtime', 'checksum']
+
+
+class SFTPPool(object):
+    """
+    An SSH connection to a server and a pool of SFTP sessions opened over it. Each thread borrows
+    its own session, as an SFTP session must not be used by two threads at once.
+    """
+
+    def __init__(self, server, key_filename=None):
+        """
+        :param server: (str) server host
+        :param key_filename: (str) SSH key location
+        """
+        import paramiko
+
+        self.server = server
+        self.ssh = paramiko.SSHClient()
+        self.ssh.load_host_keys(os.path.expanduser(os.path.join("~", ".ssh", "known_hosts")))
+        self.ssh.connect(server, key_filename=key_filename)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def is_active(self):
+        transport = self.ssh.get_transport()
+        return transport is not None and transport.is_active()
+
+    def acquire(self):
+        """
+        :return: (SFTPClient) an SFTP session; give it back with release()
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.ssh.open_sftp()
+
+    def release(self, sftp):
+        with self._lock:
+            self._idle.append(sftp)
+
+    def close(self):
+        with self._lock:
+            for sftp in self._idle:
+                sftp.close()
+            self._idle = []
+        self.ssh.close()
+
+
+_sftp_pools = {}  # (pid, server, key_filename) -> SFTPPool
+_sftp_pools_lock = threading.Lock()
+
+
+def get_sftp_pool(server, key_filename=None):
+    """
+    :param server: (str) server host
+    :param key_filename: (str) SSH key location
+    :return: (SFTPPool) the open connection to the server, shared by the whole process
+    """
+    # connections don't survive a fork, so they are keyed by the process id
+    key = (os.getpid(), server, key_filename)
+    with _sftp_pools_lock:
+        pool = _sftp_pools.get(key)
+        if pool is None or not pool.is_active():
+            pool = SFTPPool(server, key_filename)
+            _sftp_pools[key] = pool
+        return pool
+
+
+def close_sftp_pools():
+    """
+    Close all connections opened by this process
+    """
+    with _sftp_pools_lock:
+        for key in list(_sftp_pools):
+            if key[0] == os.getpid():
+                _sftp_pools.pop(key).close()
+
+
+atexit.register(close_sftp_pools)
+
+
+def files_match(src, dest, skip=None, sftp=None):
+    """
+    Whether dest is already an up-to-date copy of src, similar to the checks of rsync
+
+    :param src: (str) local source file
+    :param dest: (str) destination file
+    :param skip: (str) None (never match), 'mtime' (same size, and dest is not older than src) or
+    'checksum' (same size and contents)
+    :param sftp: (SFTPClient) if given, dest is on the remote server
+    :return: (bool)
+    """
+    if not skip:
+        return False
+    try:
+        d_stat = sftp.stat(dest) if sftp else os.stat(dest)
+    except (IOError, OSError):
+        return False
+    s_stat = os.stat(src)
+    if s_stat.st_size != d_stat.st_size:
+        return False
+    if skip == 'mtime':
+        # SFTP only has whole seconds
+        return d_stat.st_mtime >= (int(s_stat.st_mtime) if sftp else s_stat.st_mtime)
+    if sftp:
+        h = hashlib.sha256()
+        with sftp.open(dest, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest() == file_checksum(src)
+    return file_checksum(dest) == file_checksum(src)
+
+
+def _rexists(sftp, path):
+    """
+    os.path.exists for paramiko's SFTP object
+    """
+    try:
+        sftp.stat(path)
+    except IOError as e:
+        if e.errno == 2:
+            return False
+        raise
+    return True
+
+
+class TransferEngine(object):
+    """
+    Runs the file operations of a transfer on a pool of worker threads. Usage:
+
+        engine = TransferEngine('copy', num_workers=8, skip='mtime')
+        engine.add(src, dest)
+        ...
+        engine.run()
+    """
+
+    fn_list = {
+        "move": shutil.move,
+        "mv": shutil.move,
+        "copy": shutil.copy,
+        "cp": shutil.copy,
+        "copy2": shutil.copy2,
+        "copytree": shutil.copy2,  # copytree is split into a copy2 of each file, see add()
+        "copyfile": shutil.copyfile,
+    }
+
+    def __init__(self, mode, num_workers=FILE_TRANSFER_WORKERS, skip=None, server=None,
+                 key_filename=None, ignore_errors=False):
+        """
+        :param mode: (str) move, mv, copy, cp, copy2, copytree, copyfile or rtransfer
+        :param num_workers: (int) number of files transferred at the same time
+        :param skip: (str) skip copies whose destination already matches, see files_match(). Not
+        used for moves.
+        :param server: (str) server host for rtransfer
+        :param key_filename: (str) SSH key location for rtransfer
+        :param ignore_errors: (bool) carry on with the other files if a file fails
+        """
+        if mode != 'rtransfer' and mode not in self.fn_list:
+            raise ValueError("Unknown transfer mode: {}".format(mode))
+        if skip not in SKIP_MODES:
+            raise ValueError("skip must be one of {}".format(SKIP_MODES))
+        self.mode = mode
+        self.num_workers = num_workers
+        self.skip = None if mode in ['move', 'mv'] else skip
+        self.server = server
+        self.key_filename = key_filename
+        self.ignore_errors = ignore_errors
+        self.jobs = []  # (src, dest) of single files
+        self.dirs = []  # (src, dest) of the directories of copytree, whose stats are copied last
+        self.n_skipped = 0
+        self._sftp_pool = None
+        self._lock = threading.Lock()
+
+    def add(self, src, dest):
+        """
+        Add a transfer of a file or directory; the directory layout is created right away
+
+        :param src: (str) local source path
+        :param dest: (str) destination path
+        """
+        if self.mode == 'rtransfer':
+            if os.path.isdir(src):
+                sftp = self._acquire()
+                try:
+                    if not _rexists(sftp, dest):
+                        sftp.mkdir(dest)
+                finally:
+                    self._release(sftp)
+                for f in os.listdir(src):
+                    if os.path.isfile(os.path.join(src, f)):
+                        self.jobs.append((os.path.join(src, f), os.path.join(dest, f)))
+            else:
+                self.jobs.append((src, dest))
+
+        elif self.mode == 'copytree':
+            # like shutil.copytree, copy the contents of symlinked directories
+            for root, dirs, files in os.walk(src, followlinks=True):
+                d_root = os.path.normpath(os.path.join(dest, os.path.relpath(root, src)))
+                if not os.path.isdir(d_root) or (root == src and not self.skip):
+                    os.makedirs(d_root)  # like shutil.copytree, fail on an existing dest
+                self.dirs.append((root, d_root))
+                for f in files:
+                    self.jobs.append((os.path.join(root, f), os.path.join(d_root, f)))
+
+        else:
+            if os.path.isdir(dest) and not os.path.isdir(src):
+                dest = os.path.join(dest, os.path.basename(src))
+            self.jobs.append((src, dest))
+
+    def run(self):
+        """
+        Transfer all files added so far
+
+        :return: ([(str, str, Exception)]) the failed transfers (only if ignore_errors is set)
+        """
+        failures = []
+        executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        try:
+            futures = [(job, executor.submit(self._transfer, *job)) for job in self.jobs]
+            for (src, dest), future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    traceback.print_exc()
+                    if not self.ignore_errors:
+                        for _, f in futures:
+                            f.cancel()
+                        raise ValueError("There was an error performing operation {} from {} "
+                                         "to {}: {}".format(self.mode, src, dest, e))
+                    failures.append((src, dest, e))
+            # after the files, whose copying changes the modification times of the directories
+            for src, dest in reversed(self.dirs):
+                shutil.copystat(src, dest)
+        finally:
+            executor.shutdown(wait=True)
+            self.jobs = []
+            self.dirs = []
+        return failures
+
+    def _transfer(self, src, dest):
+        if self.mode == 'rtransfer':
+            sftp = self._acquire()
+            try:
+                if files_match(src, dest, self.skip, sftp):
+                    return self._count_skipped()
+                sftp.put(src, dest)
+            finally:
+                self._release(sftp)
+        elif files_match(src, dest, self.skip):
+            return self._count_skipped()
+        else:
+            self.fn_list[self.mode](src, dest)
+
+    def _count_skipped(self):
+        with self._lock:
+            self.n_skipped += 1
+
+    def _acquire(self):
+        with self._lock:
+            if self._sftp_pool is None:
+                self._sftp_pool = get_sftp_pool(self.server, self.key_filename)
+        return self._sftp_pool.acquire()
+
+    def _release(self, sftp):
+        self._sftp_pool.release(sftp)
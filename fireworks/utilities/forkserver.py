@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+Runs Python functions in children forked from a warm forkserver. The forkserver is started once per
+process with a list of preloaded modules; each call then forks a fresh child from it, so heavy
+imports are paid once rather than per call, and a crashing function cannot take down the caller.
+
+The forkserver start method of multiprocessing requires Python 3.4+ on a Unix system; see
+FORKSERVER_AVAILABLE.
+"""
+
+import multiprocessing
+import os
+import threading
+import traceback
+
+import six
+from six.moves import builtins
+
+from fireworks.utilities.fw_utilities import get_fw_logger
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+# multiprocessing.get_context() is new in Python 3.4, and Windows can't fork
+FORKSERVER_AVAILABLE = hasattr(multiprocessing, 'get_context') and \
+    'forkserver' in multiprocessing.get_all_start_methods()
+
+_context = None
+_preload = None  # the modules preloaded by the forkserver
+_context_lock = threading.Lock()
+
+
+def get_func(func_path):
+    """
+    :param func_path: (str) fully qualified name of a function, e.g. json.dumps, or a builtin
+    :return: (callable) the function
+    """
+    toks = func_path.rsplit(".", 1)
+    if len(toks) == 2:
+        modname, funcname = toks
+        mod = __import__(modname, globals(), locals(), [funcname], 0)
+        return getattr(mod, funcname)
+    # handle built in functions
+    return getattr(builtins, toks[0])
+
+
+def start_forkserver(preload=None):
+    """
+    Start the forkserver of this process, if not started yet. The modules are only preloaded by the
+    first call; later calls reuse the running server, and log a warning if they ask for other
+    modules.
+
+    :param preload: ([str]) modules to import in the forkserver
+    :return: (multiprocessing context)
+    """
+    if not FORKSERVER_AVAILABLE:
+        raise RuntimeError('Running functions in a forkserver requires Python 3.4+ on a Unix '
+                           'system!')
+    global _context, _preload
+    with _context_lock:
+        if _context is None:
+            _context = multiprocessing.get_context('forkserver')
+            # this module runs every child (see _run_child); without it, each child imports it
+            # again. __main__ is left out of the default preload, as it may be a script like rlaunch
+            _preload = [__name__] + [m for m in (preload or []) if m != __name__]
+            _context.set_forkserver_preload(_preload)
+            from multiprocessing import forkserver
+            forkserver.ensure_running()
+        elif preload and not set(preload).issubset(_preload):
+            get_fw_logger('forkserver', stream_level='WARNING').warning(
+                'The forkserver is already running with preloaded modules {}; {} are not '
+                'preloaded'.format(_preload, sorted(set(preload).difference(_preload))))
+        return _context
+
+
+def _run_child(conn, func_path, args, kwargs, cwd):
+    try:
+        os.chdir(cwd)
+        result = ('ok', get_func(func_path)(*args, **kwargs))
+    except Exception as e:
+        result = ('error', e, traceback.format_exc())
+    try:
+        conn.send(result)
+    except Exception:
+        # the output or exception could not be pickled
+        conn.send(('error', None, traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def run_in_forkserver(func_path, args=(), kwargs=None, cwd=None, preload=None):
+    """
+    Call a function in a child of the forkserver
+
+    :param func_path: (str) fully qualified name of the function
+    :param args: (list) positional arguments
+    :param kwargs: (dict) keyword arguments
+    :param cwd: (str) working directory of the child (default: the current directory)
+    :param preload: ([str]) modules to preload if the forkserver is not running yet
+    :return: the return value of the function, which must be picklable
+    """
+    ctx = start_forkserver(preload)
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_run_child,
+                    args=(child_conn, func_path, list(args), kwargs or {}, cwd or os.getcwd()))
+    p.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = None
+    finally:
+        parent_conn.close()
+        p.join()
+
+    if result is None:
+        raise RuntimeError("Process running {} died with exit code {}".format(func_path,
+                                                                            p.exitcode))
+    if result[0] == 'error':
+        if result[1] is not None:
+            # chain the traceback of the child, which is lost when pickling the exception
+            six.raise_from(result[1], RuntimeError(result[2]))
+        raise RuntimeError("Error running {}:\n{}".format(func_path, result[2]))
+    return result[1]
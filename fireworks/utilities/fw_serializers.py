@@ -18,7 +18,8 @@ Some advantages:
     (in particular, note that from_dict is a class method rather than a static method, allowing use of self)
     - Decorators aid in some of the routine parts of the serialization, such as adding the _fw_name key
     - Both JSON and YAML file import/export are naturally and concisely supported within the framework.
-    - Auto-detect and proper loading of JSON and YAML files
+    - Auto-detect and proper loading of JSON and YAML files, and of the binary MessagePack and BSON formats
+    - Other formats can be added with register_codec()
     - Proper JSON handling of datetime (both encoding and decoding) and UTF-8 strings
     - In some cases, objects can be serialized/deserialized extremely concisely, by use of only their fw_name (if no
     parameters are needed to describe the object)
@@ -29,16 +30,30 @@ when the serialize_fw() decorator is used.
 import traceback
 import pkgutil
 import inspect
-import json  # note that ujson is faster, but at this time does not support "default" in dumps()
+import json
+import math
 import importlib
 import datetime
 import abc
+import os
 import sys
+import tempfile
 
 import yaml
 import six
 
-from fireworks.fw_config import FW_NAME_UPDATES, YAML_STYLE, USER_PACKAGES
+try:
+    from importlib.util import find_spec
+except ImportError:
+    find_spec = None  # before Python 3.4, see _get_package_paths()
+
+try:
+    import orjson  # much faster than json, used if JSON_USE_ORJSON is set
+except ImportError:
+    orjson = None
+
+from fireworks.fw_config import FW_NAME_UPDATES, YAML_STYLE, USER_PACKAGES, FW_NAME_CACHE, \
+    JSON_USE_ORJSON
 
 __author__ = 'Anubhav Jain'
 __copyright__ = 'Copyright 2012, The Materials Project'
@@ -48,12 +63,131 @@ __email__ = 'ajain@lbl.gov'
 __date__ = 'Dec 13, 2012'
 
 SAVED_FW_MODULES = {}
+_FW_NAME_REGISTRY = None  # _fw_name -> [modules], loaded from FW_NAME_CACHE
 DATETIME_HANDLER = lambda obj: obj.isoformat() if isinstance(obj, datetime.datetime) else None
+DATETIME_LENGTH = len('2014-10-18T12:00:00.000000')  # isoformat() with microseconds
 if sys.version_info > (3, 0, 0):
     ENCODING_PARAMS = {"encoding": "utf-8"}
 else:
     ENCODING_PARAMS = {}
 
+# use the libyaml bindings when available
+YAML_LOADER = getattr(yaml, 'CLoader', yaml.Loader)
+YAML_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
+
+def _use_orjson():
+    return JSON_USE_ORJSON and orjson is not None
+
+
+def _orjson_exact(obj):
+    """
+    Whether orjson reads and writes all the numbers in obj exactly like json. orjson writes NaN and
+    Infinity as null, can't write integers beyond 64 bits, and reads them back as floats.
+    """
+    if isinstance(obj, dict):
+        return all(_orjson_exact(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return all(_orjson_exact(v) for v in obj)
+    if isinstance(obj, float):
+        return not (math.isinf(obj) or math.isnan(obj)) and abs(obj) < 2 ** 64
+    if isinstance(obj, six.integer_types):
+        return -2 ** 63 <= obj < 2 ** 64
+    return True
+
+
+def _json_dumps(m_dict, **kwargs):
+    if _use_orjson() and not kwargs and _orjson_exact(m_dict):
+        try:
+            return orjson.dumps(m_dict, default=DATETIME_HANDLER,
+                                option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass  # let json deal with it
+    return json.dumps(m_dict, default=DATETIME_HANDLER, **kwargs)
+
+
+def _json_loads(f_str):
+    if _use_orjson():
+        try:
+            m_dict = orjson.loads(f_str)
+            # a float this large may have been an integer beyond 64 bits
+            if _orjson_exact(m_dict):
+                return m_dict
+        except ValueError:
+            pass  # e.g. NaN or Infinity, which json reads
+    return json.loads(f_str)
+
+
+def _yaml_dumps(m_dict, **kwargs):
+    return yaml.dump(m_dict, Dumper=YAML_DUMPER, default_flow_style=YAML_STYLE,
+                     allow_unicode=True)
+
+
+def _yaml_loads(f_str):
+    return yaml.load(f_str, Loader=YAML_LOADER)
+
+
+def _msgpack_dumps(m_dict, **kwargs):
+    import msgpack
+    return msgpack.packb(m_dict, default=DATETIME_HANDLER, use_bin_type=True)
+
+
+def _msgpack_loads(f_str):
+    import msgpack
+    return msgpack.unpackb(f_str, raw=False, strict_map_key=False)
+
+
+def _isoformat_dates(obj):
+    if isinstance(obj, dict):
+        return {k: _isoformat_dates(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_isoformat_dates(v) for v in obj]
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    return obj
+
+
+def _bson_dumps(m_dict, **kwargs):
+    import bson
+    # BSON datetimes only have millisecond precision, so store them as Strings like JSON does
+    return bson.BSON.encode(_isoformat_dates(m_dict))
+
+
+def _bson_loads(f_str):
+    import bson
+    return bson.BSON(f_str).decode()
+
+
+# f_format -> (dumps, loads, binary); dumps(m_dict, **kwargs) returns a String (bytes if binary)
+FW_CODECS = {'json': (_json_dumps, _json_loads, False),
+             'yaml': (_yaml_dumps, _yaml_loads, False),
+             'yml': (_yaml_dumps, _yaml_loads, False),
+             'msgpack': (_msgpack_dumps, _msgpack_loads, True),
+             'bson': (_bson_dumps, _bson_loads, True)}
+
+
+def register_codec(f_format, dumps, loads, binary=False):
+    """
+    Add a serialization format, selected by the file extension f_format
+
+    :param f_format: (str) name (and file extension) of the format
+    :param dumps: (callable) converts a dict (and keyword args of to_format) to a String, or to
+    bytes if binary
+    :param loads: (callable) converts a String (or bytes) back into a dict
+    :param binary: (bool) whether the format is binary
+    """
+    FW_CODECS[f_format] = (dumps, loads, binary)
+
+
+def get_codec(f_format):
+    """
+    :param f_format: (str) the serialization format
+    :return: (callable, callable, bool) dumps, loads and whether the format is binary
+    """
+    if f_format not in FW_CODECS:
+        raise ValueError('Unsupported format {}'.format(f_format))
+    return FW_CODECS[f_format]
+
 
 def recursive_dict(obj):
     if obj is None:
@@ -80,6 +214,20 @@ def recursive_dict(obj):
     return str(obj)
 
 
+def _parse_datetime(m_str):
+    """
+    internal method that converts a String written by datetime.isoformat() (with microseconds)
+    back into a datetime, or returns None if it is not such a String. Most Strings are rejected by
+    their length or separators without any parsing.
+    """
+    if len(m_str) != DATETIME_LENGTH or m_str[10] != 'T' or m_str[4] != '-' or m_str[19] != '.':
+        return None
+    try:
+        return datetime.datetime.strptime(m_str, "%Y-%m-%dT%H:%M:%S.%f")
+    except ValueError:
+        return None
+
+
 # TODO: is reconstitute_dates really needed? Can this method just do everything?
 def _recursive_load(obj):
     if obj is None:
@@ -94,13 +242,13 @@ def _recursive_load(obj):
         return [_recursive_load(v) for v in obj]
 
     if isinstance(obj, six.string_types):
-        try:
-            # convert String to datetime if really datetime
-            return datetime.datetime.strptime(obj, "%Y-%m-%dT%H:%M:%S.%f")
-        except:
-            # convert unicode to ASCII if not really unicode
-            if obj == obj.encode('ascii', 'ignore'):
-                return str(obj)
+        # convert String to datetime if really datetime
+        dt = _parse_datetime(obj)
+        if dt is not None:
+            return dt
+        # convert unicode to ASCII if not really unicode
+        if obj == obj.encode('ascii', 'ignore'):
+            return str(obj)
 
     return obj
 
@@ -167,6 +315,8 @@ class FWSerializable(object):
     For an example of serialization, see the class QueueAdapterBase.
     """
 
+    __slots__ = ()  # lets subclasses that define __slots__ go without a __dict__
+
     @property
     def fw_name(self):
         try:
@@ -188,17 +338,10 @@ class FWSerializable(object):
 
     def to_format(self, f_format='json', **kwargs):
         """
-        returns a String representation in the given format
+        returns a String representation in the given format (bytes for binary formats)
         :param f_format: the format to output to (default json)
         """
-        if f_format == 'json':
-            return json.dumps(self.to_dict(), default=DATETIME_HANDLER, **kwargs)
-        elif f_format == 'yaml':
-            # start with the JSON format, and convert to YAML
-            return yaml.dump(self.to_dict(), default_flow_style=YAML_STYLE,
-                             allow_unicode=True)
-        else:
-            raise ValueError('Unsupported format {}'.format(f_format))
+        return get_codec(f_format)[0](self.to_dict(), **kwargs)
 
     @classmethod
     def from_format(cls, f_str, f_format='json'):
@@ -207,12 +350,7 @@ class FWSerializable(object):
         :param f_str: the String representation
         :param f_format: serialization format of the String (default json)
         """
-        if f_format == 'json':
-            return cls.from_dict(_reconstitute_dates(json.loads(f_str)))
-        elif f_format == 'yaml':
-            return cls.from_dict(_reconstitute_dates(yaml.load(f_str)))
-        else:
-            raise ValueError('Unsupported format {}'.format(f_format))
+        return cls.from_dict(_reconstitute_dates(get_codec(f_format)[1](f_str)))
 
     def to_file(self, filename, f_format=None, **kwargs):
         """
@@ -222,7 +360,7 @@ class FWSerializable(object):
         """
         if f_format is None:
             f_format = filename.split('.')[-1]
-        with open(filename, 'w', **ENCODING_PARAMS) as f:
+        with _open_for_format(filename, 'w', f_format) as f:
             f.write(self.to_format(f_format=f_format, **kwargs))
 
     @classmethod
@@ -234,16 +372,51 @@ class FWSerializable(object):
         """
         if f_format is None:
             f_format = filename.split('.')[-1]
-        with open(filename, 'r', **ENCODING_PARAMS) as f:
+        with _open_for_format(filename, 'r', f_format) as f:
             return cls.from_format(f.read(), f_format=f_format)
 
+    # Pickling normally goes through to_dict() and from_dict(). Subclasses whose attributes are
+    # all picklable set this to True, so that their attributes are pickled as they are instead;
+    # this skips the conversion of the whole object to and from its dict on every trip through
+    # multiprocessing.
+    _pickle_attributes = False
+
+    def __reduce_ex__(self, protocol):
+        if self._pickle_attributes:
+            return _new_object, (self.__class__,), (_get_attributes(self),)
+        return super(FWSerializable, self).__reduce_ex__(protocol)
+
     def __getstate__(self):
         return self.to_dict()
 
     def __setstate__(self, state):
-        fw_obj = self.from_dict(state)
-        for k, v in fw_obj.__dict__.items():
-            self.__dict__[k] = v
+        if isinstance(state, tuple):  # attributes pickled by __reduce_ex__
+            attributes = state[0]
+        else:
+            attributes = _get_attributes(self.from_dict(state))
+        for k, v in attributes.items():
+            object.__setattr__(self, k, v)
+
+
+def _new_object(cls):
+    """
+    internal method that creates an uninitialized object for unpickling
+    """
+    return cls.__new__(cls)
+
+
+def _get_attributes(obj):
+    """
+    internal method that returns the instance attributes of an object, both in its __dict__ and in
+    its __slots__
+    """
+    attrs = dict(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for k in [slots] if isinstance(slots, six.string_types) else slots:
+            if k not in ('__dict__', '__weakref__') and hasattr(obj, k):
+                attrs[k] = getattr(obj, k)
+    return attrs
 
 
 # TODO: make this quicker the first time around
@@ -289,16 +462,37 @@ def load_object(obj_dict):
         if m_object is not None:
             return m_object
 
+    # then from the location recorded by an earlier process
+    m_modules = _get_fw_name_registry().get(fw_name, [])
+    if len(m_modules) == 1:
+        try:
+            m_module = importlib.import_module(m_modules[0])
+            m_object = _search_module_for_obj(m_module, obj_dict)
+            if m_object is not None:
+                SAVED_FW_MODULES[fw_name] = m_modules[0]
+                return m_object
+        except ImportError:
+            pass  # the registry is stale, fall back to a full search
+
     # failing that, look for the object within all of USER_PACKAGES
-    # this will be slow, but only needed the first time
+    # this will be slow, but only needed the first time; all classes found on the way are
+    # recorded in the registry so that later processes don't need to search again
 
     found_objects = [] # used to make sure we don't find multiple hits
+    registry = {}
     for package in USER_PACKAGES:
-        root_module = importlib.import_module(package)
+        try:
+            root_module = importlib.import_module(package)
+        except ImportError:
+            continue
         for loader, mod_name, is_pkg in pkgutil.walk_packages(
                 root_module.__path__, package + '.'):
             try:
-                m_module = loader.find_module(mod_name).load_module(mod_name)
+                # import_module reuses modules that are already imported; executing them again
+                # would create a second copy of their classes, which can't be pickled
+                m_module = importlib.import_module(mod_name)
+                for name in _get_fw_names(m_module):
+                    registry.setdefault(name, []).append(mod_name)
                 m_object = _search_module_for_obj(m_module, obj_dict)
                 if m_object is not None:
                     found_objects.append((m_object, mod_name))
@@ -308,6 +502,7 @@ def load_object(obj_dict):
                     "%s in %s cannot be loaded because of %s. Skipping.."
                     % (m_object, mod_name, str(ex)))
                 traceback.print_exc(ex)
+    _save_fw_name_registry(registry)
 
     if len(found_objects) == 1:
         SAVED_FW_MODULES[fw_name] = found_objects[0][1]
@@ -320,6 +515,89 @@ def load_object(obj_dict):
     raise ValueError('load_object() could not find a class with cls._fw_name {}'.format(fw_name))
 
 
+def _get_package_paths(package):
+    """
+    internal method that returns the directories of a package, without importing its modules
+
+    :param package: (str) name of the package
+    :return: ([str]) the directories, or [] if the package can't be found
+    """
+    try:
+        if find_spec is not None:
+            spec = find_spec(package)
+            return list(spec.submodule_search_locations or []) if spec else []
+        loader = pkgutil.get_loader(package)
+    except ImportError:
+        return []
+    # the ImpLoader of Python 2 has the directory of a package, the loaders of Python 3.3 its
+    # __init__.py
+    path = getattr(loader, 'filename', None) or getattr(loader, 'path', None)
+    if path and os.path.basename(path).startswith('__init__.'):
+        path = os.path.dirname(path)
+    return [path] if path and os.path.isdir(path) else []
+
+
+def _get_packages_stamp():
+    """
+    internal method that summarizes the modification times of all files of USER_PACKAGES, to tell
+    whether the registry of _fw_names is still valid
+    """
+    stamp = {}
+    for package in USER_PACKAGES:
+        paths = _get_package_paths(package)
+        if not paths:
+            stamp[package] = None
+            continue
+        mtimes = []
+        for path in paths:
+            for root, dirs, files in os.walk(path):
+                mtimes.append(os.path.getmtime(root))
+                mtimes.extend(os.path.getmtime(os.path.join(root, f))
+                              for f in files if f.endswith('.py'))
+        stamp[package] = [max(mtimes), len(mtimes)] if mtimes else None
+    return stamp
+
+
+def _get_fw_name_registry():
+    """
+    internal method that returns the registry of _fw_name -> [modules] stored on disk, or an empty
+    one if it is missing or out of date
+    """
+    global _FW_NAME_REGISTRY
+    if _FW_NAME_REGISTRY is None:
+        _FW_NAME_REGISTRY = {}
+        if FW_NAME_CACHE and os.path.exists(FW_NAME_CACHE):
+            try:
+                with open(FW_NAME_CACHE) as f:
+                    m_dict = json.load(f)
+                if m_dict['stamp'] == _get_packages_stamp():
+                    _FW_NAME_REGISTRY = m_dict['fw_names']
+            except (IOError, OSError, ValueError, KeyError):
+                pass  # unreadable cache, it will be rebuilt
+    return _FW_NAME_REGISTRY
+
+
+def _save_fw_name_registry(registry):
+    """
+    internal method that replaces the registry of _fw_names, in memory and on disk
+    """
+    global _FW_NAME_REGISTRY
+    _FW_NAME_REGISTRY = registry
+    if not FW_NAME_CACHE:
+        return
+    try:
+        cache_dir = os.path.dirname(os.path.abspath(FW_NAME_CACHE))
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        # write to a temporary file, then move it into place so readers never see a partial file
+        fd, tmp_name = tempfile.mkstemp(dir=cache_dir, prefix='.fw_name_cache')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'stamp': _get_packages_stamp(), 'fw_names': registry}, f)
+        os.rename(tmp_name, FW_NAME_CACHE)
+    except (IOError, OSError):
+        pass  # e.g. a read-only home directory; the registry is just not persisted
+
+
 def load_object_from_file(filename, f_format=None):
     """
     Implicitly load an object from a file. just a friendly wrapper to
@@ -330,21 +608,42 @@ def load_object_from_file(filename, f_format=None):
         filename extension)
     """
 
-    m_dict = {}
     if f_format is None:
         f_format = filename.split('.')[-1]
+    if f_format not in FW_CODECS:
+        raise ValueError('Unknown file format {} cannot be loaded!'.format(f_format))
 
-    with open(filename, 'r', **ENCODING_PARAMS) as f:
-        if f_format == 'json':
-            m_dict = _reconstitute_dates(json.loads(f.read()))
-        elif f_format == 'yaml':
-            m_dict = _reconstitute_dates(yaml.load(f.read()))
-        else:
-            raise ValueError('Unknown file format {} cannot be loaded!'.format(f_format))
+    with _open_for_format(filename, 'r', f_format) as f:
+        m_dict = _reconstitute_dates(get_codec(f_format)[1](f.read()))
 
     return load_object(m_dict)
 
 
+def _open_for_format(filename, mode, f_format):
+    """
+    internal method that opens a file in binary or text mode, as needed by the format
+    """
+    if get_codec(f_format)[2]:
+        return open(filename, mode + 'b')
+    return open(filename, mode, **ENCODING_PARAMS)
+
+
+def _get_fw_names(m_module):
+    """
+    internal method that returns the _fw_names of the classes defined in a module
+    """
+    names = []
+    for name, obj in inspect.getmembers(m_module):
+        if inspect.isclass(obj) and obj.__module__ == m_module.__name__:
+            try:
+                fw_name = getattr(obj, '_fw_name', get_default_serialization(obj))
+            except ValueError:
+                continue
+            if isinstance(fw_name, six.string_types):
+                names.append(fw_name)
+    return names
+
+
 def _search_module_for_obj(m_module, obj_dict):
     """
     internal method that looks in a module for a class with a given _fw_name
@@ -369,10 +668,9 @@ def _reconstitute_dates(obj_dict):
         return [_reconstitute_dates(v) for v in obj_dict]
 
     if isinstance(obj_dict, six.string_types):
-        try:
-            return datetime.datetime.strptime(obj_dict, "%Y-%m-%dT%H:%M:%S.%f")
-        except:
-            pass
+        dt = _parse_datetime(obj_dict)
+        if dt is not None:
+            return dt
 
     return obj_dict
 
@@ -2,7 +2,6 @@
 
 import logging
 import datetime
-from multiprocessing.managers import BaseManager, DictProxy
 import string
 import sys
 import os
@@ -10,9 +9,11 @@ import traceback
 import socket
 import multiprocessing
 import errno
+import hashlib
 
-from fireworks.fw_config import FWData, FW_BLOCK_FORMAT, DS_PASSWORD, \
-    FW_LOGGING_FORMAT
+import six
+
+from fireworks.fw_config import FWData, FW_BLOCK_FORMAT, FW_LOGGING_FORMAT
 
 
 __author__ = 'Anubhav Jain, Xiaohui Qu'
@@ -94,7 +95,7 @@ def log_fancy(m_logger, msgs, log_lvl='info', add_traceback=False):
     :param add_traceback: (bool) add traceback text, useful when logging exceptions (default False)
     """
 
-    if isinstance(msgs, basestring):
+    if isinstance(msgs, six.string_types):
         msgs = [msgs]
 
     _log_fnc = getattr(m_logger, log_lvl.lower())
@@ -181,24 +182,17 @@ def get_slug(m_str):
     return m_str.replace(' ', '_')
 
 
-class DataServer(BaseManager):
+def file_checksum(filename, blocksize=1 << 20):
     """
-    Provide a server that can host shared objects between multiprocessing
-    Processes (that normally can't share data). For example, a common LaunchPad is
-    shared between processes and pinging launches is coordinated to limit DB hits.
+    :param filename: (str) path of the file
+    :param blocksize: (int) number of bytes to read at a time
+    :return: (str) sha256 hex digest of the file contents
     """
-
-    @classmethod
-    def setup(cls, launchpad):
-        """
-        :param launchpad: (LaunchPad) object
-        :return:
-        """
-        DataServer.register('LaunchPad', callable=lambda: launchpad)
-        DataServer.register('Running_IDs', callable=lambda: {}, proxytype=DictProxy)
-        m = DataServer(address=('127.0.0.1', 0), authkey=DS_PASSWORD)  # random port
-        m.start()
-        return m
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
 
 
 class NestedClassGetter(object):
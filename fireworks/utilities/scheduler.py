@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+"""
+A heap-based scheduler that runs the periodic background work of a process (heartbeats and
+BackgroundTasks of all Rockets) on a small, fixed pool of threads instead of one thread per job.
+The heartbeats have a scheduler and thread of their own, so that long BackgroundTasks can never
+delay them past RUN_EXPIRATION_SECS.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import traceback
+
+from fireworks.fw_config import SCHEDULER_THREADS
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+class ScheduledJob(object):
+    """
+    A handle on a job of the Scheduler
+    """
+
+    def __init__(self, scheduler, func, args, interval, jitter, num_runs, owner, on_finish):
+        self.scheduler = scheduler
+        self.func = func
+        self.args = args
+        self.interval = interval
+        self.jitter = jitter
+        self.num_runs = num_runs
+        self.owner = owner
+        self.on_finish = on_finish
+        self.runs = 0
+        self.cancelled = False
+
+    def next_deadline(self, deadline):
+        """
+        :param deadline: (float) the deadline of the run that just happened
+        :return: (float) the deadline of the next run
+        """
+        return max(time.time(), deadline + self.interval) + random.uniform(0, self.jitter)
+
+    def cancel(self):
+        """
+        Stop running the job. A run that has already started is not interrupted.
+        """
+        self.cancelled = True
+        self.scheduler.wake()
+
+    def finish(self):
+        """
+        Cancel the job and run its on_finish hook, if any, in the calling thread
+        """
+        self.cancel()
+        if self.on_finish:
+            self.on_finish()
+
+
+class Scheduler(object):
+    """
+    Runs jobs at their deadlines. Each job is a function called every "interval" seconds; a job
+    never runs concurrently with itself, so a slow run delays the next one rather than piling up.
+    """
+
+    def __init__(self, num_threads=SCHEDULER_THREADS):
+        """
+        :param num_threads: (int) number of threads running the jobs
+        """
+        self.num_threads = num_threads
+        self._heap = []  # (deadline, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def schedule(self, func, interval, args=(), delay=0, jitter=0, num_runs=0, owner=None,
+                 on_finish=None):
+        """
+        :param func: (callable) the function to run
+        :param interval: (float) secs between the deadlines of successive runs
+        :param args: (tuple) arguments to func
+        :param delay: (float) secs until the first run
+        :param jitter: (float) add a random delay of up to this many secs to every deadline after the
+        first, so that the jobs of many Rockets don't hit the database at the same time
+        :param num_runs: (int) stop after this many runs (0 = until cancelled)
+        :param owner: (Thread) stop when this thread is no longer alive
+        :param on_finish: (callable) hook run by ScheduledJob.finish()
+        :return: (ScheduledJob)
+        """
+        job = ScheduledJob(self, func, args, interval, jitter, num_runs, owner, on_finish)
+        with self._cond:
+            self._start_threads()
+            heapq.heappush(self._heap, (time.time() + delay, next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _start_threads(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(self.num_threads - len(self._threads)):
+            t = threading.Thread(target=self._run, name='fw_scheduler')
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def _next_job(self):
+        """
+        Wait for the next due job, dropping cancelled jobs and those whose owner has died
+
+        :return: (float, ScheduledJob) the deadline and the job
+        """
+        with self._cond:
+            while True:
+                while self._heap and self._is_done(self._heap[0][2]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline = self._heap[0][0]
+                now = time.time()
+                if deadline <= now:
+                    return heapq.heappop(self._heap)[0::2]
+                self._cond.wait(deadline - now)
+
+    @staticmethod
+    def _is_done(job):
+        return job.cancelled or (job.owner is not None and not job.owner.is_alive())
+
+    def _run(self):
+        while True:
+            deadline, job = self._next_job()
+            try:
+                job.func(*job.args)
+            except Exception:
+                traceback.print_exc()
+            job.runs += 1
+            if job.runs == job.num_runs:
+                continue
+            with self._cond:
+                heapq.heappush(self._heap, (job.next_deadline(deadline), next(self._seq), job))
+                self._cond.notify()
+
+
+SCHEDULER_SIZES = {'background': SCHEDULER_THREADS, 'ping': 1}  # name -> number of threads
+
+_schedulers = {}  # name -> Scheduler
+_schedulers_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(name='background'):
+    """
+    :param name: (str) 'background' for the BackgroundTasks, or 'ping' for the heartbeats
+    :return: (Scheduler) the Scheduler of this process with that name
+    """
+    global _schedulers, _schedulers_pid
+    with _scheduler_lock:
+        # threads don't survive a fork, so a forked child needs its own Schedulers
+        if _schedulers_pid != os.getpid():
+            _schedulers = {}
+            _schedulers_pid = os.getpid()
+        if name not in _schedulers:
+            _schedulers[name] = Scheduler(SCHEDULER_SIZES[name])
+        return _schedulers[name]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""
+Caches of parsed template files, so that rendering many inputs or queue scripts from the same
+template only reads and compiles it once per process. Cached templates are reloaded when the
+modification time or size of their file changes.
+"""
+
+import os
+import threading
+
+from fireworks.fw_config import TEMPLATE_CACHE_DIR
+
+__author__ = 'Anubhav Jain'
+__copyright__ = 'Copyright 2014, The Materials Project'
+__version__ = '0.1'
+__maintainer__ = 'Anubhav Jain'
+__email__ = 'ajain@lbl.gov'
+__date__ = 'Oct 18, 2014'
+
+
+class TemplateCache(object):
+    """
+    A cache of template objects built from files, keyed by path
+    """
+
+    def __init__(self, factory):
+        """
+        :param factory: (callable) builds a template object from the text of a file
+        """
+        self.factory = factory
+        self._templates = {}  # path -> ((mtime, size), template)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        :param path: (str) the template file
+        :return: the template object built from the current contents of the file
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime, st.st_size)
+        with self._lock:
+            entry = self._templates.get(path)
+        if entry and entry[0] == stamp:
+            return entry[1]
+        with open(path) as f:
+            template = self.factory(f.read())
+        with self._lock:
+            self._templates[path] = (stamp, template)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates = {}
+
+
+_jinja_envs = {}  # template_dir -> Environment
+_jinja_envs_lock = threading.Lock()
+
+
+def get_jinja_template(template_dir, name):
+    """
+    Load a Jinja2 template through a shared Environment. The Environment keeps compiled templates
+    in memory (reloading them when their file changes) and in a bytecode cache on disk, which
+    other processes reuse.
+
+    :param template_dir: (str) directory holding the templates
+    :param name: (str) path of the template relative to template_dir
+    :return: (jinja2.Template)
+    """
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+    template_dir = os.path.abspath(template_dir)
+    with _jinja_envs_lock:
+        env = _jinja_envs.get(template_dir)
+        if env is None:
+            if TEMPLATE_CACHE_DIR and not os.path.exists(TEMPLATE_CACHE_DIR):
+                os.makedirs(TEMPLATE_CACHE_DIR)
+            env = Environment(loader=FileSystemLoader(template_dir), auto_reload=True,
+                              bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR))
+            _jinja_envs[template_dir] = env
+    return env.get_template(name)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+Tests for the array-backed DAG behind Workflow.Links.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import unittest
+
+from fireworks.utilities.dag import CompactDAG
+
+
+class CompactDAGTest(unittest.TestCase):
+
+    def setUp(self):
+        # 10 -> 20, 30; 20 -> 40; 30 -> 40, 50; 60 is on its own
+        self.dag = CompactDAG({10: [20, 30], 20: [40], 30: [40, 50], 60: []})
+
+    def test_structure(self):
+        self.assertEqual(len(self.dag), 6)
+        self.assertEqual(self.dag.num_edges, 5)
+        self.assertIn(50, self.dag)
+        self.assertEqual(self.dag.children(30), [40, 50])
+        self.assertEqual(self.dag.children(50), [])
+        self.assertEqual(self.dag.parents(40), [20, 30])
+        self.assertEqual(self.dag.parents(10), [])
+        self.assertEqual(self.dag.parent_links(),
+                         {20: [10], 30: [10], 40: [20, 30], 50: [30]})
+        self.assertEqual(self.dag.roots(), [10, 60])
+        self.assertEqual(self.dag.leaves(), [40, 50, 60])
+
+    def test_descendants(self):
+        self.assertEqual(self.dag.descendants([10]), [10, 20, 30, 40, 50])
+        self.assertEqual(sorted(self.dag.descendants([20, 30], include_self=False)), [40, 50])
+        self.assertEqual(self.dag.descendants([60]), [60])
+
+    def test_topological_order(self):
+        order = self.dag.topological_order()
+        self.assertEqual(sorted(order), [10, 20, 30, 40, 50, 60])
+        for parent, children in [(10, [20, 30]), (20, [40]), (30, [40, 50])]:
+            for child in children:
+                self.assertLess(order.index(parent), order.index(child))
+        self.assertRaises(ValueError, CompactDAG({1: [2], 2: [1]}).topological_order)
+
+    def test_large(self):
+        n = 100000
+        dag = CompactDAG({i: [i + 1, i + 2] if i < n - 2 else [] for i in range(n)})
+        self.assertEqual(dag.roots(), [0])
+        self.assertEqual(len(dag.descendants([n // 2])), n - n // 2)
+        self.assertEqual(dag.topological_order(), list(range(n)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ TODO: add docs
 """
 import sys
 from fireworks.user_objects.firetasks.unittest_tasks import TestSerializer, ExportTestSerializer
+from fireworks.utilities import fw_serializers
 from fireworks.utilities.fw_serializers import load_object, FWSerializable
 from fireworks.utilities.fw_utilities import explicit_serialize
 
@@ -20,6 +21,9 @@ import unittest
 import datetime
 import os
 import json
+import math
+import shutil
+import tempfile
 
 
 if sys.version_info > (3, 0, 0):
@@ -139,5 +143,135 @@ class ExplicitSerializationTest(unittest.TestCase):
     def test_explicit_serialization(self):
         self.assertEqual(load_object(self.s_dict), self.s_obj)
 
+
+class CodecTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.obj = TestSerializer({"p1": u'\xe4\xf6\xfc', "p2": [1, 2.5]},
+                                  datetime.datetime(2014, 10, 18, 1, 2, 3, 4))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _round_trip(self, f_format):
+        filename = os.path.join(self.dir, "FW." + f_format)
+        self.obj.to_file(filename)
+        self.assertEqual(TestSerializer.from_file(filename), self.obj)
+        self.assertEqual(fw_serializers.load_object_from_file(filename), self.obj)
+
+    def test_formats(self):
+        for f_format in ["json", "yaml", "yml", "bson"]:
+            self._round_trip(f_format)
+
+    def test_msgpack(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise unittest.SkipTest("msgpack is not installed")
+        self._round_trip("msgpack")
+
+    def test_register_codec(self):
+        fw_serializers.register_codec("rjson", lambda d, **kwargs: json.dumps(
+                                          d, default=fw_serializers.DATETIME_HANDLER)[::-1],
+                                      lambda s: json.loads(s[::-1]))
+        try:
+            self._round_trip("rjson")
+        finally:
+            fw_serializers.FW_CODECS.pop("rjson")
+        self.assertRaises(ValueError, self.obj.to_format, "rjson")
+
+    def test_orjson(self):
+        if fw_serializers.orjson is None:
+            raise unittest.SkipTest("orjson is not installed")
+        use_orjson = fw_serializers.JSON_USE_ORJSON
+        fw_serializers.JSON_USE_ORJSON = True
+        try:
+            self._round_trip("json")
+            # values that orjson can't write or read back exactly are left to json
+            for m_dict in [{"nan": float("nan")}, {"inf": [float("-inf")]},
+                           {"big": 2 ** 70, "neg": -2 ** 64}]:
+                f_str = fw_serializers._json_dumps(m_dict)
+                self.assertEqual(f_str, json.dumps(m_dict))
+                self.assertEqual(repr(fw_serializers._json_loads(f_str)), repr(m_dict))
+            # e.g. written by to_file(indent=4), which always uses json
+            self.assertTrue(math.isnan(fw_serializers._json_loads('{\n    "a": NaN\n}')["a"]))
+        finally:
+            fw_serializers.JSON_USE_ORJSON = use_orjson
+
+
+class DatetimeLoadTest(unittest.TestCase):
+    def test_reconstitute_dates(self):
+        dt = datetime.datetime(2014, 10, 18, 12, 30, 1, 5)
+        m_dict = {"created_on": dt.isoformat(), "times": [dt.isoformat()],
+                  "path": "/scratch/2014-10-18T12:30:01/OUTCAR",
+                  "almost": "2014-13-18T12:30:01.000005", "short": dt.isoformat()[:-7]}
+        loaded = fw_serializers._reconstitute_dates(m_dict)
+        self.assertEqual(loaded["created_on"], dt)
+        self.assertEqual(loaded["times"], [dt])
+        for k in ["path", "almost", "short"]:
+            self.assertEqual(loaded[k], m_dict[k])
+
+
+class FWNameRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache = fw_serializers.FW_NAME_CACHE
+        self.old_walk = fw_serializers.pkgutil.walk_packages
+        fw_serializers.FW_NAME_CACHE = os.path.join(self.cache_dir, 'fw_name_cache.json')
+        self._forget()
+
+    def tearDown(self):
+        fw_serializers.FW_NAME_CACHE = self.old_cache
+        fw_serializers.pkgutil.walk_packages = self.old_walk
+        self._forget()
+        shutil.rmtree(self.cache_dir)
+
+    def _forget(self):
+        # start over as if in a new process
+        fw_serializers.SAVED_FW_MODULES.clear()
+        fw_serializers._FW_NAME_REGISTRY = None
+
+    def _no_walk(self, *args, **kwargs):
+        raise AssertionError("USER_PACKAGES should not be searched")
+
+    def test_registry(self):
+        obj = load_object({"_fw_name": "ScriptTask", "script": "echo"})
+        self.assertEqual(obj.fw_name, "ScriptTask")
+        with open(fw_serializers.FW_NAME_CACHE) as f:
+            fw_names = json.load(f)['fw_names']
+        self.assertEqual(fw_names['ScriptTask'], ['fireworks.user_objects.firetasks.script_task'])
+        self.assertIn('FileTransferTask', fw_names)
+
+        # a new process finds other classes without searching the packages again
+        self._forget()
+        fw_serializers.pkgutil.walk_packages = self._no_walk
+        obj = load_object({"_fw_name": "FileTransferTask", "mode": "copy", "files": []})
+        self.assertEqual(obj.fw_name, "FileTransferTask")
+
+    def test_package_paths(self):
+        package_dir = os.path.dirname(os.path.abspath(fw_serializers.__file__))
+        self.assertEqual(fw_serializers._get_package_paths('fireworks.utilities'), [package_dir])
+        self.assertEqual(fw_serializers._get_package_paths('fireworks.no_such_package'), [])
+        # the fallback of Python 2 and 3.3
+        old_find_spec = fw_serializers.find_spec
+        fw_serializers.find_spec = None
+        try:
+            self.assertEqual(fw_serializers._get_package_paths('fireworks.utilities'),
+                             [package_dir])
+            self.assertEqual(fw_serializers._get_package_paths('fireworks.no_such_package'), [])
+        finally:
+            fw_serializers.find_spec = old_find_spec
+
+    def test_stale_registry(self):
+        load_object({"_fw_name": "ScriptTask", "script": "echo"})
+        with open(fw_serializers.FW_NAME_CACHE) as f:
+            m_dict = json.load(f)
+        m_dict['stamp'] = {}
+        with open(fw_serializers.FW_NAME_CACHE, 'w') as f:
+            json.dump(m_dict, f)
+        self._forget()
+        self.assertEqual(fw_serializers._get_fw_name_registry(), {})
+
+
 if __name__ == "__main__":
     unittest.main()
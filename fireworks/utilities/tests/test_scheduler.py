@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Tests for the background scheduler.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import threading
+import time
+import unittest
+
+from fireworks.utilities.scheduler import Scheduler, get_scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler(num_threads=1)
+        self.runs = []
+
+    def record(self, name):
+        self.runs.append(name)
+
+    def test_deadlines(self):
+        fast = self.scheduler.schedule(self.record, 0.02, args=('fast',))
+        slow = self.scheduler.schedule(self.record, 10, args=('slow',))
+        time.sleep(0.15)
+        fast.cancel()
+        slow.cancel()
+        n_fast = self.runs.count('fast')
+        self.assertEqual(self.runs.count('slow'), 1)
+        self.assertTrue(n_fast >= 3)
+        time.sleep(0.05)
+        self.assertEqual(self.runs.count('fast'), n_fast)  # nothing runs after cancel()
+        self.assertEqual(len(self.scheduler._threads), 1)
+
+    def test_num_runs_and_finish(self):
+        job = self.scheduler.schedule(self.record, 0, args=('job',), num_runs=3,
+                                      on_finish=lambda: self.record('finish'))
+        time.sleep(0.05)
+        self.assertEqual(self.runs, ['job'] * 3)
+        job.finish()
+        self.assertEqual(self.runs, ['job'] * 3 + ['finish'])
+
+    def test_owner(self):
+        owner = threading.Thread(target=time.sleep, args=(0.05,))
+        owner.start()
+        self.scheduler.schedule(self.record, 0.01, args=('job',), owner=owner)
+        owner.join()
+        time.sleep(0.03)
+        n_runs = len(self.runs)
+        time.sleep(0.05)
+        self.assertEqual(len(self.runs), n_runs)
+        self.assertEqual(self.scheduler._heap, [])
+
+    def test_pings_not_starved(self):
+        # BackgroundTasks that occupy all the threads of their scheduler don't delay the pings
+        release = threading.Event()
+        background = get_scheduler('background')
+        jobs = [background.schedule(release.wait, 10, args=(5,))
+                for _ in range(background.num_threads)]
+        ping = get_scheduler('ping').schedule(self.record, 0.01, args=('ping',))
+        try:
+            time.sleep(0.1)
+            self.assertTrue(self.runs.count('ping') >= 3)
+        finally:
+            ping.cancel()
+            for job in jobs:
+                job.cancel()
+            release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
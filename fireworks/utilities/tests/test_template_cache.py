@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+Tests for the template caches of TemplateWriterTask and the queue adapters.
+"""
+
+__author__ = "Anubhav Jain"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Anubhav Jain"
+__email__ = "ajain@lbl.gov"
+__date__ = "Oct 18, 2014"
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fireworks.user_objects.firetasks.templatewriter_task import TemplateWriterTask
+from fireworks.utilities.template_cache import TemplateCache
+
+
+class TemplateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.template = os.path.join(self.dir, "input.txt")
+        self._write("hello {{name}}")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, text, mtime=None):
+        with open(self.template, "w") as f:
+            f.write(text)
+        if mtime:
+            os.utime(self.template, (mtime, mtime))
+
+    def test_template_cache(self):
+        parsed = []
+        cache = TemplateCache(lambda text: parsed.append(text) or text)
+        for i in range(3):
+            self.assertEqual(cache.get(self.template), "hello {{name}}")
+        self.assertEqual(len(parsed), 1)
+        self._write("bye {{name}}!", mtime=1e9)
+        self.assertEqual(cache.get(self.template), "bye {{name}}!")
+        self.assertEqual(len(parsed), 2)
+
+    def test_template_writer(self):
+        out = os.path.join(self.dir, "out.txt")
+        for name in ["world", "there"]:
+            t = TemplateWriterTask({"template_file": "input.txt", "template_dir": self.dir,
+                                    "context": {"name": name}, "output_file": "out.txt"})
+            t.run_task({"_fw_launch_dir": self.dir})
+            with open(out) as f:
+                self.assertEqual(f.read(), "hello " + name)
+        self._write("bye {{name}}", mtime=1e9)
+        t.run_task({"_fw_launch_dir": self.dir})
+        with open(out) as f:
+            self.assertEqual(f.read(), "bye there")
+
+
+if __name__ == '__main__':
+    unittest.main()
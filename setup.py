@@ -26,8 +26,8 @@ if __name__ == "__main__":
         packages=find_packages(),
         package_data={'fireworks':['user_objects/queue_adapters/*.txt', 'user_objects/firetasks/templates/*', 'base_site/static/*', 'base_site/templates/*']},
         zip_safe=False,
-        install_requires=['pyyaml>=3.1.0', 'pymongo>=2.4.2', 'Jinja2>=2.7.1',
-                          'six>=1.5.2', 'monty>=0.1.3'],
+        install_requires=['pyyaml>=3.1.0', 'pymongo>=2.7', 'Jinja2>=2.7.1',
+                          'six>=1.5.2', 'monty>=0.1.3', 'futures; python_version<"3"'],
         extras_require={'rtransfer': ['paramiko>=1.11'],
                         'newt': ['requests>=2.01'],
                         'webgui':['django>=1.6'],